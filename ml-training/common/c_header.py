@@ -0,0 +1,90 @@
+# ml-training/common/c_header.py
+
+import os
+import hashlib
+import numpy as np
+
+BYTES_PER_LINE = 12
+INDENT = b"    "
+
+# "0x00, " .. "0xff, " as a (256, 6) byte table, so formatting is one fancy index
+_HEX_CELLS = np.frombuffer(b"".join(b"0x%02x, " % i for i in range(256)), dtype=np.uint8).reshape(256, 6)
+
+def format_byte_rows(data, per_line=BYTES_PER_LINE):
+    """Indented rows of "0x.., " cells for every byte, built with NumPy instead of per-byte strings"""
+    data = np.frombuffer(bytes(data), dtype=np.uint8)
+    full = len(data) // per_line * per_line
+
+    def rows(chunk, width):
+        # Drop the space after each row's last comma
+        cells = _HEX_CELLS[chunk].reshape(-1, width * 6)[:, :-1]
+        indent = np.broadcast_to(np.frombuffer(INDENT, dtype=np.uint8), (len(cells), len(INDENT)))
+        newline = np.full((len(cells), 1), ord("\n"), dtype=np.uint8)
+        return np.concatenate([indent, cells, newline], axis=1).tobytes()
+
+    out = rows(data[:full], per_line) if full else b""
+    if full < len(data):
+        out += rows(data[full:], len(data) - full)
+    return out
+
+def format_constants(variable_name, constants):
+    """`const float/int <name>_<key> = ...;` lines, e.g. a quantized model's input scale"""
+    lines = []
+    for key, value in (constants or {}).items():
+        if isinstance(value, (float, np.floating)):
+            lines.append(f"const float {variable_name}_{key} = {float(value):.9g}f;\n")
+        else:
+            lines.append(f"const int {variable_name}_{key} = {int(value)};\n")
+    return "".join(lines).encode()
+
+def header_digest(data, variable_name, alignment, constants=None):
+    """SHA-256 over the model bytes and everything else that shapes the header"""
+    h = hashlib.sha256(bytes(data))
+    h.update(f"{variable_name}:{alignment}:{BYTES_PER_LINE}".encode())
+    h.update(format_constants(variable_name, constants))
+    return h.hexdigest()
+
+def existing_digest(path):
+    """Digest recorded in a header we generated earlier, or None"""
+    try:
+        with open(path, "rb") as f:
+            for _ in range(4):
+                line = f.readline()
+                if line.startswith(b"// sha256: "):
+                    return line[len(b"// sha256: "):].strip().decode()
+    except OSError:
+        pass
+    return None
+
+def write_c_header(data, path, variable_name, alignment=16, source=None, force=False, constants=None):
+    """
+    Write a model (or any byte blob) as a C array header
+
+    The array gets an alignment attribute (TFLite Micro wants 16-byte
+    aligned flatbuffers), a `<name>_len` constant and one `<name>_<key>`
+    constant per entry of `constants`. The content hash is
+    stored on the second line; when it matches, the file is left untouched
+    so the firmware build doesn't recompile. Returns True if written.
+    """
+    data = bytes(data)
+    digest = header_digest(data, variable_name, alignment, constants)
+    if not force and existing_digest(path) == digest:
+        return False
+
+    parts = [
+        f"// Auto-generated by {source or 'ml-training'}. Do not edit.\n".encode(),
+        f"// sha256: {digest}\n".encode(),
+        b"#pragma once\n\n",
+        f"const unsigned char {variable_name}[] __attribute__((aligned({alignment}))) = {{\n".encode(),
+        format_byte_rows(data),
+        b"};\n",
+        f"const int {variable_name}_len = {len(data)};\n".encode(),
+        format_constants(variable_name, constants),
+    ]
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"".join(parts))
+    os.replace(tmp_path, path)
+    return True
@@ -0,0 +1,171 @@
+# ml-training/common/calibration.py
+
+import os
+import json
+import hashlib
+
+import numpy as np
+import tensorflow as tf
+
+CALIBRATION_VERSION = 1   # Bump when the sampling changes, so old caches are rebuilt
+
+def file_key(*paths):
+    """Cheap identity of the files a calibration set was drawn from (name, size, mtime)"""
+    parts = []
+    for path in paths:
+        st = os.stat(path)
+        parts.append(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}")
+    return ";".join(parts)
+
+def balanced_indices(labels, n, seed=42, exclude=None):
+    """
+    Up to n sorted row indices with the classes as even as the data allows
+
+    Each class is permuted with the same seed, so the pick only depends on
+    the labels; a class short of its share leaves the rest to the others.
+    """
+    labels = np.asarray(labels).ravel()
+    allowed = np.ones(len(labels), dtype=bool)
+    if exclude is not None:
+        allowed[np.asarray(exclude, dtype=np.int64)] = False
+
+    rng = np.random.default_rng(seed)
+    pools = [rng.permutation(np.flatnonzero((labels == c) & allowed)) for c in np.unique(labels)]
+    counts = np.zeros(len(pools), dtype=int)
+    remaining = min(n, sum(len(p) for p in pools))
+    while remaining > 0:
+        open_pools = [k for k, p in enumerate(pools) if counts[k] < len(p)]
+        share = max(remaining // len(open_pools), 1)
+        for k in open_pools:
+            take = min(share, len(pools[k]) - counts[k], remaining)
+            counts[k] += take
+            remaining -= take
+    return np.sort(np.concatenate([p[:c] for p, c in zip(pools, counts)]).astype(np.int64))
+
+def calibration_set(X, labels, n=200, seed=42, cache_file=None, source_key="", transform=None, exclude=None):
+    """
+    (X_cal, y_cal, indices): a class-balanced, fixed-seed calibration sample
+
+    X may be a memmap; only the picked rows are read. transform (e.g. the
+    clean preprocessing without augmentation) runs on the picked rows, and
+    rows in exclude are never picked. With cache_file, the result is stored
+    and reused while source_key, the shape, n, seed and exclude stay the same.
+    """
+    key = f"{source_key}|{tuple(X.shape)}|n{n}|seed{seed}|v{CALIBRATION_VERSION}"
+    if exclude is not None and len(exclude):
+        rows = np.unique(np.asarray(exclude, dtype=np.int64))
+        key += f"|x{hashlib.sha1(rows.tobytes()).hexdigest()[:16]}"
+    if cache_file and os.path.exists(cache_file):
+        with np.load(cache_file, allow_pickle=False) as cached:
+            if str(cached["key"]) == key:
+                return cached["X"], cached["y"], cached["indices"]
+
+    indices = balanced_indices(labels, n, seed, exclude)
+    X_cal = np.asarray(X[indices], dtype=np.float32)
+    if transform is not None:
+        X_cal = np.asarray(transform(X_cal), dtype=np.float32)
+    y_cal = np.asarray(labels)[indices]
+
+    if cache_file:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+        tmp_path = cache_file + ".tmp.npz"
+        np.savez(tmp_path, X=X_cal, y=y_cal, indices=indices, key=np.array(key))
+        os.replace(tmp_path, cache_file)
+    return X_cal, y_cal, indices
+
+def representative_dataset(X_cal, batch_size=32):
+    """Converter callback yielding the calibration tensors in batches (fewer calibration invokes)"""
+    def gen():
+        for start in range(0, len(X_cal), batch_size):
+            yield [X_cal[start:start + batch_size]]
+    return gen
+
+def tflite_predict(tflite_model, X, batch_size=256):
+    """Float outputs of a (possibly int8) TFLite model, batched through a resized interpreter"""
+    interpreter = tf.lite.Interpreter(model_content=tflite_model)
+    inp = interpreter.get_input_details()[0]
+    out = interpreter.get_output_details()[0]
+    in_scale, in_zero = inp['quantization']
+    out_scale, out_zero = out['quantization']
+
+    results = []
+    for start in range(0, len(X), batch_size):
+        batch = np.asarray(X[start:start + batch_size], dtype=np.float32)
+        if np.issubdtype(inp['dtype'], np.integer) and in_scale:
+            info = np.iinfo(inp['dtype'])
+            batch = np.clip(np.round(batch / in_scale + in_zero), info.min, info.max)
+        interpreter.resize_tensor_input(inp['index'], batch.shape)
+        interpreter.allocate_tensors()
+        interpreter.set_tensor(inp['index'], batch.astype(inp['dtype']))
+        interpreter.invoke()
+        y = interpreter.get_tensor(out['index']).astype(np.float32)
+        if np.issubdtype(out['dtype'], np.integer) and out_scale:
+            y = (y - out_zero) * out_scale
+        results.append(y)
+    return np.concatenate(results)
+
+def _decisions(outputs):
+    outputs = outputs.reshape(len(outputs), -1)
+    return (outputs[:, 0] > 0.5).astype(int) if outputs.shape[1] == 1 else outputs.argmax(axis=1)
+
+def quantization_report(model, tflite_model, X_holdout, y_holdout=None, converter=None, debug_samples=32):
+    """
+    Float vs int8 accuracy on a held-out set, plus per-tensor error
+
+    Output deltas compare the Keras model with the quantized flatbuffer.
+    When the converter (with its representative_dataset) is given, the
+    QuantizationDebugger re-runs the quantized graph on debug_samples
+    held-out rows and reports each tensor's error against its float value.
+    """
+    X_holdout = np.asarray(X_holdout, dtype=np.float32)
+    float_out = model.predict(X_holdout, batch_size=256, verbose=0).reshape(len(X_holdout), -1)
+    int8_out = tflite_predict(tflite_model, X_holdout).reshape(len(X_holdout), -1)
+    delta = np.abs(float_out - int8_out)
+
+    float_dec, int8_dec = _decisions(float_out), _decisions(int8_out)
+    report = {
+        'holdout_samples': int(len(X_holdout)),
+        'output': {
+            'mean_abs_delta': float(delta.mean()),
+            'max_abs_delta': float(delta.max(initial=0)),
+            'agreement': float((float_dec == int8_dec).mean()),
+        },
+        'tensors': [],
+    }
+    if y_holdout is not None:
+        y_holdout = np.asarray(y_holdout).astype(int).ravel()
+        report['output']['float_accuracy'] = float((float_dec == y_holdout).mean())
+        report['output']['int8_accuracy'] = float((int8_dec == y_holdout).mean())
+
+    if converter is not None:
+        debugger = tf.lite.experimental.QuantizationDebugger(
+            converter=converter, debug_dataset=representative_dataset(X_holdout[:debug_samples], 1))
+        debugger.run()
+        for name, stats in debugger.layer_statistics.items():
+            report['tensors'].append({
+                'tensor': name.replace('NumericVerify/', '', 1),
+                'rmse': float(np.sqrt(stats['mean_squared_error'])),
+                'max_abs_error': float(stats['max_abs_error']),
+                'mean_error': float(stats['mean_error']),
+            })
+        report['tensors'].sort(key=lambda t: -t['rmse'])
+    return report
+
+def print_quantization_report(report, top=5):
+    out = report['output']
+    line = f"   Holdout {report['holdout_samples']}: |float - int8| mean {out['mean_abs_delta']:.4f}, " \
+           f"max {out['max_abs_delta']:.4f}, agreement {out['agreement']*100:.1f}%"
+    print(line)
+    if 'int8_accuracy' in out:
+        print(f"   Accuracy: float {out['float_accuracy']*100:.2f}% -> int8 {out['int8_accuracy']*100:.2f}%")
+    for t in report['tensors'][:top]:
+        print(f"   {t['tensor'][:48]:<48} rmse {t['rmse']:.5f}  max {t['max_abs_error']:.5f}")
+
+def save_quantization_report(report, path, calibration=None):
+    """Write the report (and how the calibration set was drawn) as JSON"""
+    if calibration is not None:
+        report = dict(report, calibration=calibration)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=4)
+    return path
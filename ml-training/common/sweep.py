@@ -0,0 +1,192 @@
+# ml-training/common/sweep.py
+
+import os
+import csv
+import json
+import time
+import itertools
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+THREAD_ENV = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+              'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS')
+
+class SharedArrays:
+    """
+    Arrays copied into shared memory once, for trial processes to map
+
+    spec() is a small picklable description; attach(spec) in a worker
+    returns read-only views of the same memory, so N workers don't hold
+    N copies of the dataset. Memmaps are read exactly once, here.
+    """
+
+    def __init__(self, arrays):
+        self._blocks = []
+        self._spec = {}
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self._blocks.append(block)
+            self._spec[name] = (block.name, array.shape, array.dtype.str)
+
+    def spec(self):
+        return dict(self._spec)
+
+    @property
+    def nbytes(self):
+        return sum(b.size for b in self._blocks)
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_blocks = []   # Worker side: keeps the attached blocks mapped for the life of the process
+_data = None
+
+def attach(spec):
+    """Read-only numpy views of the arrays described by SharedArrays.spec()"""
+    arrays = {}
+    for name, (block_name, shape, dtype) in spec.items():
+        # Spawned workers share the parent's resource tracker, so the creator's unlink covers it
+        block = shared_memory.SharedMemory(name=block_name)
+        _blocks.append(block)
+        array = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+    return arrays
+
+def _init_worker(spec, threads, worker_init):
+    global _data
+    for var in THREAD_ENV:
+        os.environ[var] = str(threads)
+    if worker_init is not None:
+        worker_init(threads)
+    _data = attach(spec)
+
+def _run_trial(trial_fn, trial_id, params, budget):
+    start = time.perf_counter()
+    metrics, artifact = trial_fn(params, budget, _data)
+    return trial_id, params, budget, metrics, artifact, time.perf_counter() - start
+
+def param_grid(space, n_trials=None, seed=42):
+    """Every combination of the space's value lists, or a seeded sample of n_trials of them"""
+    names = sorted(space)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+    if n_trials is not None and n_trials < len(configs):
+        picks = np.random.default_rng(seed).choice(len(configs), size=n_trials, replace=False)
+        configs = [configs[i] for i in sorted(picks)]
+    return configs
+
+def run_trials(trial_fn, jobs, spec, workers=1, threads=1, worker_init=None):
+    """
+    Yield (trial_id, params, budget, metrics, artifact, seconds) as trials finish
+
+    jobs are (trial_id, params, budget). trial_fn(params, budget, data) must
+    be a module-level function returning (metrics dict, artifact); data is
+    the dict of shared arrays. Workers are spawned (not forked), so a
+    parent that already imported TensorFlow is safe.
+    """
+    context = mp.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(spec, threads, worker_init)) as pool:
+        futures = [pool.submit(_run_trial, trial_fn, *job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+def _row(trial_id, params, budget, rung, metrics, seconds):
+    return dict({'trial': trial_id, 'rung': rung, 'budget': budget, 'train_s': round(seconds, 2)},
+                **{f'param.{k}': v for k, v in params.items()}, **metrics)
+
+def successive_halving(trial_fn, configs, spec, objective, min_budget, max_budget, eta=3,
+                       workers=1, threads=1, worker_init=None, log=print):
+    """
+    Successive halving: every config at min_budget, the best 1/eta at eta x the budget, ...
+
+    With min_budget == max_budget this is a plain parallel grid. Returns
+    (rows, artifacts): one row per trial and rung, and the artifact of each
+    trial's last rung keyed by trial id. Rows of trials that were cut carry
+    status 'stopped', the survivors of the top rung 'final'.
+    """
+    budgets = [min_budget]
+    while budgets[-1] * eta < max_budget * (1 - 1e-9):
+        budgets.append(budgets[-1] * eta)
+    if budgets[-1] < max_budget * (1 - 1e-9):
+        budgets.append(max_budget)
+
+    rows, artifacts = [], {}
+    survivors = list(enumerate(configs))
+    for rung, budget in enumerate(budgets):
+        log(f"   rung {rung}: {len(survivors)} trial(s) at budget {budget}")
+        scored = []
+        jobs = [(trial_id, params, budget) for trial_id, params in survivors]
+        for trial_id, params, budget, metrics, artifact, seconds in run_trials(
+                trial_fn, jobs, spec, workers, threads, worker_init):
+            rows.append(_row(trial_id, params, budget, rung, metrics, seconds))
+            artifacts[trial_id] = artifact
+            scored.append((metrics[objective], trial_id, params))
+            log(f"      trial {trial_id:>3} {objective} {metrics[objective]:.4f}  ({seconds:.1f} s)  {params}")
+
+        last = rung == len(budgets) - 1
+        keep = len(scored) if last else max(1, len(scored) // eta)
+        scored.sort(key=lambda s: (-s[0], s[1]))
+        kept = {trial_id for _, trial_id, _ in scored[:keep]}
+        for row in rows:
+            if row['rung'] == rung:
+                row['status'] = 'final' if last else ('promoted' if row['trial'] in kept else 'stopped')
+        survivors = sorted((trial_id, params) for _, trial_id, params in scored[:keep])
+    return rows, artifacts
+
+def last_rungs(rows):
+    """Each trial's row at the highest budget it reached"""
+    best = {}
+    for row in rows:
+        if row['trial'] not in best or row['rung'] > best[row['trial']]['rung']:
+            best[row['trial']] = row
+    return [best[t] for t in sorted(best)]
+
+def pareto_front(rows, maximize, minimize):
+    """Indices of rows no other row beats on every objective (and strictly on one)"""
+    points = np.array([[r[k] for k in maximize] + [-r[k] for k in minimize] for r in rows], dtype=float)
+    front = []
+    for i, p in enumerate(points):
+        dominated = np.any(np.all(points >= p, axis=1) & np.any(points > p, axis=1))
+        if not dominated:
+            front.append(i)
+    return front
+
+def write_results(rows, path, meta=None):
+    """Results table as CSV (one row per trial and rung) plus JSON with the sweep settings"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    columns = list(dict.fromkeys(k for row in rows for k in row))
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    json_path = os.path.splitext(path)[0] + '.json'
+    with open(json_path, 'w') as f:
+        json.dump({'meta': meta or {}, 'rows': rows}, f, indent=4, default=str)
+    return path, json_path
+
+def print_table(rows, columns, sort_key=None, top=20):
+    """Fixed-width table of the given columns; Pareto rows marked with *"""
+    rows = sorted(rows, key=lambda r: -r[sort_key]) if sort_key else rows
+    widths = [max(len(c), 10) for c in columns]
+    print("   " + "  ".join(f"{c:>{w}}" for c, w in zip(columns, widths)))
+    for row in rows[:top]:
+        cells = []
+        for c, w in zip(columns, widths):
+            v = row.get(c, '')
+            cells.append(f"{v:>{w}.4g}" if isinstance(v, float) else f"{str(v):>{w}}")
+        print(("*  " if row.get('pareto') else "   ") + "  ".join(cells))
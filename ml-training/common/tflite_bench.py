@@ -0,0 +1,248 @@
+# ml-training/common/tflite_bench.py
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import tensorflow as tf
+
+ML_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORT_FILE = 'benchmark_metrics.json'   # Written next to evaluation_metrics.json
+
+def load_model_bytes(path):
+    """Flatbuffer bytes of a .tflite file or of a C header emitted by c_header.py"""
+    if path.endswith('.h'):
+        with open(path) as f:
+            text = f.read()
+        body = text[text.index('{') + 1:text.index('}')]
+        return bytes(int(h, 16) for h in re.findall(r'0x([0-9a-fA-F]{2})', body))
+    with open(path, 'rb') as f:
+        return f.read()
+
+def quantize_inputs(x, detail):
+    """Float inputs -> the model's input dtype, using its scale / zero-point when quantized"""
+    dtype = detail['dtype']
+    scale, zero_point = detail['quantization']
+    if np.issubdtype(dtype, np.integer) and scale:
+        info = np.iinfo(dtype)
+        q = np.round(np.asarray(x, dtype=np.float32) / scale + zero_point)
+        return np.clip(q, info.min, info.max).astype(dtype)
+    return np.asarray(x, dtype=dtype)
+
+def tensor_bytes(detail):
+    shape = [max(int(d), 1) for d in detail['shape']]
+    return int(np.prod(shape)) * np.dtype(detail['dtype']).itemsize
+
+def op_profile(interpreter):
+    """Per-op type and shapes plus the tensor byte totals the arena has to cover"""
+    tensors = {t['index']: t for t in interpreter.get_tensor_details()}
+    ops = interpreter._get_ops_details()
+    graph_inputs = {d['index'] for d in interpreter.get_input_details()}
+
+    produced = {i for op in ops for i in op['outputs']}
+    consumed = {i for op in ops for i in op['inputs'] if i >= 0}
+    constants = consumed - produced - graph_inputs
+    activations = (produced | graph_inputs) & set(tensors)
+
+    rows = []
+    for op in ops:
+        outputs = [tensors[i] for i in op['outputs'] if i in tensors]
+        rows.append({
+            'index': op['index'],
+            'op': op['op_name'],
+            'inputs': [list(map(int, tensors[i]['shape'])) for i in op['inputs'] if i in tensors],
+            'outputs': [list(map(int, t['shape'])) for t in outputs],
+            'output_dtype': [np.dtype(t['dtype']).name for t in outputs],
+            'output_bytes': sum(tensor_bytes(t) for t in outputs),
+        })
+
+    memory = {
+        'activation_bytes': sum(tensor_bytes(tensors[i]) for i in activations),
+        'largest_activation_bytes': max((tensor_bytes(tensors[i]) for i in activations), default=0),
+        'weight_bytes': sum(tensor_bytes(tensors[i]) for i in constants if i in tensors),
+    }
+    return rows, dict(Counter(r['op'] for r in rows)), memory
+
+def time_interpreter(model_content, inputs, num_threads, warmup=10, runs=200):
+    """Per-invoke latencies (ms) over `runs` calls, cycling through the inputs"""
+    interpreter = tf.lite.Interpreter(model_content=model_content, num_threads=num_threads)
+    interpreter.allocate_tensors()
+    detail = interpreter.get_input_details()[0]
+    batch = quantize_inputs(inputs, detail).reshape((len(inputs),) + tuple(detail['shape'][1:]))
+
+    for i in range(warmup):
+        interpreter.set_tensor(detail['index'], batch[i % len(batch)][None])
+        interpreter.invoke()
+
+    latencies = np.empty(runs)
+    for i in range(runs):
+        interpreter.set_tensor(detail['index'], batch[i % len(batch)][None])
+        start = time.perf_counter_ns()
+        interpreter.invoke()
+        latencies[i] = (time.perf_counter_ns() - start) / 1e6
+    return latencies
+
+def latency_stats(latencies):
+    return {
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+        'throughput_per_s': float(1000 / latencies.mean()),
+        'runs': int(len(latencies)),
+    }
+
+def benchmark_model(model_content, inputs=None, threads=None, warmup=10, runs=200, seed=42):
+    """
+    Latency, memory and op profile of one TFLite model on the host
+
+    inputs are float samples matching the model input (without the batch
+    axis); they are quantized with the model's own input parameters. With no
+    inputs, seeded standard-normal samples are used.
+    """
+    # Builtin kernels only, so the op list isn't folded into host-only XNNPACK delegate nodes
+    interpreter = tf.lite.Interpreter(
+        model_content=model_content,
+        experimental_op_resolver_type=tf.lite.experimental.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES)
+    interpreter.allocate_tensors()
+
+    detail = interpreter.get_input_details()[0]
+    if inputs is None or len(inputs) == 0:
+        rng = np.random.default_rng(seed)
+        inputs = rng.standard_normal((16,) + tuple(detail['shape'][1:])).astype(np.float32)
+
+    ops, op_counts, memory = op_profile(interpreter)
+
+    threads = threads or sorted({1, os.cpu_count() or 1})
+    scale, zero_point = detail['quantization']
+    return {
+        'size_bytes': len(model_content),
+        'sha256': hashlib.sha256(model_content).hexdigest(),
+        'input': {'shape': list(map(int, detail['shape'])), 'dtype': np.dtype(detail['dtype']).name,
+                  'scale': float(scale), 'zero_point': int(zero_point)},
+        'samples': int(len(inputs)),
+        'latency': {str(n): latency_stats(time_interpreter(model_content, inputs, n, warmup, runs))
+                    for n in threads},
+        'memory': memory,
+        'op_counts': op_counts,
+        'ops': ops,
+    }
+
+def save_report(results, models_dir, source):
+    """Merge per-model results into <models_dir>/benchmark_metrics.json"""
+    path = os.path.join(models_dir, REPORT_FILE)
+    report = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            report = json.load(f)
+    report.setdefault('models', {}).update(results)
+    report['generated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    report['host'] = {'platform': sys.platform, 'cpu_count': os.cpu_count(), 'tensorflow': tf.__version__,
+                      'source': source}
+
+    os.makedirs(models_dir, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=4)
+    return path
+
+# --- Representative inputs for the models this repo ships ---
+
+def fall_feature_inputs(limit):
+    """Scaled rows of X_test.npy, the input of fall_model_int8.tflite"""
+    import joblib
+    X_test = np.load(os.path.join(ML_ROOT, 'data', 'processed', 'X_test.npy'))[:limit]
+    scaler = joblib.load(os.path.join(ML_ROOT, 'models', 'fall', 'scaler.pkl'))
+    return scaler.transform(X_test).astype(np.float32)
+
+def fall_window_inputs(limit, time_steps=200, step=100):
+    """IMU windows cut from the fall-training shards"""
+    shard_root = os.path.join(ML_ROOT, 'fall-training', 'processed_data', 'shards')
+    sys.path.append(os.path.join(ML_ROOT, 'fall-training'))
+    from shards import list_shards, read_shard
+    from windowing import window_view
+
+    windows = []
+    for category in ('Falls', 'ADLs'):
+        for path in list_shards(shard_root, category)[:limit]:
+            windows.append(window_view(read_shard(path)[1], time_steps, step))
+    X = np.concatenate(windows)
+    return X[np.random.default_rng(42).permutation(len(X))[:limit]].astype(np.float32)
+
+def cough_corpus_inputs(limit, input_len):
+    """Peak-normalized, downsampled clip starts from the packed cough corpus"""
+    sys.path.append(os.path.join(ML_ROOT, 'cough-training'))
+    from audio_corpus import AudioCorpus
+
+    corpus = AudioCorpus(os.path.join(ML_ROOT, 'cough-training', 'dataset', 'corpus'))
+    rows = np.random.default_rng(42).permutation(len(corpus))[:limit]
+    clips, _ = corpus.padded_batch(rows)
+    clips = np.pad(clips, [(0, 0), (0, max(0, 2 * input_len - clips.shape[1]))])[:, :2 * input_len:2]
+    return (clips / (np.abs(clips).max(axis=1, keepdims=True) + 0.0001))[..., None].astype(np.float32)
+
+TARGETS = {
+    'fall_features_int8': {'path': 'models/fall/fall_model_int8.tflite', 'models_dir': 'models/fall',
+                           'inputs': lambda detail, n: fall_feature_inputs(n)},
+    'fall_cnn': {'path': 'fall-training/fall_model.h', 'models_dir': 'models/fall',
+                 'inputs': lambda detail, n: fall_window_inputs(n, int(detail['shape'][1]))},
+    'cough_cnn': {'path': 'cough-training/model.h', 'models_dir': 'models/cough',
+                  'inputs': lambda detail, n: cough_corpus_inputs(n, int(detail['shape'][1]))},
+}
+
+def run_targets(names, samples, runs, threads):
+    print("="*70)
+    print("⏱️  TFLite Host Benchmark")
+    print("="*70)
+    print()
+
+    by_dir = {}
+    for name in names:
+        target = TARGETS[name]
+        path = os.path.join(ML_ROOT, target['path'])
+        if not os.path.exists(path):
+            print(f"   {name:<20} skipped ({target['path']} not found)")
+            continue
+
+        model_content = load_model_bytes(path)
+        interpreter = tf.lite.Interpreter(model_content=model_content)
+        detail = interpreter.get_input_details()[0]
+        try:
+            inputs, source = target['inputs'](detail, samples), 'dataset'
+        except (OSError, ImportError, ValueError, KeyError) as e:
+            inputs, source = None, f'random ({type(e).__name__}: {e})'
+
+        result = benchmark_model(model_content, inputs, threads, runs=runs)
+        result['path'] = target['path']
+        result['inputs_source'] = source
+        by_dir.setdefault(target['models_dir'], {})[name] = result
+
+        for n, stats in result['latency'].items():
+            print(f"   {name:<20} {n:>2} thread(s)  p50 {stats['p50_ms']:7.3f} ms  "
+                  f"p99 {stats['p99_ms']:7.3f} ms  {stats['throughput_per_s']:9.1f} inf/s")
+        print(f"   {'':<20} {result['size_bytes']/1024:.1f} KB, activations "
+              f"{result['memory']['activation_bytes']/1024:.1f} KB, inputs: {source}")
+
+    for models_dir, results in by_dir.items():
+        path = save_report(results, os.path.join(ML_ROOT, models_dir), 'tflite_bench.py')
+        print(f"\n💾 Saved: {os.path.relpath(path, ML_ROOT)}")
+    print()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark exported TFLite models on the host")
+    parser.add_argument('models', nargs='*', help=f"any of {', '.join(TARGETS)} (default: all)")
+    parser.add_argument('--samples', type=int, default=256, help="representative inputs to replay")
+    parser.add_argument('--runs', type=int, default=500, help="timed invokes per thread setting")
+    parser.add_argument('--threads', type=int, nargs='+', default=None)
+    args = parser.parse_args()
+
+    unknown = set(args.models) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(sorted(unknown))}")
+
+    run_targets(args.models or list(TARGETS), args.samples, args.runs, args.threads)
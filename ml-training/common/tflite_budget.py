@@ -0,0 +1,293 @@
+# ml-training/common/tflite_budget.py
+
+import os
+import sys
+import json
+import copy
+import argparse
+
+import numpy as np
+import tensorflow as tf
+
+from tflite_bench import load_model_bytes, tensor_bytes
+
+ARENA_ALIGNMENT = 16        # TFLite Micro aligns every arena buffer to 16 bytes
+ARENA_OP_OVERHEAD = 64      # Node + registration bookkeeping per op (approx.)
+ARENA_TENSOR_OVERHEAD = 32  # TfLiteEvalTensor + quantization params per tensor (approx.)
+ARENA_CHANNEL_OVERHEAD = 8  # Per-channel multiplier + shift of int8 conv / FC kernels
+
+# Ops whose cost scales with multiply-accumulates; everything else is costed per element
+MAC_OPS = {'CONV_2D', 'DEPTHWISE_CONV_2D', 'FULLY_CONNECTED', 'TRANSPOSE_CONV', 'BATCH_MATMUL'}
+# Reductions read every input element, so that is their unit of work
+REDUCE_OPS = {'MAX_POOL_2D', 'AVERAGE_POOL_2D', 'MEAN', 'SUM', 'REDUCE_MAX', 'L2_POOL_2D'}
+
+# Cycles per unit of work for the TFLite Micro reference kernels
+# (TensorFlowLite_ESP32 ships without ESP-NN). Rough figures: calibrate them
+# against on-device timings and pass the result with --cost-table.
+COST_TABLES = {
+    'esp32s3': {
+        'clock_mhz': 240,
+        'op_overhead_cycles': 2000,
+        'cycles': {
+            'int8':    {'MAC': 6,  'ELEMENT': 4,  'DEPTHWISE_CONV_2D': 8, 'FULLY_CONNECTED': 5},
+            'float32': {'MAC': 12, 'ELEMENT': 8,  'DEPTHWISE_CONV_2D': 14},
+            'hybrid':  {'MAC': 14, 'ELEMENT': 10},
+        },
+    },
+    'esp32': {
+        'clock_mhz': 240,
+        'op_overhead_cycles': 2500,
+        'cycles': {
+            'int8':    {'MAC': 9,  'ELEMENT': 5,  'DEPTHWISE_CONV_2D': 11, 'FULLY_CONNECTED': 8},
+            'float32': {'MAC': 15, 'ELEMENT': 10, 'DEPTHWISE_CONV_2D': 18},
+            'hybrid':  {'MAC': 18, 'ELEMENT': 12},
+        },
+    },
+}
+
+def load_cost_table(target='esp32s3', path=None):
+    """Built-in cost table for target, with a JSON file's entries layered on top"""
+    if target not in COST_TABLES:
+        raise ValueError(f"Unknown target '{target}' (known: {', '.join(COST_TABLES)})")
+    table = copy.deepcopy(COST_TABLES[target])
+    if path:
+        with open(path) as f:
+            override = json.load(f)
+        for dtype, cycles in override.pop('cycles', {}).items():
+            table['cycles'].setdefault(dtype, {}).update(cycles)
+        table.update(override)
+    return table
+
+def _align(n, alignment=ARENA_ALIGNMENT):
+    return -(-n // alignment) * alignment
+
+def plan_arena(buffers, alignment=ARENA_ALIGNMENT):
+    """
+    Greedy offsets for (size, first_op, last_op) buffers, like TFLite Micro's planner
+
+    Largest buffers are placed first, each at the lowest offset that does
+    not overlap a placed buffer whose lifetime intersects its own.
+    Returns (offsets, arena bytes).
+    """
+    offsets = [0] * len(buffers)
+    placed = []
+    for i in sorted(range(len(buffers)), key=lambda i: (-buffers[i][0], buffers[i][1])):
+        size, first, last = buffers[i]
+        size = _align(size, alignment)
+        conflicts = sorted((offsets[j], offsets[j] + _align(buffers[j][0], alignment))
+                           for j in placed if buffers[j][1] <= last and first <= buffers[j][2])
+        offset = 0
+        for start, end in conflicts:
+            if offset + size <= start:
+                break
+            offset = max(offset, end)
+        offsets[i] = offset
+        placed.append(i)
+    arena = max((offsets[i] + _align(b[0], alignment) for i, b in enumerate(buffers)), default=0)
+    return offsets, arena
+
+def op_dtype(op, tensors):
+    """
+    'int8' / 'float32' for the op's activation type, 'hybrid' for float
+    activations on int8 weights, else the dtype name (e.g. int32 shape math)
+    """
+    dtypes = [np.dtype(tensors[i]['dtype']) for i in op['inputs'] if i in tensors]
+    if not dtypes:
+        return 'float32'
+    if dtypes[0] in (np.int8, np.uint8, np.int16):
+        return 'int8'
+    if dtypes[0] != np.float32:
+        return dtypes[0].name
+    if op['op_name'] in MAC_OPS and any(d == np.int8 for d in dtypes[1:]):
+        return 'hybrid'
+    return 'float32'
+
+def op_work(op, tensors):
+    """(MACs, units of work) for one op; units are MACs for MAC_OPS, else elements"""
+    shape = lambda i: [max(int(d), 1) for d in tensors[i]['shape']]
+    inputs = [i for i in op['inputs'] if i in tensors]
+    out_elems = sum(int(np.prod(shape(i))) for i in op['outputs'] if i in tensors)
+    name = op['op_name']
+
+    if name in MAC_OPS and len(inputs) >= 2:
+        weights = shape(inputs[1])
+        if name == 'CONV_2D':
+            macs = out_elems * int(np.prod(weights[1:]))           # [O, KH, KW, I]
+        elif name == 'DEPTHWISE_CONV_2D':
+            macs = out_elems * weights[1] * weights[2]             # [1, KH, KW, O]
+        elif name == 'TRANSPOSE_CONV':
+            macs = int(np.prod(shape(inputs[2]))) * int(np.prod(weights[:3]))
+        elif name == 'BATCH_MATMUL':
+            macs = out_elems * shape(inputs[0])[-1]
+        else:
+            macs = out_elems * weights[-1]                         # FULLY_CONNECTED [O, I]
+        return macs, macs
+    if name in REDUCE_OPS and inputs:
+        return 0, int(np.prod(shape(inputs[0])))
+    return 0, out_elems
+
+def analyze_model(model_content, target='esp32s3', cost_table=None):
+    """
+    Per-layer MACs, op mix, tensor lifetimes, planned arena and projected latency
+
+    Weights stay in flash, so only activations (plus per-op scratch for
+    hybrid kernels) are planned into the arena; bookkeeping is added as an
+    approximate overhead on top.
+    """
+    table = cost_table or load_cost_table(target)
+    interpreter = tf.lite.Interpreter(
+        model_content=model_content,
+        experimental_op_resolver_type=tf.lite.experimental.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES)
+    interpreter.allocate_tensors()
+    tensors = {t['index']: t for t in interpreter.get_tensor_details()}
+    ops = interpreter._get_ops_details()
+    graph_inputs = [d['index'] for d in interpreter.get_input_details()]
+    graph_outputs = {d['index'] for d in interpreter.get_output_details()}
+    last_op = max(len(ops) - 1, 0)
+
+    # Lifetimes: from the producing op (graph inputs: op 0) to the last consumer
+    lifetimes = {i: [0, 0] for i in graph_inputs}
+    for n, op in enumerate(ops):
+        for i in op['outputs']:
+            lifetimes[i] = [n, n]
+    for n, op in enumerate(ops):
+        for i in op['inputs']:
+            if i in lifetimes:
+                lifetimes[i][1] = max(lifetimes[i][1], n)
+    for i in graph_outputs & set(lifetimes):
+        lifetimes[i][1] = last_op
+
+    names = [i for i in lifetimes if i in tensors]
+    buffers = [(tensor_bytes(tensors[i]), *lifetimes[i]) for i in names]
+
+    layers, warnings = [], []
+    overhead = ARENA_OP_OVERHEAD * len(ops) + ARENA_TENSOR_OVERHEAD * len(tensors)
+    cycles_of = table['cycles']
+    for n, op in enumerate(ops):
+        dtype = op_dtype(op, tensors)
+        macs, units = op_work(op, tensors)
+        cycles = cycles_of.get(dtype, cycles_of['float32'])
+        per_unit = cycles.get(op['op_name'], cycles['MAC'] if op['op_name'] in MAC_OPS else cycles['ELEMENT'])
+        op_cycles = units * per_unit + table['op_overhead_cycles']
+
+        if dtype == 'hybrid':
+            # Hybrid kernels quantize their float input into a scratch buffer first
+            first_input = next(i for i in op['inputs'] if i in tensors)
+            buffers.append((int(np.prod([max(int(d), 1) for d in tensors[first_input]['shape']])), n, n))
+            names.append(None)
+        elif dtype == 'int8' and op['op_name'] in MAC_OPS:
+            outputs = [i for i in op['outputs'] if i in tensors]
+            overhead += ARENA_CHANNEL_OVERHEAD * int(tensors[outputs[0]]['shape'][-1]) if outputs else 0
+
+        layers.append({
+            'index': n,
+            'op': op['op_name'],
+            'dtype': dtype,
+            'output': [list(map(int, tensors[i]['shape'])) for i in op['outputs'] if i in tensors],
+            'macs': int(macs),
+            'cycles': int(op_cycles),
+            'latency_ms': op_cycles / (table['clock_mhz'] * 1e3),
+        })
+
+    if any(l['dtype'] == 'hybrid' for l in layers):
+        warnings.append("hybrid (float activation, int8 weight) ops are not implemented by every "
+                        "TFLite Micro build; quantize activations too for on-device use")
+
+    offsets, planned = plan_arena(buffers)
+    for layer in layers:
+        n = layer['index']
+        layer['live_bytes'] = int(sum(_align(size) for size, first, last in buffers if first <= n <= last))
+
+    mix = {}
+    for layer in layers:
+        entry = mix.setdefault(layer['dtype'], {'ops': 0, 'macs': 0})
+        entry['ops'] += 1
+        entry['macs'] += layer['macs']
+
+    peak = max(layers, key=lambda l: l['live_bytes'], default=None)
+    return {
+        'target': target,
+        'clock_mhz': table['clock_mhz'],
+        'size_bytes': len(model_content),
+        'macs': int(sum(l['macs'] for l in layers)),
+        'latency_ms': float(sum(l['latency_ms'] for l in layers)),
+        'arena': {
+            'planned_bytes': int(planned),
+            'overhead_bytes': int(overhead),
+            'total_bytes': int(planned + overhead),
+            'no_reuse_bytes': int(sum(_align(b[0]) for b in buffers)),
+            'peak_layer': peak['index'] if peak else None,
+        },
+        'op_mix': mix,
+        'tensors': [{'name': tensors[i]['name'], 'bytes': tensor_bytes(tensors[i]),
+                     'first_op': lifetimes[i][0], 'last_op': lifetimes[i][1], 'offset': int(offset)}
+                    for i, offset in zip(names, offsets) if i is not None],
+        'layers': layers,
+        'warnings': warnings,
+    }
+
+def print_report(report):
+    print(f"📐 Estimate for {report['target']} @ {report['clock_mhz']} MHz")
+    print(f"   {'#':>3}  {'op':<20} {'dtype':<8} {'output':<18} {'MACs':>10} {'ms':>8} {'live KB':>8}")
+    for l in report['layers']:
+        shape = 'x'.join(map(str, l['output'][0][1:])) if l['output'] else '-'
+        print(f"   {l['index']:>3}  {l['op']:<20} {l['dtype']:<8} {shape:<18} {l['macs']:>10,} "
+              f"{l['latency_ms']:>8.3f} {l['live_bytes']/1024:>8.1f}")
+
+    arena = report['arena']
+    mix = ', '.join(f"{d}: {m['ops']} ops / {m['macs']:,} MACs" for d, m in report['op_mix'].items())
+    print(f"   MACs: {report['macs']:,} ({mix})")
+    print(f"   Arena: {arena['total_bytes']/1024:.1f} KB ({arena['planned_bytes']/1024:.1f} KB planned + "
+          f"{arena['overhead_bytes']/1024:.1f} KB overhead; {arena['no_reuse_bytes']/1024:.1f} KB without reuse)")
+    print(f"   Projected latency: {report['latency_ms']:.2f} ms")
+    for warning in report['warnings']:
+        print(f"   ⚠️ {warning}")
+
+def check_budget(report, max_arena_bytes=None, max_latency_ms=None):
+    """Budget violations as messages (empty when the model fits)"""
+    violations = []
+    arena = report['arena']['total_bytes']
+    if max_arena_bytes is not None and arena > max_arena_bytes:
+        violations.append(f"tensor arena {arena/1024:.1f} KB > budget {max_arena_bytes/1024:.1f} KB")
+    if max_latency_ms is not None and report['latency_ms'] > max_latency_ms:
+        violations.append(f"latency {report['latency_ms']:.2f} ms > budget {max_latency_ms:.2f} ms")
+    return violations
+
+def enforce_budget(model_content, target, max_arena_bytes=None, max_latency_ms=None, cost_table=None):
+    """Analyze, print the report and exit with status 1 if the model is over budget"""
+    report = analyze_model(model_content, target, cost_table)
+    print_report(report)
+    violations = check_budget(report, max_arena_bytes, max_latency_ms)
+    if violations:
+        for v in violations:
+            print(f"❌ Over budget: {v}")
+        sys.exit(1)
+    print(f"✅ Within budget for {target}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate arena size, MACs and latency of a TFLite model")
+    parser.add_argument('model', help=".tflite file or generated C header")
+    parser.add_argument('--target', default='esp32s3', choices=sorted(COST_TABLES))
+    parser.add_argument('--cost-table', help="JSON overrides, e.g. {\"cycles\": {\"int8\": {\"CONV_2D\": 4}}}")
+    parser.add_argument('--max-arena-kb', type=float)
+    parser.add_argument('--max-latency-ms', type=float)
+    parser.add_argument('--json', help="also write the full report here")
+    args = parser.parse_args()
+
+    model_content = load_model_bytes(args.model)
+    table = load_cost_table(args.target, args.cost_table)
+    max_arena = int(args.max_arena_kb * 1024) if args.max_arena_kb is not None else None
+    report = analyze_model(model_content, args.target, table)
+    print_report(report)
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"💾 Saved: {args.json}")
+
+    violations = check_budget(report, max_arena, args.max_latency_ms)
+    for v in violations:
+        print(f"❌ Over budget: {v}")
+    sys.exit(1 if violations else 0)
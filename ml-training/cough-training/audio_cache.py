@@ -0,0 +1,128 @@
+import os
+import json
+import numpy as np
+import tensorflow as tf
+
+# Bump when the deterministic preprocessing changes in a way the key doesn't capture
+CACHE_VERSION = 1
+
+WINDOWS_FILE = "windows.f16"
+INDEX_FILE = "index.npz"
+META_FILE = "cache.json"
+
+def cache_key(mode, window_size, downsample, kernel_size):
+    """Directory name of one preprocessing configuration, e.g. onset-w32000-ds2-k30-v1"""
+    return f"{mode}-w{int(window_size)}-ds{int(downsample)}-k{int(kernel_size)}-v{CACHE_VERSION}"
+
+def _file_stats(files):
+    stats = [os.stat(f) for f in files]
+    return (np.array([s.st_size for s in stats], dtype=np.int64),
+            np.array([s.st_mtime_ns for s in stats], dtype=np.int64))
+
+def _load_index(cache_dir):
+    path = os.path.join(cache_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as index:
+        return {k: index[k] for k in index.files}
+
+def cached_windows(files, make_batches, cache_dir, window_len):
+    """
+    Deterministically preprocessed windows of every file, from a float16 memmap
+
+    make_batches maps an array of file paths to a tf.data pipeline of
+    (B, window_len) float32 windows in the same order.
+    Rows are reused for files whose size and mtime are unchanged since the
+    last run, so only new or edited clips are decoded again.
+
+    Returns:
+        windows: (n_cached, window_len) float16 memmap, rows: cache row of files[i]
+    """
+    files = [str(f) for f in files]
+    sizes, mtimes = _file_stats(files)
+
+    index = _load_index(cache_dir)
+    old_rows = {}
+    if index is not None:
+        old_rows = {(p, s, m): i for i, (p, s, m) in
+                    enumerate(zip(index["path"], index["size"], index["mtime_ns"]))}
+
+    reuse = np.array([old_rows.get((f, s, m), -1) for f, s, m in zip(files, sizes, mtimes)],
+                     dtype=np.int64)
+    missing = np.flatnonzero(reuse < 0)
+
+    windows_path = os.path.join(cache_dir, WINDOWS_FILE)
+    if index is not None and len(missing) == 0:
+        # Same clips in any order: no rewrite, just map the requested order onto the rows
+        print(f"Preprocessed cache hit: {len(files)} clips from {cache_dir}")
+        windows = np.memmap(windows_path, dtype=np.float16, mode="r",
+                            shape=(len(index["path"]), window_len))
+        return windows, reuse
+
+    print(f"Preprocessing {len(missing)} clips ({len(files) - len(missing)} cached) into {cache_dir}...")
+    os.makedirs(cache_dir, exist_ok=True)
+
+    tmp_path = windows_path + ".tmp"
+    out = np.memmap(tmp_path, dtype=np.float16, mode="w+", shape=(len(files), window_len))
+
+    if len(missing) < len(files):
+        old = np.memmap(windows_path, dtype=np.float16, mode="r",
+                        shape=(len(index["path"]), window_len))
+        kept = np.flatnonzero(reuse >= 0)
+        out[kept] = old[reuse[kept]]
+        del old
+
+    if len(missing):
+        pos = 0
+        for batch in make_batches(np.array(files)[missing]).as_numpy_iterator():
+            out[missing[pos:pos + len(batch)]] = batch
+            pos += len(batch)
+
+    out.flush()
+    del out
+    os.replace(tmp_path, windows_path)
+
+    np.savez(os.path.join(cache_dir, INDEX_FILE), path=np.array(files, dtype=str),
+             size=sizes, mtime_ns=mtimes)
+    with open(os.path.join(cache_dir, META_FILE), "w") as f:
+        json.dump({"version": CACHE_VERSION, "dtype": "float16",
+                   "clips": len(files), "window_len": int(window_len)}, f, indent=4)
+
+    windows = np.memmap(windows_path, dtype=np.float16, mode="r", shape=(len(files), window_len))
+    return windows, np.arange(len(files))
+
+def normalize_windows(batch):
+    """Peak normalization without noise (what the board does), as a float32 [B, L, 1] array"""
+    batch = np.asarray(batch, dtype=np.float32)
+    return (batch / (np.abs(batch).max(axis=1, keepdims=True) + 0.0001))[..., np.newaxis]
+
+def add_noise_and_normalize(batch, min_level=0.01, max_level=0.1):
+    """Per-clip gaussian noise at a random level, then peak normalization, on a whole batch"""
+    batch = tf.cast(batch, tf.float32)
+    levels = tf.random.uniform([tf.shape(batch)[0], 1], minval=min_level, maxval=max_level)
+    noisy = batch + tf.random.normal(tf.shape(batch)) * levels
+    noisy = noisy / (tf.reduce_max(tf.abs(noisy), axis=1, keepdims=True) + 0.0001)
+    return noisy[..., tf.newaxis]
+
+def noisy_window_dataset(windows, rows, labels, batch_size):
+    """
+    Batches of (noisy, normalized windows, labels) read straight from the cache
+
+    Example i is windows[rows[i]] with labels[i]. Only the rows of the current
+    batch are pulled from the memmap, and fresh noise is drawn every epoch.
+    """
+    window_len = windows.shape[1]
+    rows = np.asarray(rows)
+    labels = np.asarray(labels)
+
+    def take(idx):
+        return np.asarray(windows[rows[idx]], dtype=np.float16)
+
+    def load(idx):
+        batch = tf.numpy_function(take, [idx], tf.float16)
+        batch = tf.ensure_shape(batch, [None, window_len])
+        return add_noise_and_normalize(batch), tf.gather(labels, idx)
+
+    ds = tf.data.Dataset.range(len(rows)).batch(batch_size)
+    ds = ds.map(load, num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,232 @@
+import os
+import csv
+import json
+import glob
+import argparse
+from math import gcd
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.io import wavfile
+from scipy.signal import resample_poly
+
+try:
+    import soundfile
+    HAS_SOUNDFILE = True
+except ImportError:
+    HAS_SOUNDFILE = False
+
+try:
+    import audioread
+    HAS_AUDIOREAD = True
+except ImportError:
+    HAS_AUDIOREAD = False
+
+# --- CONFIGURATION ---
+DATASET_PATH = "dataset"
+CORPUS_DIR = os.path.join(DATASET_PATH, "corpus")
+SAMPLE_RATE = 16000
+MAX_SECONDS = 10          # Longer clips are trimmed; shorter ones are padded per batch later
+AUDIO_EXTENSIONS = (".wav", ".webm")
+CLASSES = {"negative_class": 0, "positive_class": 1}
+CLASS_INDEX = "index.csv" # Written by sort_noise.py; replaces globbing the folder when present
+
+AUDIO_FILE = "audio.i16"
+INDEX_FILE = "index.npz"
+META_FILE = "corpus.json"
+
+def read_audio(path):
+    """(samples, channels) float32 in [-1, 1] and the file's sample rate"""
+    if path.endswith(".wav"):
+        if HAS_SOUNDFILE:
+            data, rate = soundfile.read(path, dtype="float32", always_2d=True)
+            return data, rate
+        rate, data = wavfile.read(path)
+        if data.dtype == np.uint8:
+            data = (data.astype(np.float32) - 128) / 128
+        elif data.dtype.kind == "i":
+            data = data.astype(np.float32) / -float(np.iinfo(data.dtype).min)
+        return data.astype(np.float32, copy=False).reshape(len(data), -1), rate
+
+    if not HAS_AUDIOREAD:
+        raise RuntimeError(f"audioread (with ffmpeg) is needed to decode {os.path.splitext(path)[1]} files")
+    with audioread.audio_open(path) as f:
+        rate, channels = f.samplerate, f.channels
+        pcm = np.frombuffer(b"".join(f), dtype="<i2")
+    return (pcm.astype(np.float32) / 32768).reshape(-1, channels), rate
+
+def to_mono_16k(data, rate, max_len=SAMPLE_RATE * MAX_SECONDS):
+    """Downmix, polyphase-resample to SAMPLE_RATE and trim to max_len samples, as int16"""
+    mono = data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
+    if rate != SAMPLE_RATE:
+        g = gcd(int(rate), SAMPLE_RATE)
+        # Only resample what survives the trim (plus filter margin)
+        mono = mono[:int(np.ceil(max_len * rate / SAMPLE_RATE)) + 64]
+        mono = resample_poly(mono, SAMPLE_RATE // g, int(rate) // g)
+    mono = mono[:max_len]
+    return np.clip(np.round(mono * 32768), -32768, 32767).astype(np.int16)
+
+def decode_job(job):
+    path, max_len = job
+    try:
+        data, rate = read_audio(path)
+        return path, to_mono_16k(data, rate, max_len), rate, None
+    except Exception as e:
+        return path, None, 0, str(e)
+
+def class_files(folder):
+    """Audio files of one class: the folder's index.csv if it has one, else its audio files"""
+    index = os.path.join(folder, CLASS_INDEX)
+    if os.path.exists(index):
+        with open(index, newline="") as f:
+            return [os.path.normpath(os.path.join(folder, row["path"])) for row in csv.DictReader(f)]
+    files = []
+    for ext in AUDIO_EXTENSIONS:
+        files += glob.glob(os.path.join(folder, "*" + ext))
+    return files
+
+def list_sources(dataset_path=DATASET_PATH):
+    """Sorted (path, label) of every audio file in the class folders"""
+    sources = []
+    for folder, label in CLASSES.items():
+        sources += [(p, label) for p in class_files(os.path.join(dataset_path, folder))]
+    return sorted(sources)
+
+def _stats(paths):
+    stats = [os.stat(p) for p in paths]
+    return (np.array([s.st_size for s in stats], dtype=np.int64),
+            np.array([s.st_mtime_ns for s in stats], dtype=np.int64))
+
+def is_up_to_date(corpus_dir, sources):
+    """True if the corpus holds exactly these files, unchanged since it was built"""
+    try:
+        corpus = AudioCorpus(corpus_dir)
+    except FileNotFoundError:
+        return False
+    if {p for p, _ in sources} != set(corpus.index["path"]) | set(corpus.failed):
+        return False
+    sizes, mtimes = _stats(corpus.index["path"])
+    return np.array_equal(sizes, corpus.index["size"]) and np.array_equal(mtimes, corpus.index["mtime_ns"])
+
+def build_corpus(sources, corpus_dir=CORPUS_DIR, workers=1, max_seconds=MAX_SECONDS):
+    """
+    Decode every source once and pack it into a 16 kHz mono int16 corpus
+
+    Writes one int16 blob of concatenated clips plus an index of per-clip
+    offsets, lengths, labels and source stats. Files that fail to decode are
+    listed in corpus.json and left out.
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    max_len = int(SAMPLE_RATE * max_seconds)
+    labels = dict(sources)
+    jobs = [(path, max_len) for path, _ in sources]
+
+    index = {k: [] for k in ["path", "label", "offset", "length", "source_rate"]}
+    failed = {}
+    offset = 0
+
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(decode_job, jobs, chunksize=16)
+    else:
+        executor = None
+        results = map(decode_job, jobs)
+
+    tmp_path = os.path.join(corpus_dir, AUDIO_FILE + ".tmp")
+    try:
+        with open(tmp_path, "wb") as blob:
+            for i, (path, clip, rate, error) in enumerate(results):
+                if error is not None:
+                    failed[path] = error
+                    continue
+                blob.write(clip.tobytes())
+                for key, value in [("path", path), ("label", labels[path]), ("offset", offset),
+                                   ("length", len(clip)), ("source_rate", rate)]:
+                    index[key].append(value)
+                offset += len(clip)
+                if (i + 1) % 500 == 0:
+                    print(f"   Decoded {i + 1}/{len(jobs)}...")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    os.replace(tmp_path, os.path.join(corpus_dir, AUDIO_FILE))
+    sizes, mtimes = _stats(index["path"])
+    np.savez(os.path.join(corpus_dir, INDEX_FILE),
+             path=np.array(index["path"], dtype=str), size=sizes, mtime_ns=mtimes,
+             **{k: np.array(index[k], dtype=np.int64)
+                for k in ["label", "offset", "length", "source_rate"]})
+    with open(os.path.join(corpus_dir, META_FILE), "w") as f:
+        json.dump({"dtype": "int16", "sample_rate": SAMPLE_RATE, "max_seconds": max_seconds,
+                   "clips": len(index["path"]), "samples": offset, "failed": failed}, f, indent=4)
+
+    return len(index["path"]), failed
+
+def load_fresh_corpus(dataset_path=DATASET_PATH, corpus_dir=CORPUS_DIR):
+    """The corpus if it matches the dataset folders, else None (callers fall back to WAV decoding)"""
+    if not os.path.exists(os.path.join(corpus_dir, INDEX_FILE)):
+        return None
+    if not is_up_to_date(corpus_dir, list_sources(dataset_path)):
+        print(f"⚠️ {corpus_dir} is out of date, decoding WAVs instead (re-run audio_corpus.py)")
+        return None
+    return AudioCorpus(corpus_dir)
+
+class AudioCorpus:
+    """
+    Read-only view of a packed audio corpus
+
+    corpus[i] is a zero-copy int16 slice of the memory-mapped blob;
+    padded_batch(rows) returns float32 clips zero-padded to the longest one.
+    """
+
+    def __init__(self, corpus_dir=CORPUS_DIR):
+        self.corpus_dir = corpus_dir
+
+        with np.load(os.path.join(corpus_dir, INDEX_FILE), allow_pickle=False) as index:
+            self.index = {k: index[k] for k in index.files}
+        with open(os.path.join(corpus_dir, META_FILE)) as f:
+            self.failed = json.load(f).get("failed", {})
+
+        path = os.path.join(corpus_dir, AUDIO_FILE)
+        if os.path.getsize(path) > 0:
+            self.audio = np.memmap(path, dtype=np.int16, mode="r")
+        else:
+            self.audio = np.empty(0, dtype=np.int16)
+        self._rows = {p: i for i, p in enumerate(self.index["path"])}
+
+    def __len__(self):
+        return len(self.index["path"])
+
+    def __getitem__(self, i):
+        offset = self.index["offset"][i]
+        return self.audio[offset:offset + self.index["length"][i]]
+
+    def rows(self, paths):
+        """Corpus row of every path"""
+        return np.array([self._rows[str(p)] for p in paths], dtype=np.int64)
+
+    def padded_batch(self, rows):
+        """((B, longest) float32 clips scaled like tf.audio.decode_wav, (B,) int32 lengths)"""
+        lengths = self.index["length"][rows].astype(np.int32)
+        out = np.zeros((len(rows), max(lengths.max(initial=0), 1)), dtype=np.float32)
+        for j, i in enumerate(rows):
+            out[j, :lengths[j]] = self[i]
+        out /= 32768
+        return out, lengths
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode dataset audio into a 16 kHz int16 corpus")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-seconds", type=float, default=MAX_SECONDS)
+    parser.add_argument("--force", action="store_true", help="rebuild even if nothing changed")
+    args = parser.parse_args()
+
+    sources = list_sources()
+    print(f"📂 Found {len(sources)} audio files in {DATASET_PATH}")
+
+    if not args.force and is_up_to_date(CORPUS_DIR, sources):
+        print(f"✅ Corpus in {CORPUS_DIR} is up to date.")
+    else:
+        n_clips, failed = build_corpus(sources, CORPUS_DIR, args.workers, args.max_seconds)
+        for path, error in list(failed.items())[:10]:
+            print(f"   ⚠️ {path}: {error}")
+        print(f"🚀 DONE! Packed {n_clips} clips into {CORPUS_DIR} ({len(failed)} failed)")
@@ -0,0 +1,120 @@
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import tensorflow as tf
+from scipy.io import wavfile
+from audio_cache import add_noise_and_normalize
+from cough_dsp import ONSET_THRESHOLD, PRE_ROLL, load_wav_16k_mono, clean_window_batches
+
+WINDOW_SIZE = 32000
+DOWNSAMPLE = 2
+KERNEL_SIZE = 30
+
+def make_synthetic_wavs(root, n_files=400, min_len=8000, max_len=48000, seed=42):
+    """Write 16 kHz mono int16 WAVs: noise floor plus a tonal burst in most clips"""
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(n_files):
+        n = int(rng.integers(min_len, max_len))
+        x = rng.normal(0, 0.02, n)
+        if i % 4:
+            start = int(rng.integers(0, n - 4000))
+            x[start:start + 4000] += np.sin(np.arange(4000) * 0.3) * rng.uniform(0.2, 0.9)
+        path = os.path.join(root, f"clip_{i:05d}.wav")
+        wavfile.write(path, 16000, (np.clip(x, -1, 1) * 32767).astype(np.int16))
+        paths.append(path)
+    return paths
+
+def preprocess_single(file_path, mode="onset", noise=True):
+    """The previous per-file preprocess: conv1d on a batch of one and tensor if-branches"""
+    wav, _ = load_wav_16k_mono(file_path)
+
+    wav_expanded = tf.expand_dims(tf.expand_dims(wav, 0), -1)
+    kernel = tf.ones([KERNEL_SIZE, 1, 1]) / KERNEL_SIZE
+    low_freq = tf.squeeze(tf.nn.conv1d(wav_expanded, kernel, stride=1, padding='SAME'))
+    wav = wav - low_freq
+
+    abs_wav = tf.math.abs(wav)
+    if mode == "onset":
+        indices = tf.where(tf.cast(abs_wav > ONSET_THRESHOLD, tf.int32))
+        if tf.shape(indices)[0] > 0:
+            start_index = tf.cast(indices[0][0] - PRE_ROLL, tf.int32)
+        else:
+            start_index = tf.cast((tf.shape(wav)[0] // 2) - (WINDOW_SIZE // 2), tf.int32)
+    else:
+        start_index = tf.cast(tf.argmax(abs_wav), tf.int32) - (WINDOW_SIZE // 2)
+    if start_index < 0:
+        start_index = tf.cast(0, tf.int32)
+
+    wav_window = wav[start_index:start_index + WINDOW_SIZE]
+    required_padding = WINDOW_SIZE - tf.shape(wav_window)[0]
+    if required_padding > 0:
+        wav_window = tf.concat([wav_window, tf.zeros([required_padding], dtype=tf.float32)], 0)
+    wav_final = wav_window[::DOWNSAMPLE]
+
+    if noise:
+        noise_level = tf.random.uniform([], minval=0.01, maxval=0.1)
+        wav_final = wav_final + tf.random.normal(tf.shape(wav_final), stddev=noise_level)
+        wav_final = wav_final / (tf.math.reduce_max(tf.math.abs(wav_final)) + 0.0001)
+    return tf.reshape(wav_final, [WINDOW_SIZE // DOWNSAMPLE])
+
+def per_file_pipeline(paths, mode, batch_size):
+    ds = tf.data.Dataset.from_tensor_slices(np.array(paths))
+    ds = ds.map(lambda p: preprocess_single(p, mode), num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+def batched_pipeline(paths, mode, batch_size):
+    ds = clean_window_batches(np.array(paths), mode, WINDOW_SIZE, DOWNSAMPLE, KERNEL_SIZE, batch_size)
+    return ds.map(add_noise_and_normalize)
+
+def time_pipeline(make, paths, mode, batch_size, repeats):
+    """Best-of-N wall time to drain the pipeline once"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in make(paths, mode, batch_size):
+            pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def check_parity(paths, mode, batch_size):
+    """Largest |difference| between per-file and batched clean windows"""
+    batched = np.concatenate(list(clean_window_batches(
+        np.array(paths), mode, WINDOW_SIZE, DOWNSAMPLE, KERNEL_SIZE, batch_size).as_numpy_iterator()))
+    single_fn = tf.function(lambda p: preprocess_single(p, mode, noise=False))
+    single = np.stack([single_fn(p).numpy() for p in paths])
+    return np.abs(batched - single).max()
+
+def run_benchmark(n_files, batch_size, repeats):
+    print("="*70)
+    print("⏱️  Cough Preprocessing Benchmark")
+    print("="*70)
+    print()
+
+    with tempfile.TemporaryDirectory() as root:
+        paths = make_synthetic_wavs(root, n_files)
+        print(f"📂 Synthetic clips: {len(paths)} WAVs @ 16 kHz, batch size {batch_size}")
+        print()
+
+        for mode in ["onset", "peak"]:
+            diff = check_parity(paths[:32], mode, batch_size)
+            assert diff < 1e-4, f"{mode}: batched windows differ by {diff}"
+
+            before = time_pipeline(per_file_pipeline, paths, mode, batch_size, repeats)
+            after = time_pipeline(batched_pipeline, paths, mode, batch_size, repeats)
+            print(f"   {mode:<6} per-file  {len(paths)/before:8.1f} ex/s")
+            print(f"   {mode:<6} batched   {len(paths)/after:8.1f} ex/s  x{before/after:.2f}  "
+                  f"(max |diff| {diff:.1e})")
+
+    print()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-file vs batched cough preprocessing")
+    parser.add_argument('--files', type=int, default=400)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    run_benchmark(args.files, args.batch_size, args.repeats)
@@ -0,0 +1,104 @@
+import numpy as np
+import tensorflow as tf
+
+ONSET_THRESHOLD = 0.05  # |sample| above this (after the high-pass) counts as the cough onset
+PRE_ROLL = 500          # Samples kept before the onset
+
+def load_wav_16k_mono(filename):
+    file_contents = tf.io.read_file(filename)
+    wav, sample_rate = tf.audio.decode_wav(file_contents, desired_channels=1)
+    wav = tf.squeeze(wav, axis=-1)
+    return wav, tf.shape(wav)[0]
+
+def _band_matrix(kernel_size, block):
+    """(block + kernel_size - 1, block) matrix whose column j averages inputs j .. j + kernel_size - 1"""
+    i = np.arange(block + kernel_size - 1)[:, None]
+    j = np.arange(block)[None, :]
+    return ((i >= j) & (i < j + kernel_size)).astype(np.float32) / kernel_size
+
+def box_highpass(wavs, lengths, kernel_size, block=64):
+    """
+    wav - moving average over kernel_size samples, for a zero-padded (B, T) batch
+
+    Same result as conv1d with a ones/kernel_size kernel and padding='SAME'.
+    The signal is cut into blocks that overlap by kernel_size - 1 samples and
+    every block is averaged with one matmul against a banded matrix, which
+    runs far faster on CPU than conv1d or cumsum. Samples past each clip's
+    length are zeroed.
+    """
+    left = (kernel_size - 1) // 2
+    right = kernel_size - 1 - left
+    length = tf.shape(wavs)[1]
+    n_blocks = (length + block - 1) // block
+
+    padded = tf.pad(wavs, [[0, 0], [left, right + (n_blocks + 1) * block - length]])
+    body = tf.reshape(padded[:, :n_blocks * block], [-1, n_blocks, block])
+    overlap = tf.reshape(padded[:, block:(n_blocks + 1) * block], [-1, n_blocks, block])
+    frames = tf.concat([body, overlap[:, :, :kernel_size - 1]], axis=2)
+
+    moving_avg = tf.matmul(frames, _band_matrix(kernel_size, block))
+    moving_avg = tf.reshape(moving_avg, [-1, n_blocks * block])[:, :length]
+
+    valid = tf.sequence_mask(lengths, length)
+    return tf.where(valid, wavs - moving_avg, 0.0)
+
+def window_starts(wavs, lengths, mode, window_size):
+    """
+    Start sample of each clip's window
+
+    mode="onset": PRE_ROLL before the first sample above ONSET_THRESHOLD,
+                  or centered when nothing crosses it
+    mode="peak":  centered on the loudest sample
+    """
+    loudness = tf.abs(wavs)
+    if mode == "onset":
+        length = tf.shape(wavs)[1]
+        positions = tf.range(length)[None, :]
+        first = tf.reduce_min(tf.where(loudness > ONSET_THRESHOLD, positions, length), axis=1)
+        centered = lengths // 2 - window_size // 2
+        starts = tf.where(first < length, first - PRE_ROLL, centered)
+    elif mode == "peak":
+        starts = tf.cast(tf.argmax(loudness, axis=1), tf.int32) - window_size // 2
+    else:
+        raise ValueError(f"Unknown window mode: {mode!r}")
+    return tf.maximum(starts, 0)
+
+def preprocess_batch(wavs, lengths, mode, window_size, downsample, kernel_size):
+    """
+    High-pass, window and downsample a zero-padded (B, T) batch of clips
+
+    Returns (B, window_size // downsample) float32 windows, zero-padded where
+    a window runs past the end of its clip.
+    """
+    lengths = tf.cast(lengths, tf.int32)
+    filtered = box_highpass(wavs, lengths, kernel_size)
+    starts = window_starts(filtered, lengths, mode, window_size)
+
+    # Gather only the kept samples; indices past a clip's end read as zero
+    length = tf.shape(filtered)[1]
+    offsets = tf.range(0, window_size, downsample, dtype=tf.int32)
+    positions = starts[:, None] + offsets[None, :]
+    rows = tf.range(tf.shape(filtered)[0])[:, None] * length
+    windows = tf.gather(tf.reshape(filtered, [-1]), tf.minimum(positions, length - 1) + rows)
+    return tf.where(positions < lengths[:, None], windows, 0.0)
+
+def clean_window_batches(files, mode, window_size, downsample, kernel_size, batch_size=64):
+    """tf.data pipeline of (B, window_size // downsample) clean windows, in file order"""
+    ds = tf.data.Dataset.from_tensor_slices(np.asarray(files, dtype=str))
+    ds = ds.map(load_wav_16k_mono, num_parallel_calls=tf.data.AUTOTUNE)
+    ds = ds.padded_batch(batch_size, padded_shapes=([None], []))
+    ds = ds.map(lambda wavs, lengths: preprocess_batch(wavs, lengths, mode, window_size,
+                                                       downsample, kernel_size))
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+def corpus_window_batches(corpus, files, mode, window_size, downsample, kernel_size, batch_size=64):
+    """Same batches as clean_window_batches, from pre-decoded clips of an AudioCorpus"""
+    def load(rows):
+        wavs, lengths = tf.numpy_function(corpus.padded_batch, [rows], [tf.float32, tf.int32])
+        wavs = tf.ensure_shape(wavs, [None, None])
+        lengths = tf.ensure_shape(lengths, [None])
+        return preprocess_batch(wavs, lengths, mode, window_size, downsample, kernel_size)
+
+    ds = tf.data.Dataset.from_tensor_slices(corpus.rows(files)).batch(batch_size)
+    ds = ds.map(load)
+    return ds.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,126 @@
+import json
+import numpy as np
+from scipy.fft import rfft
+
+SUBFRAME = 256          # Samples per analysis frame after the 2x downsample (32 ms at 8 kHz)
+TARGET_RECALL = 0.995   # Share of validation coughs the gate has to pass
+MARGIN = 0.25           # Bounds are widened by this share of the coughs' interquartile range
+FEATURES = ("energy_db", "zcr", "flux")
+GATE_FILE = "energy_gate.json"
+
+def _subframes(frames, subframe):
+    frames = np.asarray(frames, dtype=np.float32)
+    n_sub = frames.shape[1] // subframe
+    return frames[:, :n_sub * subframe].reshape(len(frames), n_sub, subframe)
+
+def _energy(sub):
+    """Loudest short-time energy (dB re full scale) and the subframe it is in"""
+    power = np.einsum("bts,bts->bt", sub, sub) / sub.shape[2]
+    loudest = power.argmax(axis=1)
+    return 10 * np.log10(power[np.arange(len(sub)), loudest] + 1e-10), loudest
+
+def _zcr(sub, loudest):
+    """Zero-crossing rate of the loudest subframe"""
+    signs = np.signbit(sub[np.arange(len(sub)), loudest])
+    return (signs[:, 1:] != signs[:, :-1]).mean(axis=1)
+
+def _flux(sub):
+    """Largest positive log-spectral flux between consecutive subframes"""
+    spectrum = rfft(sub, axis=2)
+    log_power = np.log10(spectrum.real**2 + spectrum.imag**2 + 1e-8)
+    rise = np.maximum(np.diff(log_power, axis=1), 0).mean(axis=2) / 2   # /2: log power -> log magnitude
+    return rise.max(axis=1, initial=0)
+
+def gate_features(frames, subframe=SUBFRAME):
+    """
+    (B, 3) cheap descriptors of high-passed, downsampled, un-normalized frames
+
+    energy_db: loudest short-time energy (dB re full scale)
+    zcr:       zero-crossing rate of the loudest subframe
+    flux:      largest positive log-spectral flux between consecutive subframes
+    Energy has to be taken before peak normalization, which erases level.
+    """
+    sub = _subframes(frames, subframe)
+    energy_db, loudest = _energy(sub)
+    return np.stack([energy_db, _zcr(sub, loudest), _flux(sub)], axis=1).astype(np.float32)
+
+class EnergyGate:
+    """
+    Per-feature bounds a window must fall within to reach the CNN
+
+    Energy and flux only have a lower bound; the zero-crossing rate has
+    both. tune() places each bound on the validation coughs so that at
+    most (1 - target_recall) of them are lost, then widens it by `margin`
+    interquartile ranges. Calling the gate on frames evaluates the
+    features cheapest first and stops early for frames already rejected.
+    """
+
+    def __init__(self, lower, upper, target_recall=TARGET_RECALL, subframe=SUBFRAME):
+        self.lower = np.asarray(lower, dtype=np.float32)
+        self.upper = np.asarray(upper, dtype=np.float32)
+        self.target_recall = target_recall
+        self.subframe = subframe
+
+    @classmethod
+    def tune(cls, positive_features, target_recall=TARGET_RECALL, margin=MARGIN, subframe=SUBFRAME):
+        features = np.asarray(positive_features, dtype=np.float32)
+        lower = np.full(features.shape[1], -np.inf, dtype=np.float32)
+        upper = np.full(features.shape[1], np.inf, dtype=np.float32)
+        bounds = [(0, "lower"), (1, "lower"), (1, "upper"), (2, "lower")]
+        if not len(features):
+            return cls(lower, upper, target_recall, subframe)
+        q1, q3 = np.percentile(features, [25, 75], axis=0)
+        slack = margin * (q3 - q1)
+
+        keep = np.ones(len(features), dtype=bool)
+        budget = int(np.floor((1 - target_recall) * len(features)))
+        for j, (f, side) in enumerate(bounds):
+            values = np.sort(features[keep, f])
+            k = min(budget // (len(bounds) - j), len(values) - 1)
+            if side == "lower":
+                lower[f] = values[k] - slack[f]
+                passed = keep & (features[:, f] >= lower[f])
+            else:
+                upper[f] = values[len(values) - 1 - k] + slack[f]
+                passed = keep & (features[:, f] <= upper[f])
+            budget -= int(keep.sum() - passed.sum())
+            keep = passed
+        return cls(lower, upper, target_recall, subframe)
+
+    def passes(self, features):
+        features = np.asarray(features)
+        return np.all((features >= self.lower) & (features <= self.upper), axis=1)
+
+    def __call__(self, frames):
+        """Boolean mask of the frames worth running the CNN on"""
+        sub = _subframes(frames, self.subframe)
+        energy_db, loudest = _energy(sub)
+        mask = (energy_db >= self.lower[0]) & (energy_db <= self.upper[0])
+
+        rows = np.flatnonzero(mask)
+        zcr = _zcr(sub[rows], loudest[rows])
+        rows = rows[(zcr >= self.lower[1]) & (zcr <= self.upper[1])]
+
+        flux = _flux(sub[rows])
+        rows = rows[(flux >= self.lower[2]) & (flux <= self.upper[2])]
+
+        mask[:] = False
+        mask[rows] = True
+        return mask
+
+    def to_dict(self):
+        return {"features": list(FEATURES), "subframe": self.subframe, "target_recall": self.target_recall,
+                "lower": [float(v) for v in self.lower], "upper": [float(v) for v in self.upper]}
+
+    def save(self, path=GATE_FILE, **extra):
+        with open(path, "w") as f:
+            json.dump(dict(self.to_dict(), **extra), f, indent=4)
+        return path
+
+    @classmethod
+    def load(cls, path=GATE_FILE):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("features") != list(FEATURES):
+            raise ValueError(f"{path} was tuned on {data.get('features')}, re-run tune_gate.py")
+        return cls(data["lower"], data["upper"], data["target_recall"], data["subframe"])
@@ -1,10 +1,17 @@
 import os
-import glob
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras import layers, models
 import matplotlib.pyplot as plt
 import sys
+from audio_cache import WINDOWS_FILE, cache_key, cached_windows, noisy_window_dataset, normalize_windows
+from cough_dsp import clean_window_batches, corpus_window_batches
+from audio_corpus import list_sources, load_fresh_corpus
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from c_header import write_c_header
+from calibration import (calibration_set, file_key, balanced_indices, representative_dataset,
+                         quantization_report, print_quantization_report, save_quantization_report)
 
 # --- CONFIGURATION (HIGH ACCURACY MODE) ---
 DATASET_PATH = "dataset"
@@ -13,11 +20,26 @@ DATASET_PATH = "dataset"
 MODEL_INPUT_LEN = 12000   
 EPOCHS = 60
 BATCH_SIZE = 32
+WINDOW_SIZE = 24000   # 1.5 seconds of raw audio, centered on the peak
+DOWNSAMPLE = 2
+KERNEL_SIZE = 30      # Box filter of the high-pass
+CALIBRATION_SAMPLES = 200   # Clean windows used to calibrate the int8 ranges
+HOLDOUT_SAMPLES = 256       # Unseen windows for the float vs int8 report
 
 # --- LOAD DATA ---
 print("📂 Loading Data...")
-files_neg = glob.glob(os.path.join(DATASET_PATH, "negative_class", "*.wav"))
-files_pos = glob.glob(os.path.join(DATASET_PATH, "positive_class", "*.wav"))
+# Prefer the 16 kHz corpus from audio_corpus.py (includes resampled WAVs and .webm coughs)
+corpus = load_fresh_corpus(DATASET_PATH)
+if corpus is not None:
+    files_neg = list(corpus.index["path"][corpus.index["label"] == 0])
+    files_pos = list(corpus.index["path"][corpus.index["label"] == 1])
+else:
+    # tf.audio.decode_wav only reads WAVs; negatives may come from sort_noise.py's index.csv
+    sources = list_sources(DATASET_PATH)
+    files_neg = [p for p, label in sources if label == 0 and p.endswith(".wav")]
+    files_pos = [p for p, label in sources if label == 1 and p.endswith(".wav")]
+source = "corpus" if corpus is not None else "wav"
+CACHE_DIR = os.path.join(DATASET_PATH, "cache", cache_key(f"peak-{source}", WINDOW_SIZE, DOWNSAMPLE, KERNEL_SIZE))
 
 # Combine
 files = files_neg + files_pos
@@ -40,67 +62,31 @@ train_labels, val_labels = labels[:split_idx], labels[split_idx:]
 print(f"📊 Training on {len(train_files)} samples, Validating on {len(val_files)} samples")
 
 # --- PREPROCESSING ---
-def load_wav_16k_mono(filename):
-    file_contents = tf.io.read_file(filename)
-    wav, sample_rate = tf.audio.decode_wav(file_contents, desired_channels=1)
-    wav = tf.squeeze(wav, axis=-1)
-    return wav
-
-def preprocess(file_path, label):
-    wav = load_wav_16k_mono(file_path)
-    
-    # 1. Tinny Mic Sim (High Pass Filter)
-    wav_expanded = tf.expand_dims(tf.expand_dims(wav, 0), -1)
-    kernel_size = 30 
-    kernel = tf.ones([kernel_size, 1, 1]) / kernel_size
-    low_freq = tf.nn.conv1d(wav_expanded, kernel, stride=1, padding='SAME')
-    low_freq = tf.squeeze(low_freq)
-    wav = wav - low_freq
-    
-    # 2. 🔴 SMARTER WINDOWING: Center on the LOUDEST point
-    WINDOW_SIZE = 24000 
-    
-    abs_wav = tf.math.abs(wav)
-    # Find the index of the absolute loudest sound
-    peak_index = tf.argmax(abs_wav)
-    peak_index = tf.cast(peak_index, tf.int32)
-    
-    # Start the window 12000 samples BEFORE the peak (centering it)
-    start_index = peak_index - (WINDOW_SIZE // 2)
-    
-    # Safety Check: Don't go below 0
-    if start_index < 0: 
-        start_index = tf.cast(0, tf.int32)
-
-    wav_window = wav[start_index : start_index + WINDOW_SIZE]
-    
-    # Pad with zeros if the window goes past the end of the file
-    required_padding = WINDOW_SIZE - tf.shape(wav_window)[0]
-    if required_padding > 0:
-        zero_padding = tf.zeros([required_padding], dtype=tf.float32)
-        wav_window = tf.concat([wav_window, zero_padding], 0)
-
-    # 3. 🔴 DOWNSAMPLE BY 2 (Better Quality)
-    wav_downsampled = wav_window[::2] 
-    
-    # 4. Noise Augmentation
-    noise_level = tf.random.uniform([], minval=0.01, maxval=0.1)
-    noise = tf.random.normal(shape=tf.shape(wav_downsampled), mean=0.0, stddev=noise_level, dtype=tf.float32)
-    wav_final = wav_downsampled + noise
-    
-    # Normalize
-    wav_final = wav_final / (tf.math.reduce_max(tf.math.abs(wav_final)) + 0.0001)
-    wav_final = tf.reshape(wav_final, [MODEL_INPUT_LEN, 1]) 
-    return wav_final, label
-
-# Create Datasets
-train_ds = tf.data.Dataset.from_tensor_slices((train_files, train_labels))
-train_ds = train_ds.map(preprocess, num_parallel_calls=tf.data.AUTOTUNE)
-train_ds = train_ds.cache().batch(BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
-
-val_ds = tf.data.Dataset.from_tensor_slices((val_files, val_labels))
-val_ds = val_ds.map(preprocess, num_parallel_calls=tf.data.AUTOTUNE)
-val_ds = val_ds.cache().batch(BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
+# 1. High-pass, 2. window centered on the loudest point, 3. downsample - on whole batches
+def make_batches(batch_files):
+    if corpus is not None:
+        return corpus_window_batches(corpus, batch_files, "peak", WINDOW_SIZE, DOWNSAMPLE, KERNEL_SIZE)
+    return clean_window_batches(batch_files, "peak", WINDOW_SIZE, DOWNSAMPLE, KERNEL_SIZE)
+
+# Decode + filter + window once; later runs read the float16 cache
+windows, rows = cached_windows(files, make_batches, CACHE_DIR, MODEL_INPUT_LEN)
+train_rows, val_rows = rows[:split_idx], rows[split_idx:]
+
+# Create Datasets (4. Noise Augmentation + Normalize run per batch, fresh every epoch)
+train_ds = noisy_window_dataset(windows, train_rows, train_labels, BATCH_SIZE)
+val_ds = noisy_window_dataset(windows, val_rows, val_labels, BATCH_SIZE)
+
+# --- CALIBRATION DATA ---
+# Clean (no noise), class-balanced windows with a fixed seed, cached with the window cache.
+# A cache hit can still hold rows of clips deleted since; those are unlabelled and never picked.
+window_labels = np.full(len(windows), -1, dtype=np.int64)
+window_labels[rows] = labels
+stale_rows = np.setdiff1d(np.arange(len(windows)), rows)
+X_cal, _, cal_rows = calibration_set(
+    windows, window_labels, n=CALIBRATION_SAMPLES, seed=42,
+    cache_file=os.path.join(CACHE_DIR, "calibration.npz"),
+    source_key=file_key(os.path.join(CACHE_DIR, WINDOWS_FILE)), transform=normalize_windows,
+    exclude=stale_rows)
 
 # --- MODEL (BIGGER & DEEPER) ---
 print("🏗️ Building 'High Accuracy' Model...")
@@ -159,22 +145,26 @@ plt.show()
 print("📦 Converting to TFLite...")
 converter = tf.lite.TFLiteConverter.from_keras_model(model)
 converter.optimizations = [tf.lite.Optimize.DEFAULT]
-def representative_dataset_gen():
-    for data, label in train_ds.take(100):
-        yield [data]
-converter.representative_dataset = representative_dataset_gen
+converter.representative_dataset = representative_dataset(X_cal)
 converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
 converter.inference_input_type = tf.int8
 converter.inference_output_type = tf.int8
 tflite_model = converter.convert()
 
-with open("model.h", "w") as f:
-    f.write("const unsigned char model_data[] = {\n")
-    for i, byte in enumerate(tflite_model):
-        f.write(f"0x{byte:02x}, ")
-        if (i + 1) % 12 == 0:
-            f.write("\n")
-    f.write("\n};\n")
-    f.write(f"const int model_data_len = {len(tflite_model)};")
+# Float vs int8 on windows the calibration (and training) never saw
+holdout = balanced_indices(window_labels, HOLDOUT_SAMPLES, seed=43,
+                           exclude=np.concatenate([cal_rows, train_rows, stale_rows]))
+if len(holdout):
+    quant = quantization_report(model, tflite_model, normalize_windows(windows[holdout]),
+                                window_labels[holdout], converter)
+    print("📏 Quantization error:")
+    print_quantization_report(quant)
+    save_quantization_report(quant, "quantization_report.json",
+                             {"samples": len(X_cal), "seed": 42, "cache": CACHE_DIR})
+else:
+    print("⚠️ Every window went into calibration, skipping the quantization report")
+
+if not write_c_header(tflite_model, "model.h", "model_data", source="for_new_board.py"):
+    print("model.h unchanged, not rewritten")
 
 print(f"✅ SUCCESS! Model Size: {len(tflite_model) / 1024:.2f} KB")
\ No newline at end of file
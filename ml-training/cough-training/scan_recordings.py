@@ -0,0 +1,328 @@
+import os
+import sys
+import csv
+import time
+import argparse
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.io import wavfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from tflite_bench import load_model_bytes
+from energy_gate import GATE_FILE, EnergyGate
+
+# --- CONFIGURATION (matches train_final.py) ---
+MODEL_PATH = "model.h"
+SAMPLE_RATE = 16000
+WINDOW_SIZE = 32000   # 2 seconds of raw audio per frame
+DOWNSAMPLE = 2
+KERNEL_SIZE = 30      # Box filter of the "tinny mic" high-pass
+HOP = 8000            # 0.5 s between frame starts
+BLOCK_FRAMES = 256    # Frames high-passed per block (~2 min of audio at the default hop)
+BATCH_SIZE = 32       # Frames per interpreter invoke
+THRESHOLD = 0.5       # P(cough) a frame needs to become a detection
+NMS_IOU = 0.3         # Overlapping detections above this IoU keep only the strongest
+
+def open_recording(path, rate=SAMPLE_RATE, channel=0):
+    """
+    int16 samples of a recording as a read-only memmap (nothing is loaded)
+
+    .wav files are mapped past their header (16-bit PCM; one channel of a
+    multi-channel file is a strided view). Anything else is raw
+    little-endian int16 at `rate`.
+    """
+    if path.lower().endswith(".wav"):
+        rate, data = wavfile.read(path, mmap=True)
+        if data.dtype != np.int16:
+            raise ValueError(f"{path}: expected 16-bit PCM, got {data.dtype}")
+        if data.ndim == 2:
+            data = data[:, channel]
+    else:
+        data = np.memmap(path, dtype="<i2", mode="r")
+    if rate != SAMPLE_RATE:
+        raise ValueError(f"{path}: expected {SAMPLE_RATE} Hz audio, got {rate} Hz")
+    return data
+
+def highpass_downsampled(audio, start, stop):
+    """
+    box_highpass(audio)[start:stop:DOWNSAMPLE] without filtering the rest
+
+    Reads audio[start - left : stop + right] only. The moving average comes
+    from a cumulative sum and is evaluated at the kept samples only.
+    Samples outside the recording read as zero, like the zero-padded
+    batches of cough_dsp.preprocess_batch.
+    """
+    left = (KERNEL_SIZE - 1) // 2
+    lo, hi = max(start - left, 0), min(stop + KERNEL_SIZE - 1 - left, len(audio))
+    x = np.zeros(stop - start + KERNEL_SIZE - 1)
+    if hi > lo:
+        x[lo - (start - left):hi - (start - left)] = audio[lo:hi]
+    x /= 32768.0   # tf.audio.decode_wav scaling
+
+    cumsum = np.concatenate([[0.0], np.cumsum(x)])
+    pos = np.arange(0, stop - start, DOWNSAMPLE)
+    out = x[pos + left] - (cumsum[pos + KERNEL_SIZE] - cumsum[pos]) / KERNEL_SIZE
+    out[start + pos >= len(audio)] = 0.0
+    return out.astype(np.float32)
+
+def frame_starts(n_samples, hop=HOP):
+    """Raw start sample of every frame; the last one reaches past the end (zero-padded)"""
+    return np.arange(0, max(n_samples - WINDOW_SIZE, 0) + hop, hop, dtype=np.int64)
+
+def frame_batches(audio, hop=HOP, batch_size=BATCH_SIZE, block_frames=BLOCK_FRAMES):
+    """
+    (starts, frames) batches of high-passed, downsampled frames
+
+    Each block of frames is high-passed once; its frames are strided
+    views into that block, so overlapping frames share memory.
+    """
+    if hop % DOWNSAMPLE:
+        raise ValueError(f"hop must be a multiple of {DOWNSAMPLE}")
+    starts = frame_starts(len(audio), hop)
+    frame_len = WINDOW_SIZE // DOWNSAMPLE
+    for b in range(0, len(starts), block_frames):
+        block = starts[b:b + block_frames]
+        filtered = highpass_downsampled(audio, int(block[0]), int(block[-1]) + WINDOW_SIZE)
+        frames = sliding_window_view(filtered, frame_len)[::hop // DOWNSAMPLE]
+        for i in range(0, len(block), batch_size):
+            yield block[i:i + batch_size], frames[i:i + batch_size]
+
+class BatchedInterpreter:
+    """
+    P(cough) of frame batches through one single-threaded interpreter per worker thread
+
+    Frames are peak-normalized (normalize_windows) and quantized with the
+    model's input parameters inside the worker, so that work is spread
+    over the pool too.
+    """
+
+    def __init__(self, model_content, batch_size=BATCH_SIZE):
+        self.model_content = model_content
+        self.batch_size = batch_size
+        self._local = threading.local()
+
+    def _interpreter(self):
+        interpreter = getattr(self._local, "interpreter", None)
+        if interpreter is None:
+            interpreter = tf.lite.Interpreter(model_content=self.model_content, num_threads=1)
+            detail = interpreter.get_input_details()[0]
+            interpreter.resize_tensor_input(detail["index"], [self.batch_size] + list(detail["shape"][1:]))
+            interpreter.allocate_tensors()
+            self._local.interpreter = interpreter
+        return interpreter
+
+    def __call__(self, frames):
+        interpreter = self._interpreter()
+        inp = interpreter.get_input_details()[0]
+        out = interpreter.get_output_details()[0]
+
+        batch = np.zeros(inp["shape"], dtype=np.float32)
+        n = len(frames)
+        peak = np.abs(frames).max(axis=1, keepdims=True)
+        batch[:n, :, 0] = frames / (peak + 0.0001)
+
+        scale, zero_point = inp["quantization"]
+        if np.issubdtype(inp["dtype"], np.integer) and scale:
+            info = np.iinfo(inp["dtype"])
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+        interpreter.set_tensor(inp["index"], batch.astype(inp["dtype"]))
+        interpreter.invoke()
+
+        y = interpreter.get_tensor(out["index"])[:n].astype(np.float32)
+        scale, zero_point = out["quantization"]
+        if np.issubdtype(out["dtype"], np.integer) and scale:
+            y = (y - zero_point) * scale
+        return y.reshape(n, -1)[:, -1]
+
+def gated_batches(batches, gate, batch_size):
+    """The frames the gate passes, regrouped into full batches so skipped frames save whole invokes"""
+    held_starts, held_frames, held = [], [], 0
+    for starts, frames in batches:
+        mask = gate(frames)
+        if not mask.any():
+            continue
+        held_starts.append(starts[mask])
+        held_frames.append(frames[mask])
+        held += int(mask.sum())
+        while held >= batch_size:
+            starts_all, frames_all = np.concatenate(held_starts), np.concatenate(held_frames)
+            yield starts_all[:batch_size], frames_all[:batch_size]
+            held_starts, held_frames, held = [starts_all[batch_size:]], [frames_all[batch_size:]], held - batch_size
+    if held:
+        yield np.concatenate(held_starts), np.concatenate(held_frames)
+
+def score_frames(audio, runner, threads, hop=HOP, gate=None):
+    """
+    (starts, P(cough), frames scored) for every frame of the recording
+
+    With a gate (energy_gate.EnergyGate), frames it rejects score 0 and
+    never reach the CNN. At most 2 batches per thread are in flight.
+    """
+    starts = frame_starts(len(audio), hop)
+    scores = np.zeros(len(starts), dtype=np.float32)
+    batches = frame_batches(audio, hop, runner.batch_size)
+    if gate is not None:
+        batches = gated_batches(batches, gate, runner.batch_size)
+
+    scored = 0
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        pending = deque()
+
+        def collect():
+            nonlocal scored
+            done_starts, future = pending.popleft()
+            scores[done_starts // hop] = future.result()
+            scored += len(done_starts)
+
+        for batch_starts, frames in batches:
+            pending.append((batch_starts, pool.submit(runner, frames)))
+            if len(pending) >= 2 * threads:
+                collect()
+        while pending:
+            collect()
+    return starts, scores, scored
+
+def non_max_suppression(starts, scores, threshold=THRESHOLD, iou=NMS_IOU, length=WINDOW_SIZE):
+    """Indices of the frames kept: above threshold, strongest first, overlaps above iou dropped"""
+    candidates = np.flatnonzero(scores >= threshold)
+    candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+    kept = []
+    for i in candidates:
+        overlap = np.maximum(length - np.abs(starts[kept] - starts[i]), 0) if kept else np.zeros(0)
+        if not np.any(overlap / (2 * length - overlap) > iou):
+            kept.append(i)
+    return np.sort(np.array(kept, dtype=np.int64))
+
+def scan_recording(path, runner, threads, hop=HOP, threshold=THRESHOLD, iou=NMS_IOU, gate=None):
+    """Timestamped detections of one recording, plus how long the scan took"""
+    audio = open_recording(path)
+    start = time.perf_counter()
+    starts, scores, scored = score_frames(audio, runner, threads, hop, gate)
+    kept = non_max_suppression(starts, scores, threshold, iou)
+    elapsed = time.perf_counter() - start
+
+    detections = [{"file": path,
+                   "start_s": round(starts[i] / SAMPLE_RATE, 3),
+                   "end_s": round(min(starts[i] + WINDOW_SIZE, len(audio)) / SAMPLE_RATE, 3),
+                   "score": round(float(scores[i]), 4)} for i in kept]
+    stats = {"audio_s": len(audio) / SAMPLE_RATE, "frames": int(len(starts)), "cnn_frames": scored,
+             "elapsed_s": elapsed}
+    return detections, stats
+
+def write_detections(detections, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["file", "start_s", "end_s", "score"])
+        writer.writeheader()
+        writer.writerows(detections)
+
+# --- BENCHMARK ---
+
+def make_synthetic_recording(path, minutes, seed=42):
+    """16 kHz int16 WAV: noise floor with a short burst every ~10 s"""
+    rng = np.random.default_rng(seed)
+    n = int(minutes * 60 * SAMPLE_RATE)
+    x = rng.normal(0, 0.02, n).astype(np.float32)
+    for start in range(SAMPLE_RATE * 5, n - 8000, SAMPLE_RATE * 10):
+        start += int(rng.integers(-SAMPLE_RATE, SAMPLE_RATE))
+        x[start:start + 6000] += (rng.normal(0, 0.4, 6000) * np.hanning(6000)).astype(np.float32)
+    wavfile.write(path, SAMPLE_RATE, (np.clip(x, -1, 1) * 32767).astype(np.int16))
+
+def check_preprocessing(audio, n_frames=8):
+    """Largest |difference| from cough_dsp.box_highpass on the same stretch of audio"""
+    from cough_dsp import box_highpass
+
+    stop = min(len(audio), (n_frames - 1) * HOP + WINDOW_SIZE)
+    wav = np.asarray(audio[:stop], dtype=np.float32) / 32768.0
+    reference = box_highpass(tf.constant(wav[None]), tf.constant([stop]), KERNEL_SIZE).numpy()[0]
+    diff = 0.0
+    for starts, frames in frame_batches(audio[:stop]):
+        for s, frame in zip(starts, frames):
+            expected = reference[s:s + WINDOW_SIZE:DOWNSAMPLE]
+            diff = max(diff, float(np.abs(frame[:len(expected)] - expected).max()))
+    return diff
+
+def run_benchmark(model_content, minutes, batch_size, gate=None):
+    print("="*70)
+    print("⏱️  Long-Recording Cough Scanner Benchmark")
+    print("="*70)
+    print()
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "recording.wav")
+        make_synthetic_recording(path, minutes)
+        audio = open_recording(path)
+        audio_s = len(audio) / SAMPLE_RATE
+        print(f"📼 Synthetic recording: {audio_s/60:.0f} min @ {SAMPLE_RATE} Hz, "
+              f"{len(frame_starts(len(audio)))} frames (hop {HOP / SAMPLE_RATE:.2f} s), batch {batch_size}")
+        print()
+
+        diff = check_preprocessing(audio)
+        assert diff < 1e-4, f"Strided preprocessing differs from box_highpass by {diff}"
+        print(f"🔍 Frames vs cough_dsp.box_highpass: max |diff| {diff:.1e}")
+        print()
+
+        start = time.perf_counter()
+        for _ in frame_batches(audio, batch_size=batch_size):
+            pass
+        prep = time.perf_counter() - start
+        print(f"   preprocessing only       {audio_s/prep:8.0f}x real-time")
+
+        for threads in sorted({1, os.cpu_count() or 1}):
+            detections, stats = scan_recording(path, BatchedInterpreter(model_content, batch_size), threads)
+            print(f"   full scan, {threads:>2} thread(s)  {audio_s/stats['elapsed_s']:8.0f}x real-time  "
+                  f"({stats['frames']/stats['elapsed_s']:.0f} frames/s, {len(detections)} detections)")
+
+        if gate is not None:
+            gated, gated_stats = scan_recording(path, BatchedInterpreter(model_content, batch_size), threads,
+                                                gate=gate)
+            kept = {d["start_s"] for d in detections}
+            skipped = 1 - gated_stats["cnn_frames"] / max(gated_stats["frames"], 1)
+            print(f"   energy-gated scan        {audio_s/gated_stats['elapsed_s']:8.0f}x real-time  "
+                  f"(x{stats['elapsed_s']/gated_stats['elapsed_s']:.2f}, {skipped*100:.1f}% of frames skipped, "
+                  f"{sum(d['start_s'] in kept for d in gated)}/{len(detections)} detections kept)")
+    print()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan long 16 kHz recordings for coughs with the int8 model")
+    parser.add_argument("recordings", nargs="*", help=".wav files or raw little-endian int16 files")
+    parser.add_argument("--model", default=MODEL_PATH, help=".tflite file or C header from train_final.py")
+    parser.add_argument("--hop", type=float, default=HOP / SAMPLE_RATE, help="seconds between frames")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--iou", type=float, default=NMS_IOU)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", default="cough_detections.csv")
+    parser.add_argument("--gate", nargs="?", const=GATE_FILE, default=None,
+                        help=f"energy gate from tune_gate.py (default file: {GATE_FILE})")
+    parser.add_argument("--benchmark", action="store_true", help="time a synthetic recording instead")
+    parser.add_argument("--minutes", type=float, default=10, help="length of the benchmark recording")
+    args = parser.parse_args()
+
+    model_content = load_model_bytes(args.model)
+    gate = EnergyGate.load(args.gate) if args.gate else None
+    if args.benchmark:
+        run_benchmark(model_content, args.minutes, args.batch_size, gate)
+        sys.exit()
+    if not args.recordings:
+        parser.error("no recordings given (or use --benchmark)")
+
+    hop = int(round(args.hop * SAMPLE_RATE / DOWNSAMPLE)) * DOWNSAMPLE
+    runner = BatchedInterpreter(model_content, args.batch_size)
+    all_detections = []
+    for path in args.recordings:
+        detections, stats = scan_recording(path, runner, args.threads, hop, args.threshold, args.iou, gate)
+        all_detections += detections
+        gated = f", CNN on {stats['cnn_frames']}/{stats['frames']} frames" if gate is not None else ""
+        print(f"{path}: {len(detections)} coughs in {stats['audio_s']/60:.1f} min "
+              f"({stats['audio_s']/stats['elapsed_s']:.0f}x real-time{gated})")
+        for d in detections:
+            print(f"   {d['start_s']:10.2f}s - {d['end_s']:10.2f}s  p={d['score']:.2f}")
+
+    write_detections(all_detections, args.output)
+    print(f"💾 Saved: {args.output}")
@@ -1,65 +1,132 @@
 import json
 import shutil
 import os
-import glob
+import argparse
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 
 # --- CONFIGURATION ---
 # We point to the folder containing the thousands of mixed json/wav files
-SOURCE_FOLDER = './public_dataset'   
-TARGET_FOLDER = './positive_class'   
+SOURCE_FOLDER = './public_dataset'
+TARGET_FOLDER = './positive_class'
 MIN_CONFIDENCE = 0.85                # Strict filter: Only keep if > 85% sure it's a cough
 MAX_FILES_NEEDED = 3000              # Stop after we have enough
+MANIFEST_FILE = os.path.join(TARGET_FOLDER, 'manifest.jsonl')  # One line per scanned JSON
+SCAN_WORKERS = 16                    # Reading JSONs is I/O-bound, so threads are enough
+SCAN_BATCH = 256                     # JSONs read per round; we never scan far past the target
+AUDIO_EXTENSIONS = ('.webm', '.wav') # Dataset has both; .webm wins when both exist
 
-def run_sorting_flow():
+def iter_json_files(folder):
+    """Lazily yield *.json paths, so stopping early never lists the rest of the folder"""
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json') and entry.is_file():
+                yield entry.path
+
+def find_audio(base_name):
+    """First existing audio file next to the JSON, or None"""
+    for ext in AUDIO_EXTENSIONS:
+        try:
+            os.stat(base_name + ext)
+            return base_name + ext
+        except FileNotFoundError:
+            continue
+    return None
+
+def score_report(json_path):
+    """(json_path, score, audio path or None) for one report card; corrupt files score None"""
+    try:
+        # 3. Read the JSON Report Card
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+        # 4. Check the Score (Convert string "0.98" to float 0.98)
+        score = float(data.get('cough_detected', 0))
+    except Exception:
+        return json_path, None, None
+
+    # 5. DECISION TIME: only look for audio when it's a good cough
+    audio = find_audio(os.path.splitext(json_path)[0]) if score >= MIN_CONFIDENCE else None
+    return json_path, score, audio
+
+def link_or_copy(src, dst, copy=False):
+    """Hard-link src to dst when the filesystem allows it, else copy; returns the method used"""
+    if os.path.exists(dst):
+        return 'existing'
+    if not copy:
+        try:
+            os.link(src, dst)
+            return 'link'
+        except OSError:
+            pass  # Cross-device or no hard-link support
+    shutil.copy2(src, dst)
+    return 'copy'
+
+def load_manifest(path):
+    """JSON path -> manifest entry, from a previous (possibly interrupted) run"""
+    entries = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn last line of an interrupted run
+                entries[entry['json']] = entry
+    return entries
+
+def run_sorting_flow(workers=SCAN_WORKERS, copy=False, fresh=False):
     # 1. Create destination if missing
     if not os.path.exists(TARGET_FOLDER):
         os.makedirs(TARGET_FOLDER)
         print(f"✅ Created target folder: {TARGET_FOLDER}")
 
-    count = 0
-    # 2. Grab all JSON report cards
-    json_files = glob.glob(os.path.join(SOURCE_FOLDER, "*.json"))
-    print(f"🔍 Found {len(json_files)} files to scan...")
+    # 2. Resume: every JSON already in the manifest is skipped
+    if fresh and os.path.exists(MANIFEST_FILE):
+        os.remove(MANIFEST_FILE)
+    done = load_manifest(MANIFEST_FILE)
+    count = sum(1 for entry in done.values() if entry.get('audio'))
+    if done:
+        print(f"↩️  Resuming: {len(done)} files already scanned, {count} coughs selected")
 
-    for json_path in json_files:
-        if count >= MAX_FILES_NEEDED:
-            print("🎉 Target reached! Stopping.")
-            break
+    pending = (p for p in iter_json_files(SOURCE_FOLDER) if p not in done)
+    methods = {'link': 0, 'copy': 0, 'existing': 0}
+    scanned = 0
 
-        try:
-            # 3. Read the JSON Report Card
-            with open(json_path, 'r') as f:
-                data = json.load(f)
-            
-            # 4. Check the Score (Convert string "0.98" to float 0.98)
-            score = float(data.get('cough_detected', 0))
-            
-            # 5. DECISION TIME: Is it a good cough?
-            if score >= MIN_CONFIDENCE:
-                # Find the matching audio file (it has the same name as the json)
-                base_name = os.path.splitext(json_path)[0]
-                
-                # Check for .webm or .wav (Dataset has both)
-                if os.path.exists(base_name + ".webm"):
-                    src_audio = base_name + ".webm"
-                elif os.path.exists(base_name + ".wav"):
-                    src_audio = base_name + ".wav"
-                else:
-                    continue # Skip if audio is missing
-
-                # 6. Copy valid file to the clean folder
-                dst_audio = os.path.join(TARGET_FOLDER, os.path.basename(src_audio))
-                shutil.copy(src_audio, dst_audio)
-                
-                count += 1
-                if count % 100 == 0:
-                    print(f"   [Progress] Collected {count} clean coughs...")
-
-        except Exception as e:
-            # Skip corrupt files silently
-            continue
+    with ThreadPoolExecutor(max_workers=workers) as executor, open(MANIFEST_FILE, 'a') as manifest:
+        while count < MAX_FILES_NEEDED:
+            batch = list(islice(pending, SCAN_BATCH))
+            if not batch:
+                break
+
+            # Results come back in directory order, so the selection is deterministic
+            for json_path, score, src_audio in executor.map(score_report, batch):
+                if count >= MAX_FILES_NEEDED:
+                    break
+                scanned += 1
 
+                entry = {'json': json_path, 'score': score, 'audio': None}
+                if src_audio is not None:
+                    # 6. Link valid file into the clean folder
+                    dst_audio = os.path.join(TARGET_FOLDER, os.path.basename(src_audio))
+                    methods[link_or_copy(src_audio, dst_audio, copy)] += 1
+                    entry['audio'] = dst_audio
+                    count += 1
+                    if count % 100 == 0:
+                        print(f"   [Progress] Collected {count} clean coughs...")
+
+                manifest.write(json.dumps(entry) + '\n')
+            manifest.flush()
+
+    if count >= MAX_FILES_NEEDED:
+        print("🎉 Target reached! Stopping.")
+    print(f"🔍 Scanned {scanned} new files ({methods['link']} linked, {methods['copy']} copied)")
     print(f"🚀 DONE! You now have {count} high-quality files in '{TARGET_FOLDER}'.")
 
 if __name__ == "__main__":
-    run_sorting_flow()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Select confident coughs from the public dataset")
+    parser.add_argument('--workers', type=int, default=SCAN_WORKERS)
+    parser.add_argument('--copy', action='store_true', help="always copy instead of hard-linking")
+    parser.add_argument('--fresh', action='store_true', help="ignore the manifest and rescan")
+    args = parser.parse_args()
+
+    run_sorting_flow(args.workers, args.copy, args.fresh)
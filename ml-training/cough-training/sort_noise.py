@@ -1,65 +1,180 @@
 import os
+import csv
+import json
+import wave
+import zlib
 import shutil
-import random
-import glob
+import argparse
+import numpy as np
 
 # --- CONFIGURATION ---
 SOURCE_NOISE_DIR = './google_speech'  # The folder you just downloaded
 TARGET_DIR = './negative_class'       # Where the "Not Coughs" go
 TARGET_COUNT = 3000                   # Must match your Cough count (50/50 Rule)
+SEED = 42                             # Same seed + count = same selection
 
 # We want a mix of speech and background noise
 # We will skip words that sound like coughs (like "cough" if it exists)
-SKIP_FOLDERS = ['cough'] 
+SKIP_FOLDERS = ['cough']
 
-def prepare_negative_dataset():
+# Relative share per category (e.g. {'_background_noise_': 3}); unlisted categories weigh 1
+CATEGORY_WEIGHTS = {}
+
+# One-time scan of the speech corpus, refreshed per category when its folder changes
+MANIFEST_FILE = './google_speech_manifest.json'
+# What the trainers (and audio_corpus.py) read instead of globbing TARGET_DIR
+INDEX_FILE = os.path.join(TARGET_DIR, 'index.csv')
+
+def wav_duration(path):
+    """Seconds of audio from the WAV header, or -1 if it can't be read"""
+    try:
+        with wave.open(path, 'rb') as w:
+            return w.getnframes() / w.getframerate()
+    except Exception:
+        return -1.0
+
+def scan_category(folder):
+    """[relative path, duration] of every WAV under one category folder"""
+    files = []
+    for root, dirs, names in os.walk(folder):
+        for name in names:
+            if name.endswith('.wav'):
+                path = os.path.join(root, name)
+                files.append([os.path.relpath(path, SOURCE_NOISE_DIR), wav_duration(path)])
+    return sorted(files)
+
+def load_manifest():
+    """
+    {category: {'mtime_ns', 'files'}} for the speech corpus
+
+    Only categories whose folder mtime changed (or that are new) are walked
+    again; a warm manifest costs one directory listing.
+    """
+    manifest = {}
+    if os.path.exists(MANIFEST_FILE):
+        with open(MANIFEST_FILE) as f:
+            manifest = json.load(f)
+
+    current = {}
+    rescanned = 0
+    with os.scandir(SOURCE_NOISE_DIR) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            mtime_ns = entry.stat().st_mtime_ns
+            cached = manifest.get(entry.name)
+            if cached is None or cached['mtime_ns'] != mtime_ns:
+                cached = {'mtime_ns': mtime_ns, 'files': scan_category(entry.path)}
+                rescanned += 1
+            current[entry.name] = cached
+
+    if rescanned or current.keys() != manifest.keys():
+        print(f"🔍 Scanned {rescanned} of {len(current)} categories into {MANIFEST_FILE}")
+        tmp_path = MANIFEST_FILE + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(current, f)
+        os.replace(tmp_path, MANIFEST_FILE)
+    return current
+
+def allocate(available, weights, total):
+    """Per-category counts summing to min(total, sum(available)), following weights"""
+    counts = {c: 0 for c in available}
+    open_cats = [c for c in available if available[c] > 0]
+    remaining = min(total, sum(available.values()))
+
+    # Hand out shares; whatever a small category can't take flows to the rest
+    while remaining > 0 and open_cats:
+        w = np.array([weights.get(c, 1) for c in open_cats], dtype=float)
+        share = np.floor(remaining * w / w.sum()).astype(int)
+        # Largest remainders get the leftover units
+        leftover = remaining - share.sum()
+        order = np.argsort(-(remaining * w / w.sum() - share), kind='stable')
+        share[order[:leftover]] += 1
+
+        for c, s in zip(open_cats, share):
+            take = min(s, available[c] - counts[c])
+            counts[c] += take
+            remaining -= take
+        open_cats = [c for c in open_cats if counts[c] < available[c]]
+    return counts
+
+def sample_files(manifest, target_count, seed=SEED):
+    """Stratified (category, relative path, duration) sample"""
+    categories = sorted(c for c in manifest if c not in SKIP_FOLDERS)
+    available = {c: len(manifest[c]['files']) for c in categories}
+    counts = allocate(available, CATEGORY_WEIGHTS, target_count)
+
+    selected = []
+    for c in categories:
+        # Per-category stream: raising TARGET_COUNT only appends to each category's picks
+        rng = np.random.default_rng([seed, zlib.crc32(c.encode())])
+        order = rng.permutation(available[c])[:counts[c]]
+        selected += [(c, *manifest[c]['files'][i]) for i in order]
+    return selected, counts
+
+def link_or_copy(src, dst):
+    """Hard-link src to dst when the filesystem allows it, else copy"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def remove_previous_links():
+    """Delete files a previous --link run put in TARGET_DIR"""
+    if not os.path.exists(INDEX_FILE):
+        return
+    with open(INDEX_FILE, newline='') as f:
+        for row in csv.DictReader(f):
+            path = os.path.normpath(os.path.join(TARGET_DIR, row['path']))
+            if os.path.dirname(path) == os.path.normpath(TARGET_DIR) and os.path.exists(path):
+                os.remove(path)
+
+def prepare_negative_dataset(target_count=TARGET_COUNT, seed=SEED, link=False):
     if not os.path.exists(TARGET_DIR):
         os.makedirs(TARGET_DIR)
         print(f"✅ Created folder: {TARGET_DIR}")
 
-    # 1. Gather ALL audio files from the Google dataset
-    print("🔍 Scanning for noise files (this might take 10 seconds)...")
-    all_noise_files = []
-    
-    # Walk through every subfolder (bed, bird, zero, etc.)
-    for root, dirs, files in os.walk(SOURCE_NOISE_DIR):
-        folder_name = os.path.basename(root)
-        if folder_name in SKIP_FOLDERS:
-            continue
-            
-        for file in files:
-            if file.endswith('.wav'):
-                full_path = os.path.join(root, file)
-                all_noise_files.append(full_path)
-
-    print(f"   Found {len(all_noise_files)} total noise candidates.")
-
-    # 2. Randomly select exactly 3,000 files
-    if len(all_noise_files) < TARGET_COUNT:
-        print(f"⚠️ Warning: Not enough files! Found {len(all_noise_files)}, need {TARGET_COUNT}")
-        selected_files = all_noise_files
-    else:
-        selected_files = random.sample(all_noise_files, TARGET_COUNT)
-
-    # 3. Copy them to the negative_class folder
-    print(f"🎲 Randomly selecting {len(selected_files)} files for the Negative Class...")
-    
-    count = 0
-    for src in selected_files:
-        # We rename them to avoid duplicate names (e.g. bed/01.wav vs bird/01.wav)
-        unique_name = f"noise_{count:04d}.wav"
-        dst = os.path.join(TARGET_DIR, unique_name)
-        
-        try:
-            shutil.copy(src, dst)
-            count += 1
-            if count % 500 == 0:
-                print(f"   Copied {count}...")
-        except Exception as e:
-            print(f"Error copying {src}: {e}")
-
-    print(f"🚀 DONE! You now have {count} noise files in '{TARGET_DIR}'.")
-    print(f"   Your dataset is now perfectly balanced (50/50).")
+    # 1. Manifest of the whole Google dataset (walked once, then cached)
+    manifest = load_manifest()
+    total = sum(len(manifest[c]['files']) for c in manifest if c not in SKIP_FOLDERS)
+    print(f"   Found {total} total noise candidates in {len(manifest)} categories.")
+
+    # 2. Stratified draw across categories
+    if total < target_count:
+        print(f"⚠️ Warning: Not enough files! Found {total}, need {target_count}")
+    selected, counts = sample_files(manifest, target_count, seed)
+    print(f"🎲 Selected {len(selected)} files from {sum(1 for n in counts.values() if n)} categories "
+          f"(seed {seed})")
+
+    # 3. Reference the sources in the index, or hard-link them into TARGET_DIR
+    remove_previous_links()
+    rows = []
+    for i, (category, rel_path, duration) in enumerate(selected):
+        src = os.path.join(SOURCE_NOISE_DIR, rel_path)
+        if link:
+            # Category in the name avoids clashes (e.g. bed/01.wav vs bird/01.wav)
+            name = f"noise_{category}_{i:04d}.wav"
+            link_or_copy(src, os.path.join(TARGET_DIR, name))
+            path = name
+        else:
+            # Absolute, so TARGET_DIR can be moved into the dataset folder
+            path = os.path.abspath(src)
+        rows.append({'path': path, 'category': category, 'duration': f"{duration:.3f}"})
+
+    with open(INDEX_FILE, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['path', 'category', 'duration'])
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"🚀 DONE! {len(rows)} noise files listed in '{INDEX_FILE}'"
+          f"{' and linked into ' + repr(TARGET_DIR) if link else ''}.")
 
 if __name__ == "__main__":
-    prepare_negative_dataset()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sample the negative class from the speech corpus")
+    parser.add_argument('--count', type=int, default=TARGET_COUNT)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--link', action='store_true',
+                        help="hard-link the picks into TARGET_DIR instead of only indexing them")
+    args = parser.parse_args()
+
+    prepare_negative_dataset(args.count, args.seed, args.link)
@@ -0,0 +1,169 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import layers, models
+
+from audio_cache import noisy_window_dataset, normalize_windows
+from tune_gate import load_cached_windows, split_validation
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from calibration import balanced_indices, representative_dataset, tflite_predict
+from sweep import (SharedArrays, last_rungs, param_grid, pareto_front, print_table,
+                   successive_halving, write_results)
+from tflite_bench import latency_stats, time_interpreter
+from tflite_budget import analyze_model
+
+# --- CONFIGURATION (matches train_final.py) ---
+TARGET_CHIP = "esp32s3"
+CALIBRATION_SAMPLES = 200
+VALIDATION_SHARE = 0.2
+
+# Centred on train_final.py's model: 16000 inputs, Conv1D 8 -> 16, Dense 32, batch 64.
+# input_len < 16000 takes every (16000 // input_len)-th sample of the cached windows.
+SPACE = {
+    "input_len": [16000, 8000, 4000],
+    "filters1": [4, 8, 16],
+    "filters2": [8, 16, 32],
+    "dense": [16, 32],
+    "batch_size": [32, 64],
+}
+OBJECTIVE = "int8_accuracy"
+COSTS = ("esp32_latency_ms", "arena_bytes", "size_bytes")
+
+def build_model(input_len, filters1, filters2, dense):
+    model = models.Sequential([
+        layers.Input(shape=(input_len, 1)),
+        layers.Conv1D(filters1, 5, strides=2, activation='relu', padding='same'),
+        layers.MaxPooling1D(4),
+        layers.Conv1D(filters2, 3, activation='relu', padding='same'),
+        layers.MaxPooling1D(4),
+        layers.GlobalAveragePooling1D(),
+        layers.Dense(dense, activation='relu'),
+        layers.Dense(2, activation='softmax')
+    ])
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+def set_tf_threads(threads):
+    """Worker initializer: one trial per worker shouldn't fan out over every core"""
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(threads)
+
+def decimated(windows, input_len):
+    return windows[:, ::windows.shape[1] // input_len][:, :input_len]
+
+def train_trial(params, budget, data):
+    """Train for `budget` epochs, convert to int8 and score float and int8 on the validation rows"""
+    tf.keras.utils.set_random_seed(42)
+    windows = decimated(data["windows"], params["input_len"])
+    labels, train, val = data["labels"], data["train"], data["val"]
+
+    # Shuffled once, as train_final.py shuffles its file list
+    order = np.random.default_rng(42).permutation(train)
+    ds = noisy_window_dataset(windows, order, labels[order], params["batch_size"])
+    n_pos = int((labels[train] == 1).sum())
+    n_neg = len(train) - n_pos
+    class_weight = {0: len(train) / (2.0 * max(n_neg, 1)), 1: len(train) / (2.0 * max(n_pos, 1))}
+
+    model = build_model(params["input_len"], params["filters1"], params["filters2"], params["dense"])
+    model.fit(ds, epochs=int(budget), class_weight=class_weight, verbose=0)
+
+    cal = train[balanced_indices(labels[train], CALIBRATION_SAMPLES)]
+    X_cal = normalize_windows(windows[cal])
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset(X_cal)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    tflite_model = converter.convert()
+
+    X_val = normalize_windows(windows[val])
+    y_val = labels[val]
+    float_pred = model.predict(X_val, batch_size=256, verbose=0).argmax(axis=1)
+    int8_pred = tflite_predict(tflite_model, X_val).argmax(axis=1)
+    positive = y_val == 1
+
+    budget_report = analyze_model(tflite_model, TARGET_CHIP)
+    metrics = {
+        "float_accuracy": float((float_pred == y_val).mean()),
+        "int8_accuracy": float((int8_pred == y_val).mean()),
+        "int8_recall": float((int8_pred[positive] == 1).mean()) if positive.any() else float("nan"),
+        "params": int(model.count_params()),
+        "macs": int(budget_report["macs"]),
+        "size_bytes": int(len(tflite_model)),
+        "arena_bytes": int(budget_report["arena"]["total_bytes"]),
+        "esp32_latency_ms": float(budget_report["latency_ms"]),
+    }
+    return metrics, tflite_model
+
+def run_sweep(args):
+    print("="*70)
+    print("🔍 Cough Model Hyperparameter Sweep")
+    print("="*70)
+    print()
+
+    loaded = load_cached_windows()
+    if loaded is None:
+        print("❌ No window cache found (run train_final.py first)")
+        return
+    windows, labels, cache_dir = loaded
+    val, train = split_validation(labels, VALIDATION_SHARE)
+    configs = param_grid(SPACE, args.trials)
+
+    # The float16 cache is read from disk once; workers map the same pages
+    with SharedArrays({"windows": windows, "labels": labels, "train": train, "val": val}) as shared:
+        print(f"📂 {cache_dir}: {len(train)} train / {len(val)} validation windows "
+              f"in {shared.nbytes / 1e6:.1f} MB of shared memory")
+        print(f"   {len(configs)} configs, {args.workers} worker(s) x {args.threads} thread(s), "
+              f"epochs {args.min_epochs} -> {args.max_epochs} (eta {args.eta})")
+        print()
+
+        start = time.perf_counter()
+        rows, tflite_models = successive_halving(train_trial, configs, shared.spec(), OBJECTIVE,
+                                                 args.min_epochs, args.max_epochs, args.eta,
+                                                 args.workers, args.threads, set_tf_threads)
+        elapsed = time.perf_counter() - start
+
+        # Measured here, one model at a time, so trials still training don't skew it
+        final = last_rungs(rows)
+        for row in final:
+            X_probe = normalize_windows(decimated(windows[val[:16]], row["param.input_len"]))
+            stats = latency_stats(time_interpreter(tflite_models[row["trial"]], X_probe, 1, runs=args.runs))
+            row["host_p50_ms"] = stats["p50_ms"]
+
+    # Stopped trials saw fewer epochs, so their accuracy only understates them
+    front = set(pareto_front(final, [OBJECTIVE], COSTS))
+    for i, row in enumerate(final):
+        row["pareto"] = i in front
+
+    print()
+    print(f"📋 Each trial at its last rung ({elapsed:.1f} s total, * = Pareto-optimal):")
+    print_table(final, ["trial", "budget", "int8_accuracy", "float_accuracy", "int8_recall", "esp32_latency_ms",
+                        "arena_bytes", "size_bytes", "host_p50_ms"] + [f"param.{k}" for k in sorted(SPACE)],
+                sort_key=OBJECTIVE)
+    print()
+
+    meta = {"objective": OBJECTIVE, "costs": list(COSTS), "space": SPACE, "target": TARGET_CHIP,
+            "eta": args.eta, "epochs": [args.min_epochs, args.max_epochs], "workers": args.workers,
+            "threads": args.threads, "seconds": elapsed}
+    csv_path, json_path = write_results(rows, args.output, meta)
+    print(f"💾 Saved: {csv_path}, {json_path}")
+    print("🎯 Set a Pareto pick's sizes in train_final.py and retrain with EPOCHS")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep cough-model hyperparameters against ESP32 cost")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument("--threads", type=int, default=1, help="TensorFlow threads per worker")
+    parser.add_argument("--trials", type=int, default=18, help="random subset of the grid (default: 18)")
+    parser.add_argument("--min-epochs", type=int, default=2)
+    parser.add_argument("--max-epochs", type=int, default=18)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--runs", type=int, default=100, help="host latency invokes per model")
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    run_sweep(args)
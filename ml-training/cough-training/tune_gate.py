@@ -0,0 +1,138 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+from audio_cache import INDEX_FILE, WINDOWS_FILE, cache_key
+from audio_corpus import list_sources, load_fresh_corpus
+from energy_gate import GATE_FILE, TARGET_RECALL, EnergyGate, FEATURES, gate_features
+from scan_recordings import MODEL_PATH, BatchedInterpreter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from tflite_bench import load_model_bytes
+
+# --- CONFIGURATION (matches train_final.py) ---
+DATASET_PATH = "dataset"
+MODEL_INPUT_LEN = 16000
+WINDOW_SIZE = 32000
+DOWNSAMPLE = 2
+KERNEL_SIZE = 30
+VALIDATION_SHARE = 0.5   # Windows the gate is tuned on; the rest is held out
+CNN_THRESHOLD = 0.5
+BATCH_SIZE = 32
+
+def load_cached_windows(dataset_path=DATASET_PATH):
+    """(windows memmap, labels, cache dir) of train_final.py's clean onset windows, or None"""
+    corpus = load_fresh_corpus(dataset_path)
+    source = "corpus" if corpus is not None else "wav"
+    cache_dir = os.path.join(dataset_path, "cache", cache_key(f"onset-{source}", WINDOW_SIZE, DOWNSAMPLE, KERNEL_SIZE))
+    if not os.path.exists(os.path.join(cache_dir, INDEX_FILE)):
+        return None
+
+    with np.load(os.path.join(cache_dir, INDEX_FILE), allow_pickle=False) as index:
+        paths = index["path"]
+    label_of = dict(list_sources(dataset_path))
+    labels = np.array([label_of.get(str(p), -1) for p in paths], dtype=np.int64)
+    windows = np.memmap(os.path.join(cache_dir, WINDOWS_FILE), dtype=np.float16, mode="r",
+                        shape=(len(paths), MODEL_INPUT_LEN))
+    return windows, labels, cache_dir
+
+def split_validation(labels, share=VALIDATION_SHARE, seed=42):
+    """Stratified (validation rows, held-out rows) over the labelled windows"""
+    rng = np.random.default_rng(seed)
+    validation = []
+    for c in (0, 1):
+        rows = rng.permutation(np.flatnonzero(labels == c))
+        validation.append(rows[:int(round(len(rows) * share))])
+    validation = np.sort(np.concatenate(validation))
+    held_out = np.setdiff1d(np.flatnonzero(labels >= 0), validation)
+    return validation, held_out
+
+def window_features(windows, rows, chunk=512):
+    return np.concatenate([gate_features(np.asarray(windows[rows[i:i + chunk]], dtype=np.float32))
+                           for i in range(0, len(rows), chunk)] or [np.empty((0, len(FEATURES)), np.float32)])
+
+def cnn_scores(runner, windows, rows):
+    """P(cough) of the rows, batch by batch, and the wall time it took"""
+    scores = np.empty(len(rows), dtype=np.float32)
+    start = time.perf_counter()
+    for i in range(0, len(rows), runner.batch_size):
+        scores[i:i + runner.batch_size] = runner(np.asarray(windows[rows[i:i + runner.batch_size]], dtype=np.float32))
+    return scores, time.perf_counter() - start
+
+def tune_gate(model_path, target_recall, output):
+    print("="*70)
+    print("🚪 Energy Gate Tuning")
+    print("="*70)
+    print()
+
+    loaded = load_cached_windows()
+    if loaded is None:
+        print("❌ No window cache found (run train_final.py first)")
+        return
+    windows, labels, cache_dir = loaded
+    validation, held_out = split_validation(labels)
+    print(f"📂 {cache_dir}: {int((labels == 1).sum())} cough / {int((labels == 0).sum())} other windows")
+    print(f"   tuned on {len(validation)}, checked on {len(held_out)} held-out windows")
+    print()
+
+    val_features = window_features(windows, validation)
+    gate = EnergyGate.tune(val_features[labels[validation] == 1], target_recall)
+    for name, lo, hi in zip(FEATURES, gate.lower, gate.upper):
+        print(f"   {name:<10} [{lo:9.3f}, {hi:9.3f}]")
+    val_pass = gate.passes(val_features)
+    print(f"   validation: gate recall {val_pass[labels[validation] == 1].mean()*100:.2f}% "
+          f"(target {target_recall*100:.1f}%), other windows skipped "
+          f"{(~val_pass[labels[validation] == 0]).mean()*100:.1f}%")
+    print()
+
+    # Timed the way the scanner runs it: staged, cheapest feature first
+    start = time.perf_counter()
+    passed = np.concatenate([gate(np.asarray(windows[held_out[i:i + 512]], dtype=np.float32))
+                             for i in range(0, len(held_out), 512)] or [np.zeros(0, bool)])
+    gate_time = time.perf_counter() - start
+    assert np.array_equal(passed, gate.passes(window_features(windows, held_out)))
+    positive = labels[held_out] == 1
+
+    runner = BatchedInterpreter(load_model_bytes(model_path), BATCH_SIZE)
+    scores, cnn_time = cnn_scores(runner, windows, held_out)
+    _, gated_cnn_time = cnn_scores(runner, windows, held_out[passed])
+    cnn_hit = scores > CNN_THRESHOLD
+    cnn_recall = cnn_hit[positive].mean() if positive.any() else float("nan")
+    cascade_recall = (cnn_hit & passed)[positive].mean() if positive.any() else float("nan")
+
+    cascade_time = gate_time + gated_cnn_time
+    report = {
+        "held_out_windows": int(len(held_out)),
+        "skipped": float(1 - passed.mean()),
+        "gate_recall": float(passed[positive].mean()) if positive.any() else None,
+        "cnn_recall": float(cnn_recall),
+        "cascade_recall": float(cascade_recall),
+        "recall_loss": float(cnn_recall - cascade_recall),
+        "false_positives_removed": int((cnn_hit & ~passed & ~positive).sum()),
+        "speedup": float(cnn_time / cascade_time) if cascade_time else None,
+    }
+
+    print("🔍 Held-out windows:")
+    print(f"   gate recall {report['gate_recall']*100:.2f}%, windows skipped {report['skipped']*100:.1f}%")
+    print(f"   CNN recall {cnn_recall*100:.2f}% -> cascade {cascade_recall*100:.2f}% "
+          f"(loss {report['recall_loss']*100:.2f} pts), "
+          f"{report['false_positives_removed']} CNN false positives gated out")
+    print(f"   CNN on every window {cnn_time*1000:8.1f} ms | gate {gate_time*1000:.1f} ms "
+          f"+ CNN on gated {gated_cnn_time*1000:.1f} ms  x{report['speedup']:.2f}")
+    print("   (train_final.py trains on every window, so CNN recall is optimistic; the loss is what the gate adds)")
+    print()
+
+    gate.save(output, validation_windows=int(len(validation)), held_out=report)
+    print(f"💾 Saved: {output}")
+    print(f"🎯 Scan with: python scan_recordings.py --gate {output} <recordings>")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the energy / ZCR / flux gate in front of the cough CNN")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--target-recall", type=float, default=TARGET_RECALL)
+    parser.add_argument("--output", default=GATE_FILE)
+    args = parser.parse_args()
+
+    tune_gate(args.model, args.target_recall, args.output)
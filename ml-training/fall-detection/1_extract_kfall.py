@@ -1,19 +1,21 @@
 # ml-training/fall-detection/1_extract_kfall.py
 
+import io
 import os
+import argparse
 import zipfile
+import pandas as pd
 from tqdm import tqdm
+from utils.label_index import build_label_index, parse_kfall_filename, SOURCE_COLUMN
+from utils.sensor_io import parse_sensor_bytes
+from utils.signal_store import SignalStoreWriter
 
-def extract_kfall():
-    """Extract manually downloaded KFall dataset"""
-    
-    print("="*70)
-    print("📦 KFall Dataset Extraction")
-    print("="*70)
-    print()
-    
-    # Check for downloaded file
-    zip_path = 'downloads/archive.zip'
+ZIP_PATH = 'downloads/archive.zip'
+EXTRACT_PATH = '../data/raw/fall/kfall'
+STORE_DIR = '../data/raw/fall/kfall_store'
+
+def check_archive(zip_path):
+    """Check the downloaded archive exists and looks complete"""
     
     if not os.path.exists(zip_path):
         print("❌ archive.zip not found!")
@@ -39,9 +41,25 @@ def extract_kfall():
         if response.lower() != 'y':
             return False
     
+    return True
+
+def extract_kfall():
+    """Extract manually downloaded KFall dataset"""
+    
+    print("="*70)
+    print("📦 KFall Dataset Extraction")
+    print("="*70)
+    print()
+    
+    # Check for downloaded file
+    zip_path = ZIP_PATH
+    
+    if not check_archive(zip_path):
+        return False
+    
     # Extract
     print(f"\n📦 Extracting...")
-    extract_path = '../data/raw/fall/kfall'
+    extract_path = EXTRACT_PATH
     os.makedirs(extract_path, exist_ok=True)
     
     try:
@@ -80,6 +98,102 @@ def extract_kfall():
         print(f"\n❌ Error: {e}")
         return False
 
+def load_zip_labels(zip_ref, members):
+    """Read the label_data Excel sheets straight out of the archive"""
+    
+    frames = []
+    for member in members:
+        try:
+            df = pd.read_excel(io.BytesIO(zip_ref.read(member)))
+            df[SOURCE_COLUMN] = os.path.basename(member)
+            frames.append(df)
+        except Exception as e:
+            print(f"⚠️  Error reading {member}: {e}")
+    
+    if len(frames) == 0:
+        return None
+    
+    return build_label_index(pd.concat(frames, ignore_index=True))
+
+def build_signal_store(zip_path=ZIP_PATH, store_dir=STORE_DIR):
+    """Pack every sensor CSV in the archive into one memory-mappable store"""
+    
+    print("="*70)
+    print("📦 KFall Signal Store")
+    print("="*70)
+    print()
+    
+    if not check_archive(zip_path):
+        return False
+    
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            names = zip_ref.namelist()
+            label_members = [n for n in names if 'label_data' in n and n.endswith(('.xlsx', '.xls'))]
+            sensor_members = sorted(n for n in names if 'sensor_data' in n and n.endswith('.csv'))
+            
+            print(f"📋 Label sheets: {len(label_members)}")
+            print(f"📊 Sensor files: {len(sensor_members)}")
+            print()
+            
+            label_index = load_zip_labels(zip_ref, label_members)
+            if label_index is None:
+                print("⚠️  No labels found - recordings are stored with label -1")
+            
+            failures = []
+            
+            with SignalStoreWriter(store_dir) as writer:
+                for member in tqdm(sensor_members, desc="Packing", unit="file"):
+                    try:
+                        accel, gyro = parse_sensor_bytes(zip_ref.read(member))
+                    except Exception as e:
+                        failures.append((member, e))
+                        continue
+                    
+                    name = os.path.basename(member)
+                    _, task_id = parse_kfall_filename(name)
+                    meta = {'task_id': task_id} if task_id is not None else {}
+                    
+                    if label_index is not None:
+                        key = label_index.key_for(name)
+                        label = label_index.resolve(name)
+                        if key is not None:
+                            meta.update(subject=key.subject if key.subject is not None else -1,
+                                        task=key.task or '', trial=key.trial)
+                        if label is not None:
+                            meta['label'] = label
+                    
+                    writer.append(name, accel, gyro, **meta)
+                
+                stored = len(writer)
+        
+    except zipfile.BadZipFile:
+        print("\n❌ Error: Invalid ZIP file")
+        print("   Please re-download from Kaggle")
+        return False
+    
+    store_size = os.path.getsize(os.path.join(store_dir, 'signals.f32')) / (1024 * 1024)
+    
+    print(f"\n✅ Stored {stored} recordings ({store_size:.1f} MB)")
+    print(f"   Location: {os.path.abspath(store_dir)}")
+    
+    if failures:
+        print(f"⚠️  Skipped {len(failures)} unreadable files:")
+        for member, e in failures[:10]:
+            print(f"   {member}: {e}")
+    
+    print("\n🎯 Next step: python 2_extract_features.py --store " + store_dir)
+    return stored > 0
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Unpack the KFall archive")
+    parser.add_argument('--store', action='store_true',
+                        help=f"stream CSVs out of the zip into a packed signal store ({STORE_DIR})")
+    args = parser.parse_args()
+    
     os.makedirs('downloads', exist_ok=True)
-    extract_kfall()
\ No newline at end of file
+    
+    if args.store:
+        build_signal_store()
+    else:
+        extract_kfall()
\ No newline at end of file
@@ -1,10 +1,30 @@
 # ml-training/fall-detection/2_extract_features.py
 
 import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
-from utils.motion_features import extract_kfall_features
+from utils.feature_cache import FeatureCache, params_key
+from utils.label_index import build_label_index, SOURCE_COLUMN
+from utils.motion_features import extract_kfall_features_batch
+from utils.sensor_io import SensorReader
+from utils.signal_store import SignalStore
+
+# Files handed to a worker at a time (also the batch size for feature extraction)
+CHUNK_SIZE = 32
+
+# Low-pass filter applied before feature extraction
+FILTER_PARAMS = {'cutoff': 5, 'fs': 200, 'order': 4}
+
+KFALL_BASE_DIR = '../data/raw/fall/kfall/kFall Dataset'
+CACHE_DIR = '../data/cache/features'
+
+# One reader per process, so each worker detects a directory's schema once
+_SENSOR_READER = SensorReader()
 
 def load_kfall_labels(kfall_base_dir):
     """Load labels from Excel files"""
@@ -26,6 +46,7 @@ def load_kfall_labels(kfall_base_dir):
     for label_file in tqdm(label_files, desc="Loading labels"):
         try:
             df = pd.read_excel(os.path.join(label_dir, label_file))
+            df[SOURCE_COLUMN] = label_file
             all_labels.append(df)
         except Exception as e:
             print(f"⚠️  Error reading {label_file}: {e}")
@@ -45,73 +66,275 @@ def load_kfall_labels(kfall_base_dir):
     return labels_df
 
 def build_label_mapping(labels_df):
-    """Build filename -> label mapping from KFall label structure"""
+    """Build the structured (subject, task, trial) -> label index"""
+    
+    print("🗺️  Building label index from Task Code + Trial ID...")
     
-    print("🗺️  Building label mapping from Task Code + Trial ID...")
+    label_index = build_label_index(labels_df)
+    
+    print(f"✅ Created {len(label_index)} label keys")
+    
+    if len(label_index) == 0:
+        return label_index
+    
+    # Count falls vs ADLs (per labelled trial, not per lookup key)
+    trials = [(k, v) for k, v in label_index.labels.items() if k.subject is not None]
+    trials = trials or list(label_index.labels.items())
+    falls = sum(1 for _, v in trials if v == 1)
+    adls = len(trials) - falls
+    
+    print(f"📊 Label distribution:")
+    print(f"   Falls: {falls} ({100*falls/len(trials):.1f}%)")
+    print(f"   ADLs:  {adls} ({100*adls/len(trials):.1f}%)")
+    print()
+    
+    # Show sample mappings
+    print("📋 Sample label keys:")
+    for key, val in trials[:10]:
+        label_str = "FALL" if val == 1 else "ADL"
+        subject = f"SA{key.subject:02d}" if key.subject is not None else "any"
+        print(f"   {subject} {key.task} trial {key.trial} → {label_str}")
+    print()
+    
+    return label_index
+
+def read_sensor_file(filepath):
+    """Read accel and gyro (N, 3) float32 arrays from a KFall sensor CSV"""
+    
+    return _SENSOR_READER.read(filepath)
+
+def featurize_files(jobs, filter_params=FILTER_PARAMS):
+    """
+    Featurize a chunk of (filepath, label) jobs
     
-    label_map = {}
+    Returns:
+        list of (features, error) in job order - features is the
+        19-element row (18 features + label) or None with an error message
+    """
     
-    # Track current task code
-    current_task = None
+    results = [None] * len(jobs)
+    loaded = []
+    accels = []
+    gyros = []
     
-    for idx, row in labels_df.iterrows():
+    for i, (filepath, label) in enumerate(jobs):
         try:
-            # Get task code (handle NaN by using previous task)
-            task_code = row.get('Task Code (Task ID)', None)
-            if pd.notna(task_code):
-                current_task = str(task_code).strip()
-            
-            # Get trial ID
-            trial_id = row.get('Trial ID', None)
-            
-            if current_task is None or pd.isna(trial_id):
-                continue
-            
-            # Extract just the task code (e.g., "F01" from "F01 (20)")
-            task_parts = current_task.split('(')[0].strip()
-            
-            # Determine if fall or ADL
-            # F codes = Falls, A codes = ADLs
-            is_fall = task_parts.startswith('F')
-            
-            # Build possible filename patterns
-            # KFall uses formats like: SA01_F01_T01.csv or F01_T01.csv
-            trial_str = f"T{int(trial_id):02d}"
-            
-            possible_names = [
-                f"{task_parts}_{trial_str}",           # F01_T01
-                f"{task_parts}_T{int(trial_id)}",      # F01_T1
-                f"SA01_{task_parts}_{trial_str}",      # SA01_F01_T01
-                f"SA{int(trial_id):02d}_{task_parts}", # SA01_F01
-            ]
-            
-            for name in possible_names:
-                label_map[name] = 1 if is_fall else 0
-                
+            accel, gyro = read_sensor_file(filepath)
         except Exception as e:
+            results[i] = (None, f"{type(e).__name__}: {e}")
             continue
+        
+        loaded.append(i)
+        accels.append(accel)
+        gyros.append(gyro)
     
-    print(f"✅ Created {len(label_map)} label mappings")
+    if loaded:
+        features = extract_kfall_features_batch(accels, gyros, dtype=np.float64,
+                                                **filter_params)
+        
+        for i, accel, row in zip(loaded, accels, features):
+            if np.isnan(row).all():
+                results[i] = (None, f"too short to featurize ({len(accel)} samples)")
+            else:
+                results[i] = (np.append(row, jobs[i][1]), None)
     
-    # Count falls vs ADLs
-    falls = sum(1 for v in label_map.values() if v == 1)
-    adls = sum(1 for v in label_map.values() if v == 0)
+    return results
+
+def featurize_store_records(jobs, filter_params=FILTER_PARAMS):
+    """
+    Featurize a chunk of (store_dir, record, label) jobs from a signal store
     
-    print(f"📊 Label distribution:")
-    print(f"   Falls: {falls} ({100*falls/len(label_map):.1f}%)")
-    print(f"   ADLs:  {adls} ({100*adls/len(label_map):.1f}%)")
+    Returns:
+        list of (features, error) in job order, like featurize_files
+    """
+    
+    store = SignalStore(jobs[0][0])
+    accels = [store.accel(i) for _, i, _ in jobs]
+    gyros = [store.gyro(i) for _, i, _ in jobs]
+    
+    features = extract_kfall_features_batch(accels, gyros, dtype=np.float64, **filter_params)
+    
+    results = []
+    for (_, _, label), accel, row in zip(jobs, accels, features):
+        if np.isnan(row).all():
+            results.append((None, f"too short to featurize ({len(accel)} samples)"))
+        else:
+            results.append((np.append(row, label), None))
+    
+    return results
+
+def run_feature_jobs(jobs, workers=1, chunk_size=CHUNK_SIZE, filter_params=FILTER_PARAMS,
+                     featurize_chunk=featurize_files):
+    """Featurize all jobs, serially or across a process pool, in job order"""
+    
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+    featurize = partial(featurize_chunk, filter_params=filter_params)
+    results = []
+    
+    with tqdm(total=len(jobs), desc="Extracting features") as pbar:
+        if workers <= 1:
+            for chunk_results in map(featurize, chunks):
+                results.extend(chunk_results)
+                pbar.update(len(chunk_results))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # map() yields in submission order, so output is deterministic
+                for chunk_results in executor.map(featurize, chunks):
+                    results.extend(chunk_results)
+                    pbar.update(len(chunk_results))
+    
+    return results
+
+def featurize_with_cache(jobs, cache, workers=1, filter_params=FILTER_PARAMS):
+    """Serve jobs from the feature cache, featurizing only new or changed files"""
+    
+    results = [None] * len(jobs)
+    pending = []
+    
+    for i, (filepath, label) in enumerate(jobs):
+        cached = cache.lookup(filepath)
+        if cached is None:
+            pending.append(i)
+        else:
+            results[i] = (np.append(cached, label), None)
+    
+    print(f"💾 Cache: {cache.hits} hits, {cache.misses} to featurize")
+    
+    if pending:
+        fresh = run_feature_jobs([jobs[i] for i in pending], workers,
+                                 filter_params=filter_params)
+        for i, (features, error) in zip(pending, fresh):
+            results[i] = (features, error)
+            if features is not None:
+                cache.store(jobs[i][0], features[:-1])
+    
+    cache.save()
+    
+    return results
+
+def gc_feature_cache(cache_dir=CACHE_DIR, max_age_days=None, use_hash=False,
+                     filter_params=FILTER_PARAMS):
+    """Evict stale entries from the feature cache"""
+    
+    sensor_dir = os.path.join(KFALL_BASE_DIR, 'sensor_data')
+    cache = FeatureCache(cache_dir, sensor_dir, params_key(**filter_params), use_hash)
+    
+    total = len(cache)
+    removed = cache.gc(max_age_days)
+    cache.save()
+    
+    print(f"🧹 Feature cache: evicted {removed} of {total} entries ({len(cache)} kept)")
+
+def split_results(sources, results):
+    """Split (source, label) / (features, error) pairs into falls, ADLs and failures"""
+    
+    fall_features = []
+    adl_features = []
+    failures = []
+    
+    for (source, label), (features, error) in zip(sources, results):
+        if features is None:
+            failures.append((source, error))
+        elif label == 1:
+            fall_features.append(features)
+        else:
+            adl_features.append(features)
+    
+    return fall_features, adl_features, failures
+
+def print_failures(failures, relative_to=None):
+    """Show the first few per-file failures"""
+    
+    if not failures:
+        return
+    
+    print("📋 Failed files:")
+    for source, error in failures[:20]:
+        name = os.path.relpath(source, relative_to) if relative_to else source
+        print(f"   {name}: {error}")
+    if len(failures) > 20:
+        print(f"   ... and {len(failures) - 20} more")
     print()
+
+def save_features(fall_features, adl_features, label_report=None):
+    """Write the fall/ADL feature and label arrays to data/processed"""
     
-    # Show sample mappings
-    print("📋 Sample filename mappings:")
-    for i, (key, val) in enumerate(list(label_map.items())[:10]):
-        label_str = "FALL" if val == 1 else "ADL"
-        print(f"   {key} → {label_str}")
+    os.makedirs('../data/processed', exist_ok=True)
+    
+    if label_report is not None:
+        with open('../data/processed/label_report.json', 'w') as f:
+            json.dump(label_report, f, indent=4)
+    
+    fall_features = np.array(fall_features)
+    adl_features = np.array(adl_features)
+    
+    np.save('../data/processed/fall_features.npy', fall_features[:, :-1])
+    np.save('../data/processed/fall_labels.npy', fall_features[:, -1])
+    np.save('../data/processed/adl_features.npy', adl_features[:, :-1])
+    np.save('../data/processed/adl_labels.npy', adl_features[:, -1])
+    
+    print("="*70)
+    print("✅ FEATURE EXTRACTION COMPLETE!")
+    print("="*70)
+    print()
+    print(f"💾 Fall features: {fall_features.shape}")
+    print(f"💾 ADL features: {adl_features.shape}")
+    print()
+    print("🎯 Next: python 3_create_balanced_dataset.py")
+
+def process_signal_store(store_dir, workers=1, filter_params=FILTER_PARAMS):
+    """Featurize recordings from a packed signal store (1_extract_kfall.py --store)"""
+    
+    print("="*70)
+    print("🔧 KFall Feature Extraction (signal store)")
+    print("="*70)
+    print()
+    
+    if not os.path.exists(os.path.join(store_dir, 'index.npz')):
+        print(f"❌ Signal store not found at: {os.path.abspath(store_dir)}")
+        print("   Run: python 1_extract_kfall.py --store")
+        return
+    
+    store = SignalStore(store_dir)
+    labels = store.index['label']
+    names = store.index['name']
+    
+    print(f"📦 {len(store)} recordings, {len(store.signals)} samples")
+    print()
+    
+    jobs = [(store_dir, int(i), int(labels[i])) for i in np.flatnonzero(labels >= 0)]
+    
+    print(f"🔄 Processing recordings ({workers} worker{'s' if workers > 1 else ''})...")
+    
+    results = run_feature_jobs(jobs, workers, filter_params=filter_params,
+                               featurize_chunk=featurize_store_records)
+    
+    sources = [(names[i], label) for _, i, label in jobs]
+    fall_features, adl_features, failures = split_results(sources, results)
+    
+    print()
+    print("="*70)
+    print("📊 PROCESSING SUMMARY")
+    print("="*70)
+    print(f"✅ Labelled: {len(jobs)}")
+    print(f"❌ Unlabelled: {len(store) - len(jobs)}")
+    print(f"⚠️  Failed: {len(failures)}")
+    print()
+    
+    print_failures(failures)
+    
+    print(f"✅ Falls extracted: {len(fall_features)}")
+    print(f"✅ ADLs extracted: {len(adl_features)}")
     print()
     
-    return label_map
+    if len(fall_features) == 0 or len(adl_features) == 0:
+        print("❌ Not enough data!")
+        return
+    
+    save_features(fall_features, adl_features)
 
-def process_kfall_dataset():
+def process_kfall_dataset(workers=1, cache_dir=CACHE_DIR, use_hash=False,
+                          filter_params=FILTER_PARAMS):
     """Process KFall dataset"""
     
     print("="*70)
@@ -119,7 +342,7 @@ def process_kfall_dataset():
     print("="*70)
     print()
     
-    kfall_base_dir = '../data/raw/fall/kfall/kFall Dataset'
+    kfall_base_dir = KFALL_BASE_DIR
     
     if not os.path.exists(kfall_base_dir):
         print(f"❌ Dataset not found at: {os.path.abspath(kfall_base_dir)}")
@@ -136,9 +359,9 @@ def process_kfall_dataset():
         return
     
     # Build label mapping
-    label_map = build_label_mapping(labels_df)
+    label_index = build_label_mapping(labels_df)
     
-    if len(label_map) == 0:
+    if len(label_index) == 0:
         print("❌ No labels created!")
         return
     
@@ -155,6 +378,9 @@ def process_kfall_dataset():
             if file.endswith('.csv'):
                 all_files.append(os.path.join(root, file))
     
+    # Fixed order so output arrays do not depend on directory listing order
+    all_files.sort()
+    
     print(f"📂 Found {len(all_files)} sensor CSV files")
     
     # Show sample filenames
@@ -163,79 +389,53 @@ def process_kfall_dataset():
         print(f"   {os.path.basename(filepath)}")
     print()
     
-    # Process files
-    fall_features = []
-    adl_features = []
+    # Match files to labels
+    jobs = []
     matched = 0
     unmatched = 0
     
-    print("🔄 Processing sensor files...")
-    
-    for filepath in tqdm(all_files, desc="Extracting features"):
-        try:
-            filename = os.path.basename(filepath)
-            filename_no_ext = os.path.splitext(filename)[0]
-            
-            # Try to match with label map
-            label = None
-            
-            # Try exact match
-            if filename_no_ext in label_map:
-                label = label_map[filename_no_ext]
-                matched += 1
-            else:
-                # Try fuzzy matching
-                for key in label_map.keys():
-                    if key in filename_no_ext or filename_no_ext in key:
-                        label = label_map[key]
-                        matched += 1
-                        break
-            
-            if label is None:
-                unmatched += 1
-                continue
-            
-            # Read CSV
-            data = pd.read_csv(filepath)
-            
-            # Find accel and gyro columns
-            accel_cols = []
-            gyro_cols = []
-            
-            for col in data.columns:
-                col_lower = str(col).lower()
-                if any(p in col_lower for p in ['acc', 'accel']):
-                    accel_cols.append(col)
-                elif any(p in col_lower for p in ['gyro', 'gyr']):
-                    gyro_cols.append(col)
-            
-            # Fallback: first 6 columns
-            if len(accel_cols) == 0 and len(data.columns) >= 6:
-                accel_cols = data.columns[:3].tolist()
-                gyro_cols = data.columns[3:6].tolist()
-            
-            if len(accel_cols) >= 3 and len(gyro_cols) >= 3:
-                accel = data[accel_cols[:3]].values.astype(float)
-                gyro = data[gyro_cols[:3]].values.astype(float)
-                
-                features = extract_kfall_features(accel, gyro, label)
-                
-                if features is not None:
-                    if label == 1:
-                        fall_features.append(features)
-                    else:
-                        adl_features.append(features)
+    for filepath in all_files:
+        label = label_index.resolve(os.path.basename(filepath))
         
-        except Exception as e:
+        if label is None:
+            unmatched += 1
             continue
+        
+        matched += 1
+        jobs.append((filepath, label))
+    
+    label_report = label_index.report()
+    
+    print(f"🏷️  Resolved {matched} files, {unmatched} without a label")
+    for kind in ['ambiguous', 'unmatched']:
+        names = label_report[kind]
+        if names:
+            print(f"   {kind.capitalize()} ({len(names)}): {', '.join(names[:5])}"
+                  f"{' ...' if len(names) > 5 else ''}")
+    print()
+    
+    # Process files
+    print(f"🔄 Processing sensor files ({workers} worker{'s' if workers > 1 else ''})...")
+    
+    if cache_dir:
+        cache = FeatureCache(cache_dir, sensor_dir, params_key(**filter_params), use_hash)
+        results = featurize_with_cache(jobs, cache, workers, filter_params)
+    else:
+        results = run_feature_jobs(jobs, workers, filter_params=filter_params)
+    
+    fall_features, adl_features, failures = split_results(jobs, results)
     
     print()
     print("="*70)
     print("📊 PROCESSING SUMMARY")
     print("="*70)
     print(f"✅ Matched: {matched}")
-    print(f"❌ Unmatched: {unmatched}")
+    print(f"❌ Unmatched: {unmatched} ({len(label_report['ambiguous'])} ambiguous)")
+    print(f"⚠️  Failed: {len(failures)}")
     print()
+    
+    print_failures(failures, sensor_dir)
+    
     print(f"✅ Falls extracted: {len(fall_features)}")
     print(f"✅ ADLs extracted: {len(adl_features)}")
     print()
@@ -250,29 +450,43 @@ def process_kfall_dataset():
             if len(all_files) > 0:
                 sample_file = os.path.basename(all_files[0])
                 print(f"   Sample sensor file: {sample_file}")
-                print(f"   Sample label keys: {list(label_map.keys())[:5]}")
+                print(f"   Parsed key: {label_index.key_for(sample_file)}")
+                print(f"   Sample label keys: {list(label_index.labels.keys())[:5]}")
         
         return
     
     # Save
-    os.makedirs('../data/processed', exist_ok=True)
-    
-    fall_features = np.array(fall_features)
-    adl_features = np.array(adl_features)
-    
-    np.save('../data/processed/fall_features.npy', fall_features[:, :-1])
-    np.save('../data/processed/fall_labels.npy', fall_features[:, -1])
-    np.save('../data/processed/adl_features.npy', adl_features[:, :-1])
-    np.save('../data/processed/adl_labels.npy', adl_features[:, -1])
-    
-    print("="*70)
-    print("✅ FEATURE EXTRACTION COMPLETE!")
-    print("="*70)
-    print()
-    print(f"💾 Fall features: {fall_features.shape}")
-    print(f"💾 ADL features: {adl_features.shape}")
-    print()
-    print("🎯 Next: python 3_create_balanced_dataset.py")
+    save_features(fall_features, adl_features, label_report)
 
 if __name__ == "__main__":
-    process_kfall_dataset()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extract KFall motion features")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of worker processes (default: 1, serial)")
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                        help=f"feature cache directory (default: {CACHE_DIR})")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="featurize every file and leave the cache untouched")
+    parser.add_argument('--hash', action='store_true',
+                        help="validate cache entries by content hash when mtime changed")
+    parser.add_argument('--gc', action='store_true',
+                        help="evict stale cache entries and exit")
+    parser.add_argument('--max-age-days', type=float, default=None,
+                        help="with --gc, keep entries for other filter settings used this recently")
+    parser.add_argument('--store', default=None,
+                        help="featurize a packed signal store instead of the CSV tree")
+    parser.add_argument('--cutoff', type=float, default=FILTER_PARAMS['cutoff'])
+    parser.add_argument('--fs', type=float, default=FILTER_PARAMS['fs'])
+    parser.add_argument('--order', type=int, default=FILTER_PARAMS['order'])
+    args = parser.parse_args()
+    
+    filter_params = {'cutoff': args.cutoff, 'fs': args.fs, 'order': args.order}
+    
+    if args.gc:
+        gc_feature_cache(args.cache_dir, args.max_age_days, args.hash, filter_params)
+    elif args.store:
+        process_signal_store(args.store, workers=args.workers, filter_params=filter_params)
+    else:
+        process_kfall_dataset(workers=args.workers,
+                              cache_dir=None if args.no_cache else args.cache_dir,
+                              use_hash=args.hash,
+                              filter_params=filter_params)
\ No newline at end of file
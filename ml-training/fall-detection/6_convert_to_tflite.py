@@ -1,11 +1,24 @@
 # ml-training/fall-detection/6_convert_to_tflite.py
 
 import os
+import sys
 import numpy as np
 import joblib
 import tensorflow as tf
 from tensorflow import keras
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from tflite_bench import benchmark_model, save_report
+from tflite_budget import enforce_budget
+from calibration import (calibration_set, file_key, balanced_indices, representative_dataset,
+                         quantization_report, print_quantization_report, save_quantization_report)
+
+TARGET_CHIP = 'esp32'
+ARENA_BUDGET = 30 * 1024  # TENSOR_ARENA_SIZE in esp32_firmware/src/main_fall.txt
+LATENCY_BUDGET_MS = 100   # The firmware runs the AI check every ~100 ms
+CALIBRATION_SAMPLES = 200 # Class-balanced rows of X_train used to calibrate int8 ranges
+HOLDOUT_SAMPLES = 1000    # Class-balanced rows of X_test for the float vs int8 report
+
 def convert_to_tflite():
     """Convert to TFLite INT8"""
     
@@ -54,15 +67,18 @@ def convert_to_tflite():
     print("✅ Complete")
     print()
     
-    def representative_dataset():
-        for i in range(min(100, len(X_train))):
-            yield [X_train_scaled[i:i+1].astype(np.float32)]
+    # Balanced over the labels the network learned, cached until X_train / the scaler change
+    X_cal, y_cal, _ = calibration_set(
+        X_train_scaled, y_train_pred, n=CALIBRATION_SAMPLES, seed=42,
+        cache_file=f'{processed_dir}/calibration_int8.npz',
+        source_key=file_key(f'{processed_dir}/X_train.npy', f'{models_dir}/scaler.pkl'))
+    print(f"🎯 Calibrating on {len(X_cal)} rows ({int(y_cal.sum())} fall / {int(len(y_cal) - y_cal.sum())} ADL)")
     
     print("🔧 Converting to TFLite INT8...")
     
     converter = tf.lite.TFLiteConverter.from_keras_model(model)
     converter.optimizations = [tf.lite.Optimize.DEFAULT]
-    converter.representative_dataset = representative_dataset
+    converter.representative_dataset = representative_dataset(X_cal)
     converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
     converter.inference_input_type = tf.int8
     converter.inference_output_type = tf.int8
@@ -71,6 +87,25 @@ def convert_to_tflite():
     
     print("✅ Complete!")
     print()
+
+    # Arena / latency projection for the board; exits before saving if over budget
+    estimate = enforce_budget(tflite_model, TARGET_CHIP, ARENA_BUDGET, LATENCY_BUDGET_MS)
+    print()
+
+    # Float vs int8 on held-out rows the calibration never saw
+    try:
+        X_test_scaled = scaler.transform(np.load(f'{processed_dir}/X_test.npy')).astype(np.float32)
+        y_test = np.load(f'{processed_dir}/y_test.npy')
+    except FileNotFoundError:
+        X_test_scaled, y_test = None, None
+    if X_test_scaled is not None:
+        holdout = balanced_indices(y_test, HOLDOUT_SAMPLES, seed=42)
+        quant = quantization_report(model, tflite_model, X_test_scaled[holdout], y_test[holdout], converter)
+        print("📏 Quantization error:")
+        print_quantization_report(quant)
+        save_quantization_report(quant, f'{models_dir}/quantization_report.json',
+                                 {'samples': len(X_cal), 'seed': 42, 'balanced_on': 'sklearn predictions'})
+        print()
     
     tflite_path = f'{models_dir}/fall_model_int8.tflite'
     
@@ -86,6 +121,19 @@ def convert_to_tflite():
     print(f"💾 Saved: {tflite_path}")
     print(f"📊 Size: {model_size_kb:.2f} KB")
     print()
+
+    # Host latency / memory of the exported model, replayed on the test split
+    result = benchmark_model(tflite_model, X_test_scaled)
+    result['path'] = 'models/fall/fall_model_int8.tflite'
+    result['inputs_source'] = 'X_test.npy' if X_test_scaled is not None else 'random'
+    result['estimate'] = {k: v for k, v in estimate.items() if k != 'tensors'}
+    report_path = save_report({'fall_features_int8': result}, models_dir, '6_convert_to_tflite.py')
+
+    single = result['latency']['1']
+    print(f"⏱️  Host latency: p50 {single['p50_ms']:.3f} ms, p99 {single['p99_ms']:.3f} ms "
+          f"(1 thread)")
+    print(f"💾 Saved: {report_path}")
+    print()
     print("🎉 ALL DONE!")
 
 if __name__ == "__main__":
@@ -0,0 +1,186 @@
+# ml-training/fall-detection/7_export_forest_to_c.py
+
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import joblib
+
+from utils.forest_compiler import (
+    flatten_forest, fit_to_budget, flash_bytes, forest_predict, forest_scores, generate_c, tree_depth,
+)
+
+HARNESS = r"""
+#include <stdio.h>
+#include <stdlib.h>
+#include <time.h>
+#include "fall_forest.h"
+
+int main(int argc, char **argv) {
+    int n = atoi(argv[1]), reps = atoi(argv[2]);
+    float *x = malloc(sizeof(float) * n * FALL_FOREST_FEATURES);
+    uint32_t *scores = malloc(sizeof(uint32_t) * n);
+    if (fread(x, sizeof(float), (size_t)n * FALL_FOREST_FEATURES, stdin) != (size_t)n * FALL_FOREST_FEATURES)
+        return 1;
+    struct timespec a, b;
+    clock_gettime(CLOCK_MONOTONIC, &a);
+    for (int r = 0; r < reps; r++)
+        for (int i = 0; i < n; i++)
+            scores[i] = fall_forest_score(x + i * FALL_FOREST_FEATURES);
+    clock_gettime(CLOCK_MONOTONIC, &b);
+    fwrite(scores, sizeof(uint32_t), n, stdout);
+    double secs = (b.tv_sec - a.tv_sec) + (b.tv_nsec - a.tv_nsec) / 1e9;
+    fprintf(stderr, "%f\n", (double)n * reps / secs);
+    return 0;
+}
+"""
+
+def run_native(header_text, X32, reps=20):
+    """Compile the header with the host C compiler; (scores, predictions/s) or None without one"""
+    cc = shutil.which('cc') or shutil.which('gcc') or shutil.which('clang')
+    if cc is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, 'fall_forest.h'), 'w') as f:
+            f.write(header_text)
+        with open(os.path.join(tmp, 'harness.c'), 'w') as f:
+            f.write(HARNESS)
+        exe = os.path.join(tmp, 'harness')
+        subprocess.run([cc, '-O2', '-std=gnu99', '-o', exe, os.path.join(tmp, 'harness.c'), '-lm'],
+                       check=True, capture_output=True)
+        proc = subprocess.run([exe, str(len(X32)), str(reps)], input=np.ascontiguousarray(X32).tobytes(),
+                              capture_output=True, check=True)
+    return np.frombuffer(proc.stdout, dtype=np.uint32), float(proc.stderr.decode().strip())
+
+def rate(fn, X, min_seconds=0.5):
+    """Predictions per second of fn over X, repeated for at least min_seconds"""
+    done, start = 0, time.perf_counter()
+    while True:
+        fn(X)
+        done += len(X)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return done / elapsed
+
+def export_forest(mode='arrays', budget_kb=None, max_depth=None, n_trees=None, output=None):
+    """Compile the RandomForest (scaler folded in) into a C header"""
+
+    print("="*70)
+    print("🌲 Compiling Random Forest to C")
+    print("="*70)
+    print()
+
+    models_dir = '../models/fall'
+    processed_dir = '../data/processed'
+    output = output or f'{models_dir}/fall_forest.h'
+
+    try:
+        model = joblib.load(f'{models_dir}/fall_model.pkl')
+        scaler = joblib.load(f'{models_dir}/scaler.pkl')
+        X_test = np.load(f'{processed_dir}/X_test.npy')
+        y_test = np.load(f'{processed_dir}/y_test.npy')
+    except FileNotFoundError as e:
+        print(f"❌ File not found: {e}")
+        return
+
+    model.verbose = 0  # Trained with verbose=1, which logs every predict call
+    print(f"✅ Loaded forest: {len(model.estimators_)} trees, depth {tree_depth(model)}")
+
+    if budget_kb is not None:
+        try:
+            flat, max_depth, n_trees = fit_to_budget(model, scaler, int(budget_kb * 1024), mode,
+                                                     max_depth, n_trees)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+    else:
+        flat = flatten_forest(model, scaler, max_depth, n_trees)
+    pruned = flat['max_depth'] is not None or len(flat['roots']) < len(model.estimators_)
+
+    size = flash_bytes(flat, mode)
+    print(f"📦 {len(flat['roots'])} trees, {len(flat['feature'])} nodes, depth cap "
+          f"{flat['max_depth'] or 'none'}: ~{size/1024:.1f} KB flash ({mode})")
+    print()
+
+    # The board computes float32 features, so compare on float32 inputs
+    X32 = X_test.astype(np.float32)
+    sk_pred = model.predict(scaler.transform(X32.astype(np.float64)))
+    ref_pred = forest_predict(flat, X32)
+    mismatches = int((ref_pred != sk_pred).sum())
+
+    print("🔍 Reference evaluator vs model.predict:")
+    print(f"   {len(X32)} test rows, {mismatches} mismatches"
+          f"{' (pruned forest, not expected to match)' if pruned else ''}")
+    print(f"   Accuracy: forest {np.mean(sk_pred == y_test)*100:.2f}% | exported {np.mean(ref_pred == y_test)*100:.2f}%")
+
+    header = generate_c(flat, 'fall_forest', mode, source='7_export_forest_to_c.py')
+
+    print()
+    print("⏱️  Predictions / second:")
+    sk_rate = rate(lambda X: model.predict(scaler.transform(X)), X32)
+    ref_rate = rate(lambda X: forest_predict(flat, X), X32)
+    print(f"   sklearn predict:          {sk_rate:12,.0f}")
+    print(f"   Python reference:         {ref_rate:12,.0f}")
+
+    native = run_native(header, X32)
+    native_match = None
+    if native is not None:
+        native_scores, native_rate = native
+        native_match = bool(np.array_equal(native_scores, forest_scores(flat, X32)))
+        print(f"   Native C (host):          {native_rate:12,.0f}")
+        print(f"   C scores == reference:    {'✅ bit-for-bit' if native_match else '❌ DIFFER'}")
+    else:
+        print("   Native C: skipped (no C compiler on PATH)")
+    print()
+
+    if (mismatches and not pruned) or native_match is False:
+        print("❌ Export does not reproduce the forest, header not written")
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output + '.tmp', 'w') as f:
+        f.write(header)
+    os.replace(output + '.tmp', output)
+
+    report = {
+        'mode': mode,
+        'trees': int(len(flat['roots'])),
+        'nodes': int(len(flat['feature'])),
+        'max_depth': flat['max_depth'],
+        'flash_bytes_estimate': int(size),
+        'test_rows': int(len(X32)),
+        'mismatches_vs_sklearn': mismatches,
+        'native_bit_exact': native_match,
+        'accuracy': float(np.mean(ref_pred == y_test)),
+        'predictions_per_s': {'sklearn': sk_rate, 'python_reference': ref_rate,
+                              'native_c': native[1] if native else None},
+    }
+    with open(f'{models_dir}/forest_export.json', 'w') as f:
+        json.dump(report, f, indent=4)
+
+    print("="*70)
+    print("✅ C FOREST READY!")
+    print("="*70)
+    print()
+    print(f"💾 Saved: {output}")
+    print(f"💾 Saved: {models_dir}/forest_export.json")
+    print()
+    print("🎯 Firmware: #include \"fall_forest.h\" and call fall_forest_predict(features)")
+    print("   with the 18 raw features (no scaling needed).")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the fall RandomForest into a C header")
+    parser.add_argument('--mode', choices=['arrays', 'branches'], default='arrays',
+                        help="const node tables, or unrolled if/else code")
+    parser.add_argument('--flash-budget-kb', type=float, default=None,
+                        help="cap depth (then tree count) until the export fits")
+    parser.add_argument('--max-depth', type=int, default=None)
+    parser.add_argument('--max-trees', type=int, default=None)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    export_forest(args.mode, args.flash_budget_kb, args.max_depth, args.max_trees, args.output)
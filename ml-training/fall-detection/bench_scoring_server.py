@@ -0,0 +1,146 @@
+# ml-training/fall-detection/bench_scoring_server.py
+
+import copy
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+
+from bench_streaming import load_model, make_synthetic_stream, window_starts
+from utils.batch_scoring import BatchScorer, MicroBatcher, ScoringServer
+from utils.motion_features import extract_kfall_features
+
+def make_payloads(accel, gyro, window, payload, scorer, limit=256):
+    """Request lines cut from the synthetic stream: raw IMU windows or their features"""
+    lines = []
+    for s in window_starts(len(accel), window, window // 2)[:limit]:
+        request = {'accel': np.round(accel[s:s + window], 4).tolist(),
+                   'gyro': np.round(gyro[s:s + window], 3).tolist()}
+        if payload == 'features':
+            request = {'features': scorer.features([request])[0].tolist()}
+        # Encoded once, so the clients sharing the CPU don't dominate the timing
+        lines.append(json.dumps(request)[1:].encode() + b'\n')
+    return lines
+
+def per_request_fn(model, scaler):
+    """The naive path: one sklearn predict per request, with the model as trained"""
+    def score(requests):
+        results = []
+        for r in requests:
+            if 'features' in r:
+                row = np.asarray(r['features'], dtype=np.float64)
+            else:
+                row = extract_kfall_features(np.asarray(r['accel']), np.asarray(r['gyro']), 0)
+                row = None if row is None else row[:-1]
+            results.append(None if row is None else
+                           float(model.predict_proba(scaler.transform(row[None]))[0, 1]))
+        return results
+    return score
+
+async def device(port, requests, deadline, pipeline, latencies, counts):
+    """One device: keeps `pipeline` requests outstanding until the deadline"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port, limit=2 ** 24)
+    sent = {}
+    next_id = 0
+
+    async def send():
+        nonlocal next_id
+        sent[next_id] = time.perf_counter()
+        writer.write(b'{"id": %d, ' % next_id + requests[next_id % len(requests)])
+        next_id += 1
+        await writer.drain()
+
+    for _ in range(pipeline):
+        await send()
+    while sent:
+        response = json.loads(await reader.readline())
+        elapsed = time.perf_counter() - sent.pop(response['id'])
+        if 'error' in response:
+            counts['error'] += 1
+        else:
+            counts['ok'] += 1
+            latencies.append(elapsed)
+        if time.perf_counter() < deadline:
+            await send()
+    writer.close()
+
+async def run_mode(score_fn, batching, args, requests):
+    batcher = MicroBatcher(score_fn, **batching)
+    server = await ScoringServer(batcher, port=0).start()
+    latencies, counts = [], {'ok': 0, 'error': 0}
+
+    start = time.perf_counter()
+    deadline = start + args.seconds
+    await asyncio.gather(*(device(server.port, requests, deadline, args.pipeline, latencies, counts)
+                           for _ in range(args.devices)))
+    elapsed = time.perf_counter() - start
+    metrics = batcher.metrics()
+    await server.stop()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'throughput': counts['ok'] / elapsed,
+        'errors': counts['error'],
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'batch_size_mean': metrics['batch_size_mean'],
+        'max_queue_depth': metrics['max_queue_depth'],
+    }
+
+def run_benchmark(args):
+    print("="*70)
+    print("⏱️  Fall Scoring Server Load Test")
+    print("="*70)
+    print()
+
+    accel, gyro, falls = make_synthetic_stream(60, args.fs)
+    model, scaler, model_source = load_model('../models/fall', accel, gyro, falls, args.window, args.window // 2)
+    model.set_params(n_jobs=-1, verbose=0)   # As 4_train_fall_model.py fits it, minus the logging
+    naive = per_request_fn(model, scaler)
+
+    batched = BatchScorer(copy.deepcopy(model), scaler, fs=args.fs)
+    requests = make_payloads(accel, gyro, args.window, args.payload, batched)
+
+    # Same answers from both paths before timing them
+    decoded = [json.loads(b'{' + line) for line in requests[:32]]
+    expected, got = naive(decoded), batched(decoded)
+    assert all((a > 0.5) == (b > 0.5) for a, b in zip(expected, got) if a is not None)
+
+    print(f"📡 {args.devices} devices x {args.pipeline} outstanding, {args.payload} payloads "
+          f"({args.window}-sample windows), {args.seconds:.0f} s per mode")
+    print(f"   model: {model_source}, n_jobs=-1 on the per-request path")
+    print()
+
+    modes = {
+        'per-request': (naive, {'max_batch': 1, 'max_latency_ms': 0, 'workers': 1,
+                                'max_queue': args.max_queue}),
+        'micro-batched': (batched, {'max_batch': args.max_batch, 'max_latency_ms': args.max_latency_ms,
+                                    'workers': args.workers, 'max_queue': args.max_queue}),
+    }
+    results = {}
+    for name, (score_fn, batching) in modes.items():
+        r = results[name] = asyncio.run(run_mode(score_fn, batching, args, requests))
+        print(f"   {name:<14} {r['throughput']:9,.0f} req/s  p50 {r['p50_ms']:8.2f} ms  "
+              f"p99 {r['p99_ms']:8.2f} ms  batch {r['batch_size_mean']:5.1f}  "
+              f"max queue {r['max_queue_depth']:4d}  shed {r['errors']}")
+
+    print()
+    speedup = results['micro-batched']['throughput'] / max(results['per-request']['throughput'], 1e-9)
+    print(f"✅ Micro-batching: x{speedup:.1f} throughput")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the fall scoring server")
+    parser.add_argument('--devices', type=int, default=32)
+    parser.add_argument('--pipeline', type=int, default=2, help="outstanding requests per device")
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--payload', choices=['windows', 'features'], default='windows')
+    parser.add_argument('--window', type=int, default=400)
+    parser.add_argument('--fs', type=float, default=200)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-latency-ms', type=float, default=5.0)
+    parser.add_argument('--max-queue', type=int, default=1024)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    run_benchmark(args)
@@ -0,0 +1,105 @@
+# ml-training/fall-detection/bench_sensor_io.py
+
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from utils.sensor_io import HAS_PYARROW, SensorReader, schema_from_columns
+
+KFALL_COLUMNS = [
+    'TimeStamp(s)', 'FrameCounter',
+    'AccX', 'AccY', 'AccZ',
+    'GyrX', 'GyrY', 'GyrZ',
+    'EulerX', 'EulerY', 'EulerZ',
+]
+
+def make_synthetic_kfall_tree(root, n_subjects=4, n_tasks=36, n_trials=5,
+                              min_len=1000, max_len=3000, seed=42):
+    """Write a KFall-shaped sensor_data tree (SAxx/SxxTyyRzz.csv) and return its paths"""
+
+    rng = np.random.default_rng(seed)
+    paths = []
+
+    for subject in range(6, 6 + n_subjects):
+        sub_dir = os.path.join(root, f'SA{subject:02d}')
+        os.makedirs(sub_dir, exist_ok=True)
+
+        for task in range(1, n_tasks + 1):
+            for trial in range(1, n_trials + 1):
+                n = int(rng.integers(min_len, max_len))
+                data = np.column_stack([
+                    np.arange(n) / 100,
+                    np.arange(n),
+                    rng.normal(0, 0.3, size=(n, 3)) + [0, 0, 1],
+                    rng.normal(0, 40, size=(n, 3)),
+                    rng.normal(0, 30, size=(n, 3)),
+                ])
+                path = os.path.join(sub_dir, f'S{subject:02d}T{task:02d}R{trial:02d}.csv')
+                pd.DataFrame(data, columns=KFALL_COLUMNS).to_csv(path, index=False, float_format='%.6f')
+                paths.append(path)
+
+    return paths
+
+def read_default(filepath):
+    """The previous ingestion path: full read_csv, then column sniffing"""
+    data = pd.read_csv(filepath)
+    schema = schema_from_columns(data.columns)
+    accel = data[list(schema.accel_cols)].values.astype(float)
+    gyro = data[list(schema.gyro_cols)].values.astype(float)
+    return accel, gyro
+
+def time_reader(read, paths, repeats):
+    """Best-of-N wall time to read every path"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for path in paths:
+            read(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_benchmark(n_subjects, repeats):
+    print("="*70)
+    print("⏱️  Sensor CSV Ingestion Benchmark")
+    print("="*70)
+    print()
+
+    with tempfile.TemporaryDirectory() as root:
+        paths = make_synthetic_kfall_tree(root, n_subjects=n_subjects)
+        total_rows = sum(len(read_default(p)[0]) for p in paths[:20]) * len(paths) / min(20, len(paths))
+
+        print(f"📂 Synthetic tree: {len(paths)} files, ~{total_rows/1e6:.1f}M rows")
+        print()
+
+        readers = {'default read_csv': read_default,
+                   'typed (c engine)': SensorReader(engine='c').read}
+        if HAS_PYARROW:
+            readers['typed (pyarrow)'] = SensorReader(engine='pyarrow').read
+        readers['typed (numeric)'] = SensorReader(engine='numeric').read
+
+        # Typed readers must agree with the default path to float32 precision
+        ref_accel, ref_gyro = read_default(paths[0])
+        for name, read in list(readers.items())[1:]:
+            accel, gyro = read(paths[0])
+            assert accel.flags['C_CONTIGUOUS'] and gyro.flags['C_CONTIGUOUS']
+            np.testing.assert_allclose(accel, ref_accel, rtol=1e-6, atol=1e-6)
+            np.testing.assert_allclose(gyro, ref_gyro, rtol=1e-6, atol=1e-4)
+
+        baseline = None
+        for name, read in readers.items():
+            elapsed = time_reader(read, paths, repeats)
+            baseline = baseline or elapsed
+            print(f"   {name:<18} {elapsed:7.2f} s  {len(paths)/elapsed:8.1f} files/s  "
+                  f"x{baseline/elapsed:.2f}")
+
+    print()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sensor CSV readers")
+    parser.add_argument('--subjects', type=int, default=4)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    run_benchmark(args.subjects, args.repeats)
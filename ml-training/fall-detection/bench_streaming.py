@@ -0,0 +1,214 @@
+# ml-training/fall-detection/bench_streaming.py
+
+import sys
+import time
+import argparse
+import numpy as np
+import joblib
+from scipy.signal import lfilter, lfilter_zi
+
+from utils.motion_features import extract_kfall_features_batch, features_from_filtered
+from utils.streaming import StreamingFallDetector
+
+FEATURE_NAMES = [
+    'horiz_mean', 'horiz_std', 'horiz_max', 'horiz_min', 'horiz_range',
+    '3d_mean', '3d_std', '3d_max', '3d_min',
+    'gyro_mean', 'gyro_std', 'gyro_max', 'gyro_min',
+    'peak_pos', 'jerk_mean', 'jerk_max', 'horiz_std_2', '3d_var',
+]
+
+# Causal streaming features must match the same statistics computed in one batch on the
+# causally filtered signal. Against the zero-phase batch extractor (window shifted by the
+# filter delay) they differ by filter shape and edge effects, measured in scaler units
+# (what the model sees): the typical window has to stay close and the decisions agree.
+# Peak position and minima can jump between near-equal samples, so tails aren't gated,
+# and the 3D minimum gets a wider median bound.
+# Jerk is a sample-to-sample difference, so it sees the high-frequency gap between the
+# two filters: one lfilter pass is -3 dB at the cutoff where filtfilt is -6 dB, and lets
+# through a steady ~5-8% more jerk. That bias is fixed in relative terms but grows in
+# scaler units with the window (longer windows vary less), so jerk is gated relatively.
+EXACT_RTOL = 1e-7
+ZERO_PHASE_MEDIAN_TOL = 0.25
+FEATURE_MEDIAN_TOL = {'3d_min': 0.35}
+RELATIVE_FEATURES = ('jerk_mean', 'jerk_max')
+JERK_MEDIAN_RTOL = 0.10
+MIN_AGREEMENT = 0.95
+
+def make_synthetic_stream(seconds, fs=200, n_falls=6, seed=42):
+    """Walking-like IMU stream (g, deg/s) with a few impacts followed by lying still"""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * fs)
+    t = np.arange(n) / fs
+    step = 1.8 + 0.2 * np.sin(2 * np.pi * t / 30)
+    phase = 2 * np.pi * np.cumsum(step) / fs
+
+    accel = np.column_stack([
+        0.15 * np.sin(phase),
+        1.0 + 0.25 * np.sin(2 * phase),
+        0.10 * np.cos(phase),
+    ]) + rng.normal(0, 0.05, size=(n, 3))
+    gyro = np.column_stack([
+        40 * np.sin(phase), 15 * np.cos(phase), 25 * np.sin(2 * phase),
+    ]) + rng.normal(0, 5, size=(n, 3))
+
+    falls = np.sort(rng.choice(np.arange(2 * fs, n - 4 * fs), size=n_falls, replace=False))
+    for start in falls:
+        impact = slice(start, start + fs // 10)
+        accel[impact] += rng.normal(0, 1.5, size=(fs // 10, 3)) + [1.5, 2.5, 1.0]
+        gyro[impact] += rng.normal(0, 200, size=(fs // 10, 3))
+        still = slice(start + fs // 10, start + 3 * fs)
+        accel[still] = [0.98, 0.1, 0.05] + rng.normal(0, 0.02, size=(len(accel[still]), 3))
+        gyro[still] = rng.normal(0, 2, size=(len(gyro[still]), 3))
+    return accel, gyro, falls
+
+def window_starts(n, window, hop):
+    return np.arange(0, n - window + 1, hop)
+
+def load_model(models_dir, accel, gyro, falls, window, hop):
+    """The trained forest and scaler, or a small stand-in fitted on the synthetic stream"""
+    try:
+        model = joblib.load(f'{models_dir}/fall_model.pkl')
+        scaler = joblib.load(f'{models_dir}/scaler.pkl')
+        model.verbose = 0
+        return model, scaler, 'fall_model.pkl'
+    except (OSError, EOFError):
+        pass
+
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    starts = window_starts(len(accel), window, hop)
+    X = extract_kfall_features_batch(np.stack([accel[s:s + window] for s in starts]),
+                                     np.stack([gyro[s:s + window] for s in starts]))
+    y = np.array([np.any((falls >= s) & (falls < s + window)) for s in starts], dtype=int)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=50, max_depth=10, random_state=42)
+    model.fit(scaler.transform(X), y)
+    return model, scaler, 'stand-in forest (no loadable fall_model.pkl / scaler.pkl)'
+
+def run_stream(detector, accel, gyro, chunk):
+    events = []
+    for start in range(0, len(accel), chunk):
+        events += detector.process(accel[start:start + chunk], gyro[start:start + chunk])
+    return events
+
+def samples_per_second(make_detector, accel, gyro, chunk, min_seconds=1.0):
+    """Samples/s through one detector, restarting the stream until min_seconds have passed"""
+    done, start = 0, time.perf_counter()
+    while True:
+        detector = make_detector()
+        run_stream(detector, accel, gyro, chunk)
+        done += len(accel)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return done / elapsed
+
+def refeaturize_rate(accel, gyro, window, hop, max_windows=400):
+    """Samples/s when every hop re-featurizes the whole window with the batch extractor"""
+    starts = window_starts(len(accel), window, hop)[:max_windows]
+    start = time.perf_counter()
+    for s in starts:
+        extract_kfall_features_batch(accel[s:s + window][None], gyro[s:s + window][None])
+    return len(starts) * hop / (time.perf_counter() - start)
+
+def check_parity(detector, accel, gyro, chunk, fs, scale):
+    """Streaming features vs the batch statistics, causal and zero-phase"""
+    events = run_stream(detector, accel, gyro, chunk)
+    window = detector.window
+    ends = np.array([e[0] for e in events])
+    streamed = np.array([e[2] for e in events])
+    starts = ends - window + 1
+
+    # Same causal filter over the whole stream, then the batch statistics per window
+    b, a = detector._b, detector._a
+    raw = np.concatenate([accel, gyro], axis=1).T
+    causal, _ = lfilter(b, a, raw, axis=1, zi=lfilter_zi(b, a)[None, :] * raw[:, :1])
+    exact = features_from_filtered(np.stack([causal[:, s:s + window] for s in starts]))
+    exact_err = np.abs(streamed - exact) / np.maximum(np.abs(exact), 1e-12)
+
+    # The zero-phase extractor on the raw window the causal one lags behind
+    aligned = starts - detector.delay >= 0
+    events, streamed = [e for e, k in zip(events, aligned) if k], streamed[aligned]
+    exact_err = exact_err[aligned]
+    shifted = starts[aligned] - detector.delay
+    zero_phase = extract_kfall_features_batch(np.stack([accel[s:s + window] for s in shifted]),
+                                              np.stack([gyro[s:s + window] for s in shifted]),
+                                              fs=fs, dtype=np.float64)
+    lag_err = np.abs(streamed - zero_phase) / np.maximum(scale, 1e-12)
+    rel_err = np.abs(streamed - zero_phase) / np.maximum(np.abs(zero_phase), 1e-12)
+    return events, zero_phase, exact_err, lag_err, rel_err
+
+def zero_phase_gate(lag_err, rel_err):
+    """Per-feature median error against the zero-phase extractor, its tolerance and unit"""
+    relative = np.isin(FEATURE_NAMES, RELATIVE_FEATURES)
+    p50 = np.where(relative, np.median(rel_err, axis=0), np.median(lag_err, axis=0))
+    tol = np.array([JERK_MEDIAN_RTOL if r else FEATURE_MEDIAN_TOL.get(name, ZERO_PHASE_MEDIAN_TOL)
+                    for name, r in zip(FEATURE_NAMES, relative)])
+    return p50, tol, relative
+
+def run_benchmark(seconds, window, hop, chunk, fs):
+    print("="*70)
+    print("⏱️  Streaming Fall Detector Benchmark")
+    print("="*70)
+    print()
+
+    accel, gyro, falls = make_synthetic_stream(seconds, fs)
+    model, scaler, model_source = load_model('../models/fall', accel, gyro, falls, window, hop)
+    print(f"📡 Synthetic stream: {len(accel):,} samples ({seconds:.0f} s at {fs} Hz), {len(falls)} falls")
+    print(f"   window {window} ({window/fs:.2f} s), hop {hop}, chunks of {chunk}; model: {model_source}")
+    print()
+
+    def make(with_model=True):
+        return lambda: StreamingFallDetector(model if with_model else None, scaler, window, hop, fs=fs)
+
+    detector = make()()
+    events, zero_phase, exact_err, lag_err, rel_err = check_parity(detector, accel, gyro, chunk, fs,
+                                                                   scaler.scale_)
+
+    print("🔍 Parity:")
+    print(f"   {len(events)} scored windows")
+    print(f"   vs batch stats on the causal signal: max rel error {exact_err.max():.2e} "
+          f"(tol {EXACT_RTOL:.0e})")
+    p50, tol, relative = zero_phase_gate(lag_err, rel_err)
+    print(f"   vs extract_kfall_features_batch (zero-phase, {detector.delay} samples earlier), "
+          f"median |error| in scaler units (jerk: relative):")
+    for k in np.argsort(-p50 / tol)[:6]:
+        err = rel_err if relative[k] else lag_err
+        print(f"      {FEATURE_NAMES[k]:<12} p50 {p50[k]:.3f} (tol {tol[k]:.2f})  "
+              f"p95 {np.percentile(err[:, k], 95):.3f}  max {err[:, k].max():.3f}")
+
+    streamed_p = np.array([e[1] for e in events])
+    batch_p = model.predict_proba(scaler.transform(zero_phase))[:, 1]
+    agreement = np.mean((streamed_p > 0.5) == (batch_p > 0.5))
+    print(f"   fall / no-fall agreement with batch features: {agreement*100:.1f}% (min {MIN_AGREEMENT*100:.0f}%)")
+    print()
+
+    ok = (exact_err.max() <= EXACT_RTOL and np.all(p50 <= tol)
+          and agreement >= MIN_AGREEMENT)
+
+    print("⏱️  Samples / second per stream:")
+    features_rate = samples_per_second(make(False), accel, gyro, chunk)
+    scored_rate = samples_per_second(make(), accel, gyro, chunk)
+    baseline = refeaturize_rate(accel, gyro, window, hop)
+    print(f"   streaming (features only):     {features_rate:12,.0f}")
+    print(f"   streaming (scored every hop):  {scored_rate:12,.0f}   "
+          f"~{scored_rate / fs:,.0f} real-time streams per core")
+    print(f"   re-featurize every window:     {baseline:12,.0f}   x{scored_rate / baseline:.1f} slower"
+          if baseline < scored_rate else
+          f"   re-featurize every window:     {baseline:12,.0f}")
+    print()
+
+    print("✅ Parity within tolerance" if ok else "❌ Parity outside tolerance")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark and check the streaming fall detector")
+    parser.add_argument('--seconds', type=float, default=120)
+    parser.add_argument('--window', type=int, default=600, help="samples per feature window")
+    parser.add_argument('--hop', type=int, default=20,
+                        help="samples between scores (20 = the firmware's 100 ms check at 200 Hz)")
+    parser.add_argument('--chunk', type=int, default=20, help="samples per incoming packet")
+    parser.add_argument('--fs', type=float, default=200)
+    args = parser.parse_args()
+
+    sys.exit(0 if run_benchmark(args.seconds, args.window, args.hop, args.chunk, args.fs) else 1)
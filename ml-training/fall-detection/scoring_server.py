@@ -0,0 +1,56 @@
+# ml-training/fall-detection/scoring_server.py
+
+import json
+import asyncio
+import argparse
+import joblib
+
+from utils.batch_scoring import BatchScorer, MicroBatcher, ScoringServer
+
+async def serve(args):
+    models_dir = '../models/fall'
+    try:
+        model = joblib.load(f'{models_dir}/fall_model.pkl')
+        scaler = joblib.load(f'{models_dir}/scaler.pkl')
+    except FileNotFoundError as e:
+        print(f"❌ File not found: {e}")
+        return
+
+    batcher = MicroBatcher(BatchScorer(model, scaler, fs=args.fs), max_batch=args.max_batch,
+                           max_latency_ms=args.max_latency_ms, max_queue=args.max_queue, workers=args.workers)
+    server = await ScoringServer(batcher, args.host, args.port, max_inflight=args.max_inflight).start()
+
+    print("="*70)
+    print("🛰️  Fall Scoring Server")
+    print("="*70)
+    print()
+    print(f"   Listening on {server.host}:{server.port} (newline-delimited JSON)")
+    print(f"   Batches of up to {args.max_batch}, closed after {args.max_latency_ms} ms, "
+          f"{args.workers} worker(s), queue {args.max_queue}")
+    print()
+
+    try:
+        while True:
+            await asyncio.sleep(args.metrics_every)
+            print(json.dumps(batcher.metrics()))
+    finally:
+        await server.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fall_model.pkl to many devices with micro-batching")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-latency-ms', type=float, default=5.0,
+                        help="longest a request waits for its batch to fill")
+    parser.add_argument('--max-queue', type=int, default=1024, help="queued requests before shedding load")
+    parser.add_argument('--max-inflight', type=int, default=64, help="unanswered requests per connection")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--fs', type=float, default=200, help="sample rate of submitted IMU windows")
+    parser.add_argument('--metrics-every', type=float, default=10.0, help="seconds between metrics lines")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,128 @@
+# ml-training/fall-detection/sweep_fall_model.py
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+
+from utils.forest_compiler import flash_bytes, flatten_forest, tree_depth
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from sweep import (SharedArrays, last_rungs, param_grid, pareto_front, print_table,
+                   successive_halving, write_results)
+
+# Centred on 4_train_fall_model.py's forest (100 trees, depth 15, split 5, leaf 2)
+SPACE = {
+    'n_estimators': [25, 50, 100, 200],
+    'max_depth': [6, 8, 10, 12, 15],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4],
+}
+OBJECTIVE = 'f1'
+COSTS = ('flash_bytes', 'node_visits', 'host_p50_ms')   # Smaller is better on the ESP32
+VISIT_ROWS = 512   # Validation rows the mean root-to-leaf path length is taken over
+
+def train_trial(params, budget, data):
+    """Fit on a seeded `budget` share of the training rows, score on the full validation set"""
+    X, y = data['X_train'], data['y_train']
+    n = max(int(round(len(X) * budget)), 2)
+    rows = np.sort(np.random.default_rng(42).permutation(len(X))[:n])
+
+    model = RandomForestClassifier(random_state=42, n_jobs=1, **params)
+    model.fit(X[rows], y[rows])
+
+    X_val, y_val = data['X_val'], data['y_val']
+    pred = model.predict(X_val)
+    flat = flatten_forest(model)
+    paths = model.decision_path(X_val[:VISIT_ROWS])[0]
+    metrics = {
+        'accuracy': float(accuracy_score(y_val, pred)),
+        'precision': float(precision_score(y_val, pred, zero_division=0)),
+        'recall': float(recall_score(y_val, pred, zero_division=0)),
+        'f1': float(f1_score(y_val, pred, zero_division=0)),
+        'train_rows': int(n),
+        'nodes': int(len(flat['feature'])),
+        'depth': int(tree_depth(model)),
+        'flash_bytes': int(flash_bytes(flat)),
+        'node_visits': float(paths.nnz / min(len(X_val), VISIT_ROWS)),
+    }
+    return metrics, model
+
+def host_latency(model, X, runs=200):
+    """p50 of single-window predict_proba, as a device would call it; run in the parent, uncontended"""
+    latencies = np.empty(runs)
+    for i in range(runs):
+        row = X[i % len(X)][None]
+        start = time.perf_counter_ns()
+        model.predict_proba(row)
+        latencies[i] = (time.perf_counter_ns() - start) / 1e6
+    return float(np.percentile(latencies, 50))
+
+def run_sweep(args):
+    print("="*70)
+    print("🔍 Fall Model Hyperparameter Sweep")
+    print("="*70)
+    print()
+
+    processed_dir = '../data/processed'
+    try:
+        X_train = np.load(f'{processed_dir}/X_train.npy')
+        y_train = np.load(f'{processed_dir}/y_train.npy')
+        X_val = np.load(f'{processed_dir}/X_val.npy')
+        y_val = np.load(f'{processed_dir}/y_val.npy')
+    except FileNotFoundError:
+        print("❌ Dataset files not found!")
+        print("   Run: python 3_create_balanced_dataset.py")
+        return
+
+    # Scaled once, as 4_train_fall_model.py does, then shared by every worker
+    scaler = StandardScaler().fit(X_train)
+    configs = param_grid(SPACE, args.trials)
+    with SharedArrays({'X_train': scaler.transform(X_train), 'y_train': y_train,
+                       'X_val': scaler.transform(X_val), 'y_val': y_val}) as shared:
+        print(f"📊 Train {X_train.shape}, Val {X_val.shape} in {shared.nbytes / 1e6:.1f} MB of shared memory")
+        print(f"   {len(configs)} configs, {args.workers} worker(s), "
+              f"training share {args.min_budget:g} -> 1 (eta {args.eta})")
+        print()
+
+        start = time.perf_counter()
+        rows, models = successive_halving(train_trial, configs, shared.spec(), OBJECTIVE,
+                                          args.min_budget, 1.0, args.eta, args.workers)
+        elapsed = time.perf_counter() - start
+
+    final = last_rungs(rows)
+    X_probe = scaler.transform(X_val[:64])
+    for row in final:
+        row['host_p50_ms'] = host_latency(models[row['trial']], X_probe)
+    # Stopped trials are scored on less data, so their F1 only understates them;
+    # one that still makes the front is a cheap model worth retraining in full
+    front = set(pareto_front(final, [OBJECTIVE], COSTS))
+    for i, row in enumerate(final):
+        row['pareto'] = i in front
+
+    print()
+    print(f"📋 Each trial at its last rung ({elapsed:.1f} s total, * = Pareto-optimal):")
+    print_table(final, ['trial', 'budget', 'f1', 'accuracy', 'recall', 'flash_bytes', 'node_visits', 'host_p50_ms']
+                + [f'param.{k}' for k in sorted(SPACE)], sort_key=OBJECTIVE)
+    print()
+
+    meta = {'objective': OBJECTIVE, 'costs': list(COSTS), 'space': SPACE, 'eta': args.eta,
+            'min_budget': args.min_budget, 'workers': args.workers, 'seconds': elapsed}
+    csv_path, json_path = write_results(rows, args.output, meta)
+    print(f"💾 Saved: {csv_path}, {json_path}")
+    print("🎯 Retrain a Pareto pick with 4_train_fall_model.py, then 7_export_forest_to_c.py")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep fall-model hyperparameters against ESP32 cost")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) - 1))
+    parser.add_argument('--trials', type=int, default=None, help="random subset of the grid (default: all)")
+    parser.add_argument('--min-budget', type=float, default=1 / 9, help="training share of the first rung")
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--output', default='../models/fall/sweep_results.csv')
+    args = parser.parse_args()
+
+    run_sweep(args)
@@ -1,5 +1,43 @@
 # ml-training/fall-detection/utils/__init__.py
 
-from .motion_features import extract_kfall_features, lowpass_filter
+from .batch_scoring import BatchScorer, MicroBatcher, ScoringServer
+from .feature_cache import FeatureCache, params_key
+from .label_index import LabelIndex, TrialKey, build_label_index, parse_kfall_filename
+from .motion_features import (
+    extract_kfall_features,
+    extract_kfall_features_batch,
+    lowpass_filter,
+)
+from .sensor_io import (
+    SensorReader,
+    SensorSchema,
+    detect_sensor_schema,
+    parse_sensor_bytes,
+    read_sensor_arrays,
+)
+from .signal_store import SignalStore, SignalStoreWriter
+from .streaming import SlidingStats, StreamingFallDetector
 
-__all__ = ['extract_kfall_features', 'lowpass_filter']
\ No newline at end of file
+__all__ = [
+    'BatchScorer',
+    'FeatureCache',
+    'LabelIndex',
+    'MicroBatcher',
+    'ScoringServer',
+    'SensorReader',
+    'SensorSchema',
+    'SignalStore',
+    'SignalStoreWriter',
+    'SlidingStats',
+    'StreamingFallDetector',
+    'TrialKey',
+    'build_label_index',
+    'detect_sensor_schema',
+    'extract_kfall_features',
+    'extract_kfall_features_batch',
+    'lowpass_filter',
+    'params_key',
+    'parse_kfall_filename',
+    'parse_sensor_bytes',
+    'read_sensor_arrays',
+]
@@ -0,0 +1,273 @@
+# ml-training/fall-detection/utils/batch_scoring.py
+
+import json
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .forest_compiler import LEAF_SCALE, flatten_forest, forest_scores
+from .motion_features import NUM_FEATURES, extract_kfall_features_batch
+
+class BatchScorer:
+    """
+    P(fall) for many requests in one vectorized call
+
+    A request is either {'features': [18 floats]} or an IMU window
+    {'accel': [[x, y, z], ...], 'gyro': [[x, y, z], ...]}; windows are
+    featurized together with extract_kfall_features_batch. A fitted
+    RandomForest is scored through its flattened node arrays (same
+    decisions as model.predict); other models use predict_proba on the
+    scaled batch. Rows that cannot be featurized score None.
+    """
+
+    def __init__(self, model, scaler=None, cutoff=5, fs=200, order=4, compile_forest=True):
+        self.model = model
+        self.scaler = scaler
+        self.filter_params = {'cutoff': cutoff, 'fs': fs, 'order': order}
+        # Batches already amortize the call; nested joblib workers only add dispatch overhead
+        for attr, value in (('n_jobs', 1), ('verbose', 0)):
+            if hasattr(model, attr):
+                setattr(model, attr, value)
+        self._flat = flatten_forest(model, scaler) if compile_forest and hasattr(model, 'estimators_') else None
+
+    def features(self, requests):
+        """(N, 18) float32 features; malformed requests stay NaN"""
+        X = np.full((len(requests), NUM_FEATURES), np.nan, dtype=np.float32)
+        windows, accel, gyro = [], [], []
+        for i, r in enumerate(requests):
+            try:
+                if 'features' in r:
+                    X[i] = np.asarray(r['features'], dtype=np.float32).reshape(NUM_FEATURES)
+                else:
+                    # Both converted before either is kept, so a bad request can't misalign the batch
+                    a = np.asarray(r['accel'], dtype=np.float64).reshape(-1, 3)
+                    g = np.asarray(r['gyro'], dtype=np.float64).reshape(-1, 3)
+                    if len(a) != len(g):
+                        continue
+                    accel.append(a)
+                    gyro.append(g)
+                    windows.append(i)
+            except (KeyError, TypeError, ValueError):
+                continue
+        if windows:
+            X[windows] = extract_kfall_features_batch(accel, gyro, **self.filter_params)
+        return X
+
+    def score_features(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        p_fall = np.full(len(X), np.nan)
+        valid = ~np.isnan(X).any(axis=1)
+        if valid.any():
+            if self._flat is not None:
+                scores = forest_scores(self._flat, X[valid])
+                p_fall[valid] = scores / (len(self._flat['roots']) * LEAF_SCALE)
+            else:
+                rows = X[valid].astype(np.float64)
+                if self.scaler is not None:
+                    rows = self.scaler.transform(rows)
+                p_fall[valid] = self.model.predict_proba(rows)[:, 1]
+        return p_fall
+
+    def __call__(self, requests):
+        p_fall = self.score_features(self.features(requests))
+        return [None if np.isnan(p) else float(p) for p in p_fall]
+
+class MicroBatcher:
+    """
+    Coalesce concurrent requests into batches for a blocking score function
+
+    A batch closes at max_batch requests or max_latency_ms after its first
+    request was queued, whichever comes first, and runs score_fn(list of
+    requests) on a thread pool; up to `workers` batches are in flight. The
+    queue holds at most max_queue requests: submit() raises
+    asyncio.QueueFull beyond that, so callers can shed load.
+    """
+
+    def __init__(self, score_fn, max_batch=64, max_latency_ms=5.0, max_queue=1024, workers=2,
+                 history=10000):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000
+        self.max_queue = max_queue
+        self.workers = workers
+        self._queue = None
+        self._task = None
+        self._pool = None
+        self._batch_sizes = deque(maxlen=history)
+        self._latencies = deque(maxlen=history)
+        self._depths = deque(maxlen=history)
+        self.counters = {'requests': 0, 'rejected': 0, 'batches': 0, 'errors': 0, 'max_queue_depth': 0}
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scorer')
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for _ in range(self.workers):   # Wait for the batches in flight
+            await self._slots.acquire()
+        self._pool.shutdown(wait=True)
+
+    async def submit(self, request):
+        """Score one request; raises asyncio.QueueFull when the queue is at max_queue"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        try:
+            self._queue.put_nowait((loop.time(), request, future))
+        except asyncio.QueueFull:
+            self.counters['rejected'] += 1
+            raise
+        self.counters['requests'] += 1
+        depth = self._queue.qsize()
+        if depth > self.counters['max_queue_depth']:
+            self.counters['max_queue_depth'] = depth
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = batch[0][0] + self.max_latency
+            while len(batch) < self.max_batch:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self._depths.append(queue.qsize())
+            await self._slots.acquire()
+            loop.create_task(self._score(batch))
+
+    async def _score(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self._pool, self.score_fn, [r for _, r, _ in batch])
+        except Exception as e:
+            self.counters['errors'] += 1
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            now = loop.time()
+            for (queued, _, future), result in zip(batch, results):
+                self._latencies.append(now - queued)
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self.counters['batches'] += 1
+            self._batch_sizes.append(len(batch))
+            self._slots.release()
+
+    def metrics(self):
+        """Counters plus batch size, queue depth and queue-to-result latency over the recent history"""
+        sizes = np.array(self._batch_sizes) if self._batch_sizes else np.zeros(1)
+        depths = np.array(self._depths) if self._depths else np.zeros(1)
+        latencies = np.array(self._latencies) * 1000 if self._latencies else np.zeros(1)
+        return dict(self.counters, **{
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'queue_depth_mean': float(depths.mean()),
+            'batch_size_mean': float(sizes.mean()),
+            'batch_size_max': int(sizes.max()),
+            'latency_p50_ms': float(np.percentile(latencies, 50)),
+            'latency_p99_ms': float(np.percentile(latencies, 99)),
+        })
+
+class ScoringServer:
+    """
+    Newline-delimited JSON over TCP in front of a MicroBatcher
+
+    Each line is a request for BatchScorer plus an optional 'id', answered
+    with {'id', 'p_fall', 'fall'} (possibly out of order), or
+    {'op': 'metrics'}. A full queue answers {'id', 'error': 'overloaded'},
+    a line that isn't a JSON object {'error': 'invalid request'};
+    each connection has at most max_inflight unanswered requests, after
+    which the server stops reading from it.
+    """
+
+    def __init__(self, batcher, host='127.0.0.1', port=8765, threshold=0.5, max_inflight=64):
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self.threshold = threshold
+        self.max_inflight = max_inflight
+        self._server = None
+
+    async def start(self):
+        await self.batcher.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=2 ** 24)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def _answer(self, request, writer, inflight):
+        try:
+            if request.get('op') == 'metrics':
+                response = self.batcher.metrics()
+            else:
+                p_fall = await self.batcher.submit(request)
+                response = {'id': request.get('id'), 'p_fall': p_fall,
+                            'fall': p_fall is not None and p_fall > self.threshold}
+        except asyncio.QueueFull:
+            response = {'id': request.get('id'), 'error': 'overloaded'}
+        except Exception as e:
+            # Whatever went wrong, the client gets a line back instead of waiting forever
+            response = {'id': request.get('id'), 'error': f'{type(e).__name__}: {e}'}
+        try:
+            try:
+                line = json.dumps(response)
+            except (TypeError, ValueError) as e:
+                line = json.dumps({'id': request.get('id'), 'error': f'{type(e).__name__}: {e}'})
+            writer.write((line + '\n').encode())
+        finally:
+            inflight.release()
+
+    async def _handle(self, reader, writer):
+        inflight = asyncio.Semaphore(self.max_inflight)
+        tasks = set()
+        try:
+            while True:
+                await inflight.acquire()
+                line = await reader.readline()
+                if not line:
+                    inflight.release()
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    writer.write(b'{"error": "invalid json"}\n')
+                    inflight.release()
+                    continue
+                if not isinstance(request, dict):
+                    writer.write(b'{"error": "invalid request"}\n')
+                    inflight.release()
+                    continue
+                task = asyncio.get_running_loop().create_task(self._answer(request, writer, inflight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                await writer.drain()
+            if tasks:
+                await asyncio.gather(*tasks)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
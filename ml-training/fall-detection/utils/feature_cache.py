@@ -0,0 +1,168 @@
+# ml-training/fall-detection/utils/feature_cache.py
+
+import os
+import time
+import hashlib
+
+import numpy as np
+
+from .motion_features import FEATURE_SET_VERSION, NUM_FEATURES
+
+CACHE_FILE = 'features.npz'
+
+def params_key(cutoff=5, fs=200, order=4, version=FEATURE_SET_VERSION):
+    """Identify a feature-extractor configuration"""
+    return f"v{version}-cutoff{float(cutoff):g}-fs{float(fs):g}-order{int(order)}"
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-1 of a file's contents"""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+class FeatureCache:
+    """
+    On-disk cache of per-recording features
+
+    Entries are keyed by (path relative to root, extractor params) and are
+    valid while the file's size and mtime match. With use_hash, a stat
+    mismatch falls back to comparing content hashes, so touched or copied
+    files are not re-featurized. The store is one columnar .npz file.
+    """
+
+    def __init__(self, cache_dir, root, params, use_hash=False):
+        self.cache_dir = cache_dir
+        self.root = root
+        self.params = params
+        self.use_hash = use_hash
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._load()
+
+    @property
+    def path(self):
+        return os.path.join(self.cache_dir, CACHE_FILE)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with np.load(self.path, allow_pickle=False) as store:
+            if store['features'].shape[1:] != (NUM_FEATURES,):
+                return
+            columns = zip(
+                store['path'].tolist(), store['params'].tolist(),
+                store['size'].tolist(), store['mtime_ns'].tolist(),
+                store['digest'].tolist(), store['last_used'].tolist(),
+                store['features'],
+            )
+            for path, params, size, mtime_ns, digest, last_used, features in columns:
+                self.entries[(path, params)] = {
+                    'size': size, 'mtime_ns': mtime_ns, 'digest': digest,
+                    'last_used': last_used, 'features': features,
+                }
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _key(self, filepath):
+        return (os.path.relpath(filepath, self.root), self.params)
+
+    def lookup(self, filepath):
+        """Cached features for a file, or None if missing or stale"""
+        entry = self.entries.get(self._key(filepath))
+
+        if entry is not None:
+            st = os.stat(filepath)
+            valid = entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns
+
+            if not valid and self.use_hash and entry['digest'] and entry['size'] == st.st_size:
+                valid = entry['digest'] == file_digest(filepath)
+                if valid:
+                    entry['mtime_ns'] = st.st_mtime_ns
+
+            if valid:
+                entry['last_used'] = int(time.time())
+                self._dirty = True
+                self.hits += 1
+                return entry['features']
+
+        self.misses += 1
+        return None
+
+    def store(self, filepath, features):
+        """Add or replace the features for a file"""
+        st = os.stat(filepath)
+        self.entries[self._key(filepath)] = {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'digest': file_digest(filepath) if self.use_hash else '',
+            'last_used': int(time.time()),
+            'features': np.asarray(features, dtype=np.float64),
+        }
+        self._dirty = True
+
+    def gc(self, max_age_days=None):
+        """
+        Evict entries for deleted or modified files, and entries for other
+        extractor params not used within max_age_days (all of them if None)
+
+        Returns:
+            number of evicted entries
+        """
+        now = int(time.time())
+        stale = []
+
+        for (path, params), entry in self.entries.items():
+            filepath = os.path.join(self.root, path)
+
+            if params != self.params:
+                if max_age_days is None or now - entry['last_used'] > max_age_days * 86400:
+                    stale.append((path, params))
+                continue
+
+            try:
+                st = os.stat(filepath)
+            except FileNotFoundError:
+                stale.append((path, params))
+                continue
+
+            if entry['size'] != st.st_size or (
+                    entry['mtime_ns'] != st.st_mtime_ns and not self.use_hash):
+                stale.append((path, params))
+
+        for key in stale:
+            del self.entries[key]
+
+        if stale:
+            self._dirty = True
+
+        return len(stale)
+
+    def save(self):
+        """Write the store atomically if anything changed"""
+        if not self._dirty:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        keys = list(self.entries.keys())
+        entries = [self.entries[k] for k in keys]
+
+        tmp_path = self.path + '.tmp.npz'
+        np.savez(
+            tmp_path,
+            path=np.array([k[0] for k in keys], dtype=str),
+            params=np.array([k[1] for k in keys], dtype=str),
+            size=np.array([e['size'] for e in entries], dtype=np.int64),
+            mtime_ns=np.array([e['mtime_ns'] for e in entries], dtype=np.int64),
+            digest=np.array([e['digest'] for e in entries], dtype=str),
+            last_used=np.array([e['last_used'] for e in entries], dtype=np.int64),
+            features=np.array([e['features'] for e in entries], dtype=np.float64).reshape(-1, NUM_FEATURES),
+        )
+        os.replace(tmp_path, self.path)
+        self._dirty = False
@@ -0,0 +1,297 @@
+# ml-training/fall-detection/utils/forest_compiler.py
+
+import numpy as np
+
+LEAF = 0xFF            # Feature index marking a leaf node
+LEAF_SCALE = 65535     # Leaf P(fall) is stored as uint16 fixed point
+ARRAY_NODE_BYTES = 5   # uint8 feature + uint16 threshold rank / leaf value + uint16 right offset
+# Rough Xtensa code size of one generated `if` (load, compare, branch) and one leaf return
+BRANCH_NODE_BYTES = 12
+BRANCH_LEAF_BYTES = 6
+
+def _ordered(bits):
+    """float32 bit patterns <-> integers that sort like the floats (self-inverse)"""
+    return bits ^ ((bits >> 31) & 0x7FFFFFFF)
+
+def fold_thresholds(features, thresholds, scaler=None):
+    """
+    Raw-feature float32 thresholds T with (x <= T) == (float32(scaler(x)) <= t)
+
+    sklearn scales in float64, casts to float32 and compares against the
+    float64 threshold. The equivalent raw cut is found by bisecting the
+    float32 number line, so every float32 input takes the same branch as
+    model.predict. -inf means "never left", float32 max "always left".
+    """
+    features = np.asarray(features, dtype=np.int64)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    if scaler is None:
+        mean = np.zeros(features.max(initial=0) + 1)
+        scale = np.ones_like(mean)
+    else:
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(scaler.n_features_in_)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(scaler.n_features_in_)
+
+    def goes_left(keys):
+        x = _ordered(keys.astype(np.int32)).view(np.float32).astype(np.float64)
+        with np.errstate(over='ignore'):   # Probing near float32 max overflows to inf, as sklearn would
+            return ((x - mean[features]) / scale[features]).astype(np.float32) <= thresholds
+
+    max_float = np.finfo(np.float32).max
+    lo = np.full(len(features), _ordered(np.array([-max_float], np.float32).view(np.int32))[0], np.int64)
+    hi = np.full(len(features), _ordered(np.array([max_float], np.float32).view(np.int32))[0], np.int64)
+    never = ~goes_left(lo)
+
+    # Largest key that still goes left
+    while True:
+        open_ = lo < hi
+        if not open_.any():
+            break
+        mid = (lo + hi + 1) // 2
+        left = goes_left(mid)
+        lo = np.where(open_ & left, mid, lo)
+        hi = np.where(open_ & ~left, mid - 1, hi)
+
+    folded = _ordered(lo.astype(np.int32)).view(np.float32).copy()
+    folded[never] = -np.inf
+    return folded
+
+def flatten_forest(forest, scaler=None, max_depth=None, n_trees=None, positive_class=1):
+    """
+    Preorder node arrays for a fitted RandomForestClassifier
+
+    The left child always follows its parent; `right` is the offset to the
+    right child. Subtrees below max_depth collapse into a leaf holding that
+    node's class distribution. Thresholds are folded through the scaler and
+    replaced by their rank among the feature's distinct cuts, so the
+    device compares small integers after one binary search per feature.
+    """
+    trees = forest.estimators_[:n_trees] if n_trees else forest.estimators_
+    positive = list(forest.classes_).index(positive_class)
+
+    feature, threshold, right, leaf_value, roots = [], [], [], [], []
+    for estimator in trees:
+        t = estimator.tree_
+        roots.append(len(feature))
+        stack = [(0, 0, None)]   # (sklearn node, depth, index of the parent waiting for its right child)
+        while stack:
+            node, depth, parent = stack.pop()
+            index = len(feature)
+            if parent is not None:
+                right[parent] = index - parent
+            value = t.value[node][0]
+            is_leaf = t.children_left[node] == -1 or (max_depth is not None and depth >= max_depth)
+            feature.append(LEAF if is_leaf else int(t.feature[node]))
+            threshold.append(0.0 if is_leaf else float(t.threshold[node]))
+            leaf_value.append(int(round(value[positive] / value.sum() * LEAF_SCALE)) if is_leaf else 0)
+            right.append(0)
+            if not is_leaf:
+                stack.append((t.children_right[node], depth + 1, index))
+                stack.append((t.children_left[node], depth + 1, None))
+
+    feature = np.array(feature, dtype=np.int64)
+    right = np.array(right, dtype=np.int64)
+    if right.max(initial=0) > 0xFFFF:
+        raise ValueError("A subtree is too large for 16-bit right offsets; cap the depth")
+
+    internal = feature != LEAF
+    n_features = int(forest.n_features_in_)
+    if n_features >= LEAF:
+        raise ValueError(f"{n_features} features don't fit the uint8 feature index")
+    folded = np.zeros(len(feature), dtype=np.float32)
+    folded[internal] = fold_thresholds(feature[internal], np.array(threshold)[internal], scaler)
+
+    # Per-feature sorted cuts; a node stores its cut's rank
+    cuts, cut_start, rank = [], [0], np.array(leaf_value, dtype=np.int64)
+    for f in range(n_features):
+        mine = internal & (feature == f)
+        unique = np.unique(folded[mine])
+        rank[mine] = np.searchsorted(unique, folded[mine])
+        cuts.append(unique)
+        cut_start.append(cut_start[-1] + len(unique))
+    if rank.max(initial=0) > 0xFFFF:
+        raise ValueError("More than 65536 distinct cuts on one feature")
+
+    return {
+        'feature': feature.astype(np.uint8),
+        'value': rank.astype(np.uint16),         # cut rank (internal) or P(fall) * LEAF_SCALE (leaf)
+        'right': right.astype(np.uint16),
+        'roots': np.array(roots, dtype=np.uint32),
+        'cuts': np.concatenate(cuts).astype(np.float32) if cuts else np.empty(0, np.float32),
+        'cut_start': np.array(cut_start, dtype=np.uint16 if cut_start[-1] <= 0xFFFF else np.uint32),
+        'folded': folded,
+        'n_features': n_features,
+        'max_depth': max_depth,
+    }
+
+def flash_bytes(flat, mode='arrays'):
+    """Estimated flash footprint of the generated model"""
+    nodes = len(flat['feature'])
+    leaves = int((flat['feature'] == LEAF).sum())
+    if mode == 'branches':
+        return (nodes - leaves) * BRANCH_NODE_BYTES + leaves * BRANCH_LEAF_BYTES
+    return (nodes * ARRAY_NODE_BYTES + flat['roots'].nbytes + flat['cuts'].nbytes
+            + flat['cut_start'].nbytes)
+
+def tree_depth(forest):
+    return max(e.tree_.max_depth for e in forest.estimators_)
+
+def fit_to_budget(forest, scaler, budget_bytes, mode='arrays', max_depth=None, n_trees=None):
+    """
+    Largest depth cap (then tree count) whose export fits budget_bytes
+
+    Returns (flat, max_depth, n_trees); raises ValueError if even one stump
+    tree does not fit.
+    """
+    n_trees = n_trees or len(forest.estimators_)
+    depth = max_depth or tree_depth(forest)
+    while True:
+        flat = flatten_forest(forest, scaler, None if depth >= tree_depth(forest) else depth, n_trees)
+        if flash_bytes(flat, mode) <= budget_bytes:
+            return flat, flat['max_depth'], n_trees
+        if depth > 1:
+            depth -= 1
+        elif n_trees > 1:
+            depth, n_trees = max_depth or tree_depth(forest), n_trees // 2
+        else:
+            raise ValueError(f"No depth / tree count fits {budget_bytes} bytes")
+
+def feature_bins(flat, X):
+    """Rank of each float32 feature among its cuts (count of cuts < x), as on the device"""
+    X = np.asarray(X, dtype=np.float32)
+    bins = np.empty(X.shape, dtype=np.int64)
+    for f in range(flat['n_features']):
+        cuts = flat['cuts'][flat['cut_start'][f]:flat['cut_start'][f + 1]]
+        bins[:, f] = np.searchsorted(cuts, X[:, f], side='left')
+    return bins
+
+def forest_scores(flat, X):
+    """
+    uint32 sum of leaf values over trees, exactly what the C code computes
+
+    All samples and trees walk the node arrays together, one level per step.
+    """
+    bins = feature_bins(flat, X)
+    feature = flat['feature'].astype(np.int64)
+    value = flat['value'].astype(np.int64)
+    right = flat['right'].astype(np.int64)
+
+    node = np.broadcast_to(flat['roots'].astype(np.int64), (len(bins), len(flat['roots']))).copy()
+    rows = np.arange(len(bins))[:, None]
+    while True:
+        f = feature[node]
+        active = f != LEAF
+        if not active.any():
+            break
+        left = bins[rows, np.where(active, f, 0)] <= value[node]
+        node = np.where(active, node + np.where(left, 1, right[node]), node)
+    return value[node].sum(axis=1).astype(np.uint32)
+
+def forest_predict(flat, X):
+    """Class 1 where the mean leaf P(fall) is above one half (ties go to class 0, like argmax)"""
+    scores = forest_scores(flat, X).astype(np.int64)
+    return (2 * scores > len(flat['roots']) * LEAF_SCALE).astype(np.int64)
+
+def _c_list(values, per_line=16, fmt=str):
+    items = [fmt(v) for v in np.asarray(values).tolist()]
+    return ",\n".join("    " + ", ".join(items[i:i + per_line]) for i in range(0, len(items), per_line))
+
+def _c_float(v):
+    if np.isneginf(v):
+        return "-INFINITY"
+    return f"{float(v):.9g}f"
+
+def _branch_tree(flat, root, name):
+    """One tree as nested if / else on float thresholds"""
+    feature, value, right, folded = flat['feature'], flat['value'], flat['right'], flat['folded']
+    lines = [f"static inline uint16_t {name}(const float *x) {{"]
+
+    def emit(node, indent):
+        pad = "    " * indent
+        if feature[node] == LEAF:
+            lines.append(f"{pad}return {int(value[node])};")
+            return
+        lines.append(f"{pad}if (x[{int(feature[node])}] <= {_c_float(folded[node])}) {{")
+        emit(node + 1, indent + 1)
+        lines.append(f"{pad}}} else {{")
+        emit(node + int(right[node]), indent + 1)
+        lines.append(f"{pad}}}")
+
+    emit(root, 1)
+    lines.append("}")
+    return "\n".join(lines)
+
+def generate_c(flat, prefix='fall_forest', mode='arrays', source=None):
+    """
+    C header with `<prefix>_score(x)` (uint32 leaf sum) and `<prefix>_predict(x)`
+
+    x is the 18 raw (unscaled) float32 features; the scaler is folded in.
+    'arrays' walks const node tables, 'branches' unrolls every tree into
+    if / else code. Both return the same scores as forest_scores().
+    """
+    n_trees = len(flat['roots'])
+    upper = prefix.upper()
+    out = [
+        f"// Auto-generated by {source or 'forest_compiler.py'}. Do not edit.",
+        "#pragma once",
+        "",
+        "#include <stdint.h>",
+        "#include <math.h>",
+        "",
+        f"#define {upper}_FEATURES {flat['n_features']}",
+        f"#define {upper}_TREES {n_trees}",
+        f"#define {upper}_LEAF_SCALE {LEAF_SCALE}u",
+        "",
+    ]
+
+    if mode == 'branches':
+        for t, root in enumerate(flat['roots']):
+            out.append(_branch_tree(flat, int(root), f"{prefix}_tree_{t}"))
+            out.append("")
+        out.append(f"static inline uint32_t {prefix}_score(const float *x) {{")
+        out.append("    uint32_t score = 0;")
+        out += [f"    score += {prefix}_tree_{t}(x);" for t in range(n_trees)]
+        out.append("    return score;")
+        out.append("}")
+    else:
+        cut_type = "uint16_t" if flat['cut_start'].dtype == np.uint16 else "uint32_t"
+        out += [
+            f"#define {upper}_LEAF {LEAF}",
+            "",
+            f"static const uint8_t {prefix}_feature[] = {{\n{_c_list(flat['feature'])}\n}};",
+            f"static const uint16_t {prefix}_value[] = {{\n{_c_list(flat['value'])}\n}};",
+            f"static const uint16_t {prefix}_right[] = {{\n{_c_list(flat['right'])}\n}};",
+            f"static const uint32_t {prefix}_roots[] = {{\n{_c_list(flat['roots'])}\n}};",
+            f"static const float {prefix}_cuts[] = {{\n{_c_list(flat['cuts'], 8, _c_float)}\n}};",
+            f"static const {cut_type} {prefix}_cut_start[] = {{\n{_c_list(flat['cut_start'])}\n}};",
+            "",
+            f"static inline uint32_t {prefix}_score(const float *x) {{",
+            f"    uint16_t bins[{upper}_FEATURES];",
+            f"    for (int f = 0; f < {upper}_FEATURES; f++) {{",
+            f"        /* Count of cuts < x[f] */",
+            f"        uint32_t lo = {prefix}_cut_start[f], hi = {prefix}_cut_start[f + 1], first = lo;",
+            "        while (lo < hi) {",
+            "            uint32_t mid = (lo + hi) >> 1;",
+            f"            if ({prefix}_cuts[mid] < x[f]) lo = mid + 1; else hi = mid;",
+            "        }",
+            "        bins[f] = (uint16_t)(lo - first);",
+            "    }",
+            "    uint32_t score = 0;",
+            f"    for (int t = 0; t < {upper}_TREES; t++) {{",
+            f"        uint32_t n = {prefix}_roots[t];",
+            f"        while ({prefix}_feature[n] != {upper}_LEAF)",
+            f"            n += bins[{prefix}_feature[n]] <= {prefix}_value[n] ? 1 : {prefix}_right[n];",
+            f"        score += {prefix}_value[n];",
+            "    }",
+            "    return score;",
+            "}",
+        ]
+
+    out += [
+        "",
+        f"/* P(fall) = score / ({upper}_TREES * {upper}_LEAF_SCALE) */",
+        f"static inline int {prefix}_predict(const float *x) {{",
+        f"    return 2u * {prefix}_score(x) > (uint32_t){upper}_TREES * {upper}_LEAF_SCALE;",
+        "}",
+        "",
+    ]
+    return "\n".join(out)
@@ -0,0 +1,154 @@
+# ml-training/fall-detection/utils/label_index.py
+
+import os
+import re
+from collections import namedtuple
+
+import pandas as pd
+
+# Structured trial key; subject is None when a filename does not carry one
+TrialKey = namedtuple('TrialKey', ['subject', 'task', 'trial'])
+
+TASK_COLUMN = 'Task Code (Task ID)'
+TRIAL_COLUMN = 'Trial ID'
+SOURCE_COLUMN = 'Source File'
+
+# S06T20R01 (KFall sensor_data naming: subject, task ID, run)
+_KFALL_NAME = re.compile(r'^SA?(\d+)T(\d+)R(\d+)$', re.IGNORECASE)
+# SA06_F01_T01 / F01_T01 / F01_T1 (task code naming)
+_CODE_NAME = re.compile(r'^(?:SA?(\d+)_)?([A-Z]+)(\d+)_T(\d+)$', re.IGNORECASE)
+# "F01 (20)" -> code letters, code number, task ID
+_TASK_CELL = r'^\s*([A-Za-z]+)\s*(\d+)\s*(?:\(\s*(\d+)\s*\))?'
+
+def parse_kfall_filename(name):
+    """
+    Parse a KFall sensor filename into a structured key
+
+    Returns:
+        (TrialKey, task_id) - task is the task code (e.g. "F01") or None when
+        the name only carries a numeric task ID; (None, None) if unparseable
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+
+    match = _KFALL_NAME.match(stem)
+    if match:
+        subject, task_id, trial = (int(g) for g in match.groups())
+        return TrialKey(subject, None, trial), task_id
+
+    match = _CODE_NAME.match(stem)
+    if match:
+        subject, letters, number, trial = match.groups()
+        subject = int(subject) if subject is not None else None
+        task = f"{letters.upper()}{int(number):02d}"
+        return TrialKey(subject, task, int(trial)), None
+
+    return None, None
+
+class LabelIndex:
+    """O(1) filename -> label resolution built from the KFall label sheets"""
+
+    def __init__(self, labels, code_by_task_id, ambiguous_keys):
+        self.labels = labels
+        self.code_by_task_id = code_by_task_id
+        self.ambiguous_keys = ambiguous_keys
+        self.unmatched = []
+        self.ambiguous = []
+
+    def __len__(self):
+        return len(self.labels)
+
+    def key_for(self, name):
+        """
+        Structured key for a filename, or None if it cannot be parsed
+
+        The task is left as None when the filename's task ID maps to
+        several task codes.
+        """
+        key, task_id = parse_kfall_filename(name)
+        if key is None:
+            return None
+        if key.task is None:
+            if task_id not in self.code_by_task_id:
+                return None
+            key = key._replace(task=self.code_by_task_id[task_id])
+        return key
+
+    def resolve(self, name):
+        """Label for a sensor filename (1 fall, 0 ADL) or None; misses are recorded"""
+        key = self.key_for(name)
+
+        if key is None:
+            self.unmatched.append(name)
+            return None
+
+        if key.task is None or key in self.ambiguous_keys:
+            self.ambiguous.append(name)
+            return None
+
+        label = self.labels.get(key)
+        if label is None:
+            self.unmatched.append(name)
+        return label
+
+    def report(self):
+        """Summary of names that could not be resolved"""
+        return {
+            'index_size': len(self.labels),
+            'ambiguous': sorted(self.ambiguous),
+            'unmatched': sorted(self.unmatched),
+        }
+
+def build_label_index(labels_df):
+    """
+    Build a LabelIndex from concatenated KFall label sheets
+
+    Task codes are only written on the first trial of each task, so they are
+    forward-filled within each source sheet. Rows are keyed by
+    (subject, task code, trial); a (None, task code, trial) key is added for
+    filenames that carry no subject.
+    """
+    df = labels_df.copy()
+
+    if SOURCE_COLUMN not in df.columns:
+        df[SOURCE_COLUMN] = ''
+
+    df['_task'] = df.groupby(SOURCE_COLUMN, sort=False)[TASK_COLUMN].ffill()
+    parts = df['_task'].astype('string').str.extract(_TASK_CELL)
+    df['_code'] = parts[0].str.upper() + parts[1].str.zfill(2)
+    df['_task_id'] = pd.to_numeric(parts[2], errors='coerce')
+    df['_trial'] = pd.to_numeric(df[TRIAL_COLUMN], errors='coerce')
+    df['_subject'] = pd.to_numeric(
+        df[SOURCE_COLUMN].astype('string').str.extract(r'SA?(\d+)', flags=re.IGNORECASE)[0],
+        errors='coerce',
+    )
+
+    df = df.dropna(subset=['_code', '_trial'])
+    df['_label'] = df['_code'].str.startswith('F').astype(int)
+
+    # Numeric task IDs (S06T20R01) resolve through the code written next to them;
+    # an ID that is paired with more than one code cannot be resolved safely
+    id_codes = df.dropna(subset=['_task_id']).groupby('_task_id')['_code'].agg(['first', 'nunique'])
+    code_by_task_id = {
+        int(task_id): (code if n == 1 else None)
+        for task_id, code, n in id_codes.itertuples(name=None)
+    }
+
+    subjects = [None if pd.isna(s) else int(s) for s in df['_subject']]
+    codes = df['_code'].tolist()
+    trials = df['_trial'].astype(int).tolist()
+    labels = df['_label'].tolist()
+
+    index = {}
+    ambiguous_keys = set()
+
+    def add(key, label):
+        previous = index.setdefault(key, label)
+        if previous != label:
+            ambiguous_keys.add(key)
+
+    for subject, code, trial, label in zip(subjects, codes, trials, labels):
+        add(TrialKey(subject, code, trial), label)
+        if subject is not None:
+            add(TrialKey(None, code, trial), label)
+
+    return LabelIndex(index, code_by_task_id, ambiguous_keys)
@@ -1,88 +1,163 @@
 # ml-training/fall-detection/utils/motion_features.py
 
+from functools import lru_cache
+
 import numpy as np
 from scipy.signal import butter, filtfilt
 
-def lowpass_filter(signal, cutoff=5, fs=200, order=4):
-    """4th-order Butterworth low-pass filter"""
+NUM_FEATURES = 18
+
+# Bump whenever the feature definitions change, to invalidate cached features
+FEATURE_SET_VERSION = 2
+
+# Recordings this short are used unfiltered (matches the original extractor)
+MIN_FILTER_LEN = 10
+
+@lru_cache(maxsize=None)
+def butter_lowpass(cutoff=5, fs=200, order=4):
+    """Design Butterworth low-pass coefficients once per (cutoff, fs, order)"""
     nyq = 0.5 * fs
     normal_cutoff = cutoff / nyq
-    b, a = butter(order, normal_cutoff, btype='low', analog=False)
-    return filtfilt(b, a, signal)
+    return butter(order, normal_cutoff, btype='low', analog=False)
+
+def lowpass_filter(signal, cutoff=5, fs=200, order=4, axis=-1):
+    """4th-order Butterworth low-pass filter"""
+    b, a = butter_lowpass(cutoff, fs, order)
+    return filtfilt(b, a, signal, axis=axis)
+
+def _stack_channels(accel, gyro):
+    """Stack one length group as a contiguous (K, 6, T) float64 block"""
+    accel = np.asarray(accel, dtype=np.float64)
+    gyro = np.asarray(gyro, dtype=np.float64)
+    if accel.ndim == 2:
+        accel = accel[np.newaxis]
+        gyro = gyro[np.newaxis]
+    return np.ascontiguousarray(
+        np.concatenate([accel, gyro], axis=2).transpose(0, 2, 1)
+    )
+
+def _features_from_block(block, cutoff, fs, order):
+    """Compute the 18 features for a (K, 6, T) block of equal-length recordings"""
+    length = block.shape[2]
+    b, a = butter_lowpass(cutoff, fs, order)
+    padlen = 3 * max(len(a), len(b))
+
+    out = np.full((block.shape[0], NUM_FEATURES), np.nan)
+
+    # Too short to characterise (no jerk) or to run filtfilt on: leave as NaN
+    if length < 2 or MIN_FILTER_LEN < length <= padlen:
+        return out
+
+    if length > MIN_FILTER_LEN:
+        # One zero-phase pass over all recordings and all six axes
+        block = filtfilt(b, a, block, axis=2)
+
+    return features_from_filtered(block)
+
+def features_from_filtered(block):
+    """The 18 features of an already filtered (K, 6, T) block, T >= 2"""
+    length = block.shape[2]
+    out = np.empty((block.shape[0], NUM_FEATURES))
+
+    accel = block[:, 0:3]
+    gyro = block[:, 3:6]
+
+    # Horizontal magnitude (x, z)
+    accel_horiz = np.sqrt(accel[:, 0]**2 + accel[:, 2]**2)
+    # 3D magnitude
+    accel_3d = np.sqrt(np.sum(accel**2, axis=1))
+    # Gyroscope magnitude
+    gyro_mag = np.sqrt(np.sum(gyro**2, axis=1))
+
+    horiz_max = np.max(accel_horiz, axis=1)
+    horiz_min = np.min(accel_horiz, axis=1)
+    horiz_std = np.std(accel_horiz, axis=1)
+
+    jerk = np.abs(np.diff(accel_3d, axis=1))
+
+    out[:, 0] = np.mean(accel_horiz, axis=1)                 # F1
+    out[:, 1] = horiz_std                                    # F2
+    out[:, 2] = horiz_max                                    # F3
+    out[:, 3] = horiz_min                                    # F4
+    out[:, 4] = horiz_max - horiz_min                        # F5
+    out[:, 5] = np.mean(accel_3d, axis=1)                    # F6
+    out[:, 6] = np.std(accel_3d, axis=1)                     # F7
+    out[:, 7] = np.max(accel_3d, axis=1)                     # F8
+    out[:, 8] = np.min(accel_3d, axis=1)                     # F9
+    out[:, 9] = np.mean(gyro_mag, axis=1)                    # F10
+    out[:, 10] = np.std(gyro_mag, axis=1)                    # F11
+    out[:, 11] = np.max(gyro_mag, axis=1)                    # F12
+    out[:, 12] = np.min(gyro_mag, axis=1)                    # F13
+    out[:, 13] = np.argmax(accel_3d, axis=1) / length        # F14
+    out[:, 14] = np.mean(jerk, axis=1)                       # F15
+    out[:, 15] = np.max(jerk, axis=1)                        # F16
+    out[:, 16] = horiz_std                                   # F17
+    out[:, 17] = np.var(accel_3d, axis=1)                    # F18
+
+    return out
+
+def extract_kfall_features_batch(accel_data, gyro_data, cutoff=5, fs=200,
+                                 order=4, dtype=np.float32):
+    """
+    Extract the 18 motion features for many recordings in one call
+
+    Recordings of equal length are grouped and filtered together, so a
+    stacked input costs a single filtfilt call and a ragged list costs one
+    call per distinct length.
+
+    Args:
+        accel_data: (N, T, 3) array or list of (T_i, 3) arrays
+        gyro_data: (N, T, 3) array or list of (T_i, 3) arrays
+        cutoff, fs, order: low-pass filter parameters
+        dtype: dtype of the returned matrix
+
+    Returns:
+        (N, 18) array; rows that cannot be featurized are NaN
+    """
+    if isinstance(accel_data, np.ndarray) and accel_data.ndim == 3:
+        block = _stack_channels(accel_data, gyro_data)
+        return _features_from_block(block, cutoff, fs, order).astype(dtype)
+
+    if len(accel_data) != len(gyro_data):
+        raise ValueError("accel_data and gyro_data must hold the same number of recordings")
+
+    features = np.full((len(accel_data), NUM_FEATURES), np.nan)
+
+    groups = {}
+    for i, (accel, gyro) in enumerate(zip(accel_data, gyro_data)):
+        if len(accel) != len(gyro):
+            continue
+        groups.setdefault(len(accel), []).append(i)
+
+    for indices in groups.values():
+        block = _stack_channels(
+            np.stack([accel_data[i] for i in indices]),
+            np.stack([gyro_data[i] for i in indices]),
+        )
+        features[indices] = _features_from_block(block, cutoff, fs, order)
+
+    return features.astype(dtype)
 
 def extract_kfall_features(accel_data, gyro_data, label):
     """
     Extract 18 motion features from accelerometer and gyroscope data
-    
+
     Args:
         accel_data: (N, 3) array - [x, y, z] accelerometer
         gyro_data: (N, 3) array - [x, y, z] gyroscope
         label: 1 for fall, 0 for ADL
-    
+
     Returns:
         19-element array (18 features + label)
     """
     try:
-        # Apply low-pass filter
-        accel_filtered = np.zeros_like(accel_data)
-        gyro_filtered = np.zeros_like(gyro_data)
-        
-        for i in range(3):
-            if len(accel_data) > 10:
-                accel_filtered[:, i] = lowpass_filter(accel_data[:, i])
-                gyro_filtered[:, i] = lowpass_filter(gyro_data[:, i])
-            else:
-                accel_filtered[:, i] = accel_data[:, i]
-                gyro_filtered[:, i] = gyro_data[:, i]
-        
-        features = []
-        
-        # Horizontal magnitude (x, z)
-        accel_horiz = np.sqrt(accel_filtered[:, 0]**2 + accel_filtered[:, 2]**2)
-        features.extend([
-            np.mean(accel_horiz),                          # F1
-            np.std(accel_horiz),                           # F2
-            np.max(accel_horiz),                           # F3
-            np.min(accel_horiz),                           # F4
-            np.max(accel_horiz) - np.min(accel_horiz),    # F5
-        ])
-        
-        # 3D magnitude
-        accel_3d = np.sqrt(np.sum(accel_filtered**2, axis=1))
-        features.extend([
-            np.mean(accel_3d),                             # F6
-            np.std(accel_3d),                              # F7
-            np.max(accel_3d),                              # F8
-            np.min(accel_3d),                              # F9
-        ])
-        
-        # Gyroscope magnitude
-        gyro_mag = np.sqrt(np.sum(gyro_filtered**2, axis=1))
-        features.extend([
-            np.mean(gyro_mag),                             # F10
-            np.std(gyro_mag),                              # F11
-            np.max(gyro_mag),                              # F12
-            np.min(gyro_mag),                              # F13
-        ])
-        
-        # Time features
-        peak_idx = np.argmax(accel_3d)
-        features.append(peak_idx / len(accel_3d))         # F14
-        
-        jerk = np.diff(accel_3d)
-        features.extend([
-            np.mean(np.abs(jerk)),                         # F15
-            np.max(np.abs(jerk)),                          # F16
-        ])
-        
-        # Additional statistics
-        features.append(np.std(accel_horiz))               # F17
-        features.append(np.var(accel_3d))                  # F18
-        
-        # Add label
-        features.append(label)
-        
-        return np.array(features)
-    
+        features = extract_kfall_features_batch(
+            [accel_data], [gyro_data], dtype=np.float64
+        )[0]
     except Exception as e:
-        return None
\ No newline at end of file
+        return None
+
+    if np.isnan(features).all():
+        return None
+
+    return np.append(features, label)
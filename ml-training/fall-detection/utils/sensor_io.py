@@ -0,0 +1,150 @@
+# ml-training/fall-detection/utils/sensor_io.py
+
+import csv
+import io
+import os
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Full header plus the names of the three accel and three gyro columns
+SensorSchema = namedtuple('SensorSchema', ['columns', 'accel_cols', 'gyro_cols'])
+
+def schema_from_columns(columns):
+    """Pick accel/gyro columns by name, falling back to the first six columns"""
+    accel_cols = []
+    gyro_cols = []
+
+    for col in columns:
+        col_lower = str(col).lower()
+        if any(p in col_lower for p in ['acc', 'accel']):
+            accel_cols.append(col)
+        elif any(p in col_lower for p in ['gyro', 'gyr']):
+            gyro_cols.append(col)
+
+    # Fallback: first 6 columns
+    if len(accel_cols) == 0 and len(columns) >= 6:
+        accel_cols = list(columns[:3])
+        gyro_cols = list(columns[3:6])
+
+    if len(accel_cols) < 3 or len(gyro_cols) < 3:
+        raise ValueError(f"accel/gyro columns not found in {list(columns)}")
+
+    return SensorSchema(tuple(columns), tuple(accel_cols[:3]), tuple(gyro_cols[:3]))
+
+def detect_sensor_schema(filepath):
+    """Detect the schema from a CSV header line without parsing the data"""
+    with open(filepath, 'rb') as f:
+        header = f.readline()
+    return schema_from_columns(_header_columns(header))
+
+def _header_columns(header):
+    """Column names from a raw CSV header line"""
+    return next(csv.reader([header.decode('utf-8-sig').strip()]), [])
+
+def _parse_numeric(body, schema, dtype):
+    """
+    Parse an all-numeric CSV body in one np.fromstring call
+
+    Returns None when the body is not a dense numeric grid (empty fields,
+    text cells, ragged rows), so the caller can fall back to pandas.
+    """
+    body = body.rstrip()
+
+    n_cols = len(schema.columns)
+    n_rows = body.count(b'\n') + 1 if body else 0
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            values = np.fromstring(body.replace(b'\n', b',').decode('ascii'), dtype=dtype, sep=',')
+        except (DeprecationWarning, UnicodeDecodeError, ValueError):
+            return None
+
+    if values.size != n_rows * n_cols:
+        return None
+
+    indices = [schema.columns.index(c) for c in schema.accel_cols + schema.gyro_cols]
+    return values.reshape(n_rows, n_cols)[:, indices]
+
+def parse_sensor_bytes(data, schema=None, dtype=np.float32, engine='auto'):
+    """
+    Parse the six accel/gyro columns out of raw sensor CSV bytes
+
+    Args:
+        data: file contents (e.g. a member streamed out of a zip archive)
+        schema: SensorSchema (detected from the header if None)
+        dtype: dtype of the returned arrays
+        engine: 'numeric' (np.fromstring), 'c' or 'pyarrow' (pandas);
+            'auto' tries the numeric parser, then pandas (pyarrow when installed)
+
+    Returns:
+        (accel, gyro) C-contiguous (N, 3) arrays
+    """
+    header, _, body = data.partition(b'\n')
+
+    if schema is None:
+        schema = schema_from_columns(_header_columns(header))
+
+    if engine in ('auto', 'numeric'):
+        values = _parse_numeric(body, schema, dtype)
+        if values is not None:
+            return np.ascontiguousarray(values[:, :3]), np.ascontiguousarray(values[:, 3:])
+        if engine == 'numeric':
+            raise ValueError("sensor data is not a dense numeric CSV")
+        engine = 'pyarrow' if HAS_PYARROW else 'c'
+
+    columns = list(schema.accel_cols + schema.gyro_cols)
+    frame = pd.read_csv(
+        io.BytesIO(data),
+        usecols=columns,
+        dtype={col: dtype for col in columns},
+        engine=engine,
+    )
+    values = frame[columns].to_numpy(dtype=dtype)
+
+    return np.ascontiguousarray(values[:, :3]), np.ascontiguousarray(values[:, 3:])
+
+def read_sensor_arrays(filepath, schema=None, dtype=np.float32, engine='auto'):
+    """Read only the six accel/gyro columns of a sensor CSV (see parse_sensor_bytes)"""
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    return parse_sensor_bytes(data, schema, dtype, engine)
+
+class SensorReader:
+    """
+    Sensor CSV reader that detects the schema once per directory
+
+    Each directory's raw header line is kept next to its schema; a file
+    whose first line differs (renamed or reordered columns) gets its own
+    schema instead of being parsed with the cached column positions.
+    """
+
+    def __init__(self, dtype=np.float32, engine='auto'):
+        self.dtype = dtype
+        self.engine = engine
+        self.schemas = {}   # directory -> (raw header line, SensorSchema)
+
+    def read(self, filepath):
+        """(accel, gyro) arrays for one file"""
+        with open(filepath, 'rb') as f:
+            data = f.read()
+        header = data.partition(b'\n')[0].rstrip(b'\r')
+
+        directory = os.path.dirname(filepath)
+        cached = self.schemas.get(directory)
+        if cached is None:
+            cached = self.schemas[directory] = (header, schema_from_columns(_header_columns(header)))
+
+        cached_header, schema = cached
+        if header != cached_header:
+            schema = schema_from_columns(_header_columns(header))
+        return parse_sensor_bytes(data, schema, self.dtype, self.engine)
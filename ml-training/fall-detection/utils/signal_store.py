@@ -0,0 +1,114 @@
+# ml-training/fall-detection/utils/signal_store.py
+
+import os
+import json
+
+import numpy as np
+
+SIGNALS_FILE = 'signals.f32'
+INDEX_FILE = 'index.npz'
+META_FILE = 'store.json'
+
+# Channel layout of each row in the signal blob
+CHANNELS = ['accX', 'accY', 'accZ', 'gyroX', 'gyroY', 'gyroZ']
+
+class SignalStoreWriter:
+    """
+    Append recordings to a packed signal store
+
+    Writes a single float32 blob of (total_samples, 6) rows plus an index
+    of per-recording offsets, lengths and metadata.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        self._blob = open(os.path.join(store_dir, SIGNALS_FILE + '.tmp'), 'wb')
+        self._offset = 0
+        self._index = {k: [] for k in ['name', 'offset', 'length', 'subject',
+                                      'task', 'task_id', 'trial', 'label']}
+
+    def append(self, name, accel, gyro, subject=-1, task='', task_id=-1, trial=-1, label=-1):
+        """Append one recording; unknown metadata is stored as -1 / ''"""
+        block = np.empty((len(accel), len(CHANNELS)), dtype=np.float32)
+        block[:, :3] = accel
+        block[:, 3:] = gyro
+        self._blob.write(block.tobytes())
+
+        for key, value in [('name', name), ('offset', self._offset), ('length', len(block)),
+                           ('subject', subject), ('task', task), ('task_id', task_id),
+                           ('trial', trial), ('label', label)]:
+            self._index[key].append(value)
+
+        self._offset += len(block)
+
+    def __len__(self):
+        return len(self._index['name'])
+
+    def close(self):
+        """Flush the blob and write the index"""
+        self._blob.close()
+        os.replace(self._blob.name, os.path.join(self.store_dir, SIGNALS_FILE))
+
+        int_columns = ['offset', 'length', 'subject', 'task_id', 'trial', 'label']
+        np.savez(
+            os.path.join(self.store_dir, INDEX_FILE),
+            name=np.array(self._index['name'], dtype=str),
+            task=np.array(self._index['task'], dtype=str),
+            **{k: np.array(self._index[k], dtype=np.int64) for k in int_columns},
+        )
+
+        with open(os.path.join(self.store_dir, META_FILE), 'w') as f:
+            json.dump({'dtype': 'float32', 'channels': CHANNELS,
+                       'recordings': len(self), 'samples': self._offset}, f, indent=4)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._blob.close()
+            os.remove(self._blob.name)
+
+class SignalStore:
+    """
+    Read-only view of a packed signal store
+
+    store[i] is a zero-copy (length, 6) float32 slice of the memory-mapped
+    blob; the index columns (name, subject, task, trial, label, ...) are
+    plain NumPy arrays.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+
+        with np.load(os.path.join(store_dir, INDEX_FILE), allow_pickle=False) as index:
+            self.index = {k: index[k] for k in index.files}
+
+        path = os.path.join(store_dir, SIGNALS_FILE)
+        if os.path.getsize(path) > 0:
+            self.signals = np.memmap(path, dtype=np.float32, mode='r').reshape(-1, len(CHANNELS))
+        else:
+            self.signals = np.empty((0, len(CHANNELS)), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.index['name'])
+
+    def __getitem__(self, i):
+        offset = self.index['offset'][i]
+        return self.signals[offset:offset + self.index['length'][i]]
+
+    def accel(self, i):
+        return self[i][:, :3]
+
+    def gyro(self, i):
+        return self[i][:, 3:]
+
+    def find(self, **criteria):
+        """Indices of recordings whose index columns equal all given values"""
+        mask = np.ones(len(self), dtype=bool)
+        for key, value in criteria.items():
+            mask &= self.index[key] == value
+        return np.flatnonzero(mask)
@@ -0,0 +1,256 @@
+# ml-training/fall-detection/utils/streaming.py
+
+from collections import deque
+
+import numpy as np
+from scipy.signal import group_delay, lfilter, lfilter_zi
+
+from .forest_compiler import LEAF_SCALE, flatten_forest, forest_scores
+from .motion_features import NUM_FEATURES, butter_lowpass
+
+class SlidingStats:
+    """
+    Mean, variance, min, max and first argmax of the last `size` values
+
+    Every push is O(1) amortized: shifted running sums for the moments and
+    monotonic deques of (index, value) for the extremes. The sums are
+    rebuilt from the ring buffer once per window, so float error can't
+    accumulate over a long stream.
+    """
+
+    __slots__ = ('size', 'count', '_ring', '_sum', '_sumsq', '_shift', '_max', '_min')
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError("size must be positive")
+        self.size = size
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self._ring = [0.0] * self.size
+        self._sum = self._sumsq = self._shift = 0.0
+        self._max = deque()
+        self._min = deque()
+
+    @property
+    def full(self):
+        return self.count >= self.size
+
+    def push(self, x):
+        i = self.count
+        slot = i % self.size
+        if i >= self.size:
+            old = self._ring[slot] - self._shift
+            self._sum -= old
+            self._sumsq -= old * old
+        self._ring[slot] = x
+        self.count = i + 1
+
+        if slot == self.size - 1:
+            # Re-anchor the sums on the window mean (also the first fill)
+            ring = np.array(self._ring)
+            self._shift = float(ring.mean())
+            d = ring - self._shift
+            self._sum = float(d.sum())
+            self._sumsq = float(d @ d)
+        else:
+            d = x - self._shift
+            self._sum += d
+            self._sumsq += d * d
+
+        # Ties keep the older index in front, like np.argmax
+        mx, mn = self._max, self._min
+        while mx and mx[-1][1] < x:
+            mx.pop()
+        mx.append((i, x))
+        while mn and mn[-1][1] > x:
+            mn.pop()
+        mn.append((i, x))
+        first = i + 1 - self.size
+        if mx[0][0] < first:
+            mx.popleft()
+        if mn[0][0] < first:
+            mn.popleft()
+
+    @property
+    def n(self):
+        return min(self.count, self.size)
+
+    @property
+    def mean(self):
+        return self._shift + self._sum / self.n
+
+    @property
+    def var(self):
+        n = self.n
+        m = self._sum / n
+        return max(self._sumsq / n - m * m, 0.0)
+
+    @property
+    def std(self):
+        return self.var ** 0.5
+
+    @property
+    def max(self):
+        return self._max[0][1]
+
+    @property
+    def min(self):
+        return self._min[0][1]
+
+    @property
+    def argmax(self):
+        """Position of the (first) maximum within the current window"""
+        return self._max[0][0] - (self.count - self.n)
+
+class StreamingFallDetector:
+    """
+    Fall scoring over a live IMU stream, one chunk of samples at a time
+
+    Samples go through a causal Butterworth low-pass (lfilter with carried
+    state) and update sliding statistics of the horizontal, 3D and gyro
+    magnitudes and the jerk, so a window's 18 features cost O(1) per
+    sample instead of re-featurizing every overlapping window. Once the
+    window is full, the model scores the features every `hop` samples.
+
+    The features follow extract_kfall_features_batch, except that the
+    filter is causal instead of zero-phase: a window lags the raw samples
+    by `delay` and its values differ slightly from the batch extractor
+    (bench_streaming.py checks the tolerance).
+    """
+
+    def __init__(self, model=None, scaler=None, window=400, hop=50, cutoff=5, fs=200, order=4,
+                 threshold=0.5, compile_forest=True):
+        if window < 3:
+            raise ValueError("window must hold at least 3 samples")
+        if hop < 1:
+            raise ValueError("hop must be positive")
+        self.window = window
+        self.hop = hop
+        self.threshold = threshold
+        self.model = model
+        self.scaler = scaler
+        self._b, self._a = butter_lowpass(cutoff, fs, order)
+        self._zi_unit = lfilter_zi(self._b, self._a)
+        # Passband lag of the causal filter, in samples: a window ending at sample i
+        # mostly describes the motion up to i - delay
+        self.delay = int(round(group_delay((self._b, self._a), w=[0.0], fs=fs)[1][0]))
+
+        # A RandomForest is scored through its flattened node arrays (scaler folded in):
+        # same decisions as model.predict, without sklearn's per-call overhead
+        self._flat = None
+        if compile_forest and model is not None and hasattr(model, 'estimators_'):
+            self._flat = flatten_forest(model, scaler)
+
+        self.horiz = SlidingStats(window)
+        self.accel_3d = SlidingStats(window)
+        self.gyro = SlidingStats(window)
+        self.jerk = SlidingStats(window - 1)
+        self.reset()
+
+    def reset(self):
+        """Forget the stream (filter state, windows, hop phase)"""
+        self._zi = None
+        self._prev_3d = None
+        self._since_score = 0
+        self.samples_seen = 0
+        for stats in (self.horiz, self.accel_3d, self.gyro, self.jerk):
+            stats.reset()
+
+    @property
+    def ready(self):
+        return self.accel_3d.full
+
+    def _filter(self, block):
+        """(6, n) raw chunk -> filtered chunk, carrying the filter state"""
+        if self._zi is None:
+            # Start in steady state on the first sample, not from zero
+            self._zi = self._zi_unit[None, :] * block[:, :1]
+        out, self._zi = lfilter(self._b, self._a, block, axis=1, zi=self._zi)
+        return out
+
+    def features(self):
+        """The 18 features of the current window (NaN until it is full)"""
+        out = np.full(NUM_FEATURES, np.nan)
+        if not self.ready:
+            return out
+        h, a, g, j = self.horiz, self.accel_3d, self.gyro, self.jerk
+        out[0] = h.mean                       # F1
+        out[1] = h.std                        # F2
+        out[2] = h.max                        # F3
+        out[3] = h.min                        # F4
+        out[4] = h.max - h.min                # F5
+        out[5] = a.mean                       # F6
+        out[6] = a.std                        # F7
+        out[7] = a.max                        # F8
+        out[8] = a.min                        # F9
+        out[9] = g.mean                       # F10
+        out[10] = g.std                       # F11
+        out[11] = g.max                       # F12
+        out[12] = g.min                       # F13
+        out[13] = a.argmax / self.window      # F14
+        out[14] = j.mean                      # F15
+        out[15] = j.max                       # F16
+        out[16] = out[1]                      # F17
+        out[17] = a.var                       # F18
+        return out
+
+    def score(self, features):
+        """P(fall) of one feature row"""
+        row = np.asarray(features, dtype=np.float32)[None]
+        if self._flat is not None:
+            return float(forest_scores(self._flat, row)[0]) / (len(self._flat['roots']) * LEAF_SCALE)
+        if self.scaler is not None:
+            row = self.scaler.transform(row.astype(np.float64))
+        return float(self.model.predict_proba(row)[0, 1])
+
+    def process(self, accel, gyro):
+        """
+        Feed a chunk of raw samples
+
+        Args:
+            accel: (n, 3) accelerometer samples
+            gyro: (n, 3) gyroscope samples
+
+        Returns:
+            list of (sample_index, p_fall, features), one per hop completed
+            in this chunk; p_fall is None without a model
+        """
+        accel = np.asarray(accel, dtype=np.float64).reshape(-1, 3)
+        gyro = np.asarray(gyro, dtype=np.float64).reshape(-1, 3)
+        if len(accel) != len(gyro):
+            raise ValueError("accel and gyro chunks must have the same length")
+        if not len(accel):
+            return []
+
+        filtered = self._filter(np.concatenate([accel, gyro], axis=1).T)
+        fa, fg = filtered[0:3], filtered[3:6]
+        horiz = np.sqrt(fa[0]**2 + fa[2]**2).tolist()
+        accel_3d = np.sqrt(np.sum(fa**2, axis=0)).tolist()
+        gyro_mag = np.sqrt(np.sum(fg**2, axis=0)).tolist()
+
+        events = []
+        prev = self._prev_3d
+        for h, a, g in zip(horiz, accel_3d, gyro_mag):
+            self.horiz.push(h)
+            self.accel_3d.push(a)
+            self.gyro.push(g)
+            if prev is not None:
+                self.jerk.push(abs(a - prev))
+            prev = a
+            self.samples_seen += 1
+
+            if self.accel_3d.full:
+                self._since_score += 1
+                if self._since_score >= self.hop or self.accel_3d.count == self.window:
+                    self._since_score = 0
+                    features = self.features()
+                    p_fall = self.score(features) if self.model is not None else None
+                    events.append((self.samples_seen - 1, p_fall, features))
+        self._prev_3d = prev
+        return events
+
+    def alarms(self, events):
+        """The events whose P(fall) is over the threshold"""
+        return [e for e in events if e[1] is not None and e[1] > self.threshold]
@@ -0,0 +1,63 @@
+import numpy as np
+import tensorflow as tf
+from shards import list_shards, read_shard, shard_length
+from windowing import window_starts
+
+def index_shards(shard_root, categories=("Falls", "ADLs")):
+    """(paths, labels, sample counts) of every shard, lengths read from headers only"""
+    paths, labels = [], []
+    for category in categories:
+        for path in list_shards(shard_root, category):
+            paths.append(path)
+            labels.append(1 if category == "Falls" else 0)
+    lengths = np.array([shard_length(p) for p in paths], dtype=np.int64)
+    return np.array(paths), np.array(labels), lengths
+
+def split_recordings(paths, labels, lengths, test_size=0.2, seed=42):
+    """Per-class random split of whole recordings, so no recording feeds both sides"""
+    rng = np.random.default_rng(seed)
+    test = np.zeros(len(paths), dtype=bool)
+    for label in np.unique(labels):
+        idx = rng.permutation(np.flatnonzero(labels == label))
+        test[idx[:int(round(len(idx) * test_size))]] = True
+    return ((paths[~test], labels[~test], lengths[~test]),
+            (paths[test], labels[test], lengths[test]))
+
+def count_windows(lengths, time_steps, step):
+    return np.array([len(window_starts(n, time_steps, step)) for n in lengths], dtype=np.int64)
+
+def _load_signals(path):
+    _, signals, _ = read_shard(path.decode() if isinstance(path, bytes) else path)
+    return signals.astype(np.float32, copy=False)
+
+def make_window_dataset(paths, labels, time_steps, step, batch_size,
+                        training=True, shuffle_buffer=10000, cache_file=None,
+                        cycle_length=8, seed=42):
+    """
+    Stream fixed-size windows from per-recording shards
+
+    Recordings are loaded in parallel and framed with tf.signal.frame, so
+    only cycle_length recordings plus the shuffle buffer are held in
+    memory. With cache_file, framed windows are written to disk on the
+    first epoch and replayed from there afterwards.
+    """
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels.astype(np.float32)))
+    if training:
+        ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+
+    def recording_windows(path, label):
+        signals = tf.numpy_function(_load_signals, [path], tf.float32)
+        signals = tf.ensure_shape(signals, [None, 6])
+        windows = tf.signal.frame(signals, time_steps, step, axis=0)
+        window_labels = tf.fill([tf.shape(windows)[0], 1], label)
+        return tf.data.Dataset.from_tensor_slices((windows, window_labels))
+
+    ds = ds.interleave(recording_windows, cycle_length=cycle_length,
+                       num_parallel_calls=tf.data.AUTOTUNE, deterministic=not training)
+
+    if cache_file:
+        ds = ds.cache(cache_file)
+    if training:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
@@ -1,13 +1,19 @@
 import os
 import pandas as pd
+import numpy as np
 import glob
 import math
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import load_workbook
+from shards import CHANNELS, shard_path, is_up_to_date, write_shard, iter_shards, list_shards
 
 # ================= CONFIGURATION =================
 # If your folders are inside "IMU-Dataset", change this to "./IMU-Dataset"
 # Based on your error log, it looks like they are inside "IMU-Dataset"
-DATASET_ROOT = "./IMU-Dataset" 
+DATASET_ROOT = "./IMU-Dataset"
 OUTPUT_FOLDER = "processed_data"
+SHARD_FOLDER = os.path.join(OUTPUT_FOLDER, "shards")
 
 # EXACT COLUMN NAMES
 COLUMN_MAPPING = {
@@ -20,15 +26,50 @@ COLUMN_MAPPING = {
 }
 # =================================================
 
-def process_category(category_folder, label_value):
-    all_data = []
-    
+def read_workbook(file_path):
+    # Stream the first sheet row by row (read-only mode never builds the full cell tree)
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+
+        source_names = {name: col for col, name in COLUMN_MAPPING.items()}
+        positions = [header.index(source_names[ch]) if source_names[ch] in header else None
+                     for ch in CHANNELS]
+        if None in positions:
+            return None
+
+        data = [[row[p] for p in positions] for row in rows if row and row[positions[0]] is not None]
+    finally:
+        wb.close()
+
+    signals = np.array(data, dtype=np.float32).reshape(-1, len(CHANNELS))
+
+    # Unit Conversion (Rad/s -> Deg/s)
+    signals[:, 3:] *= 57.2958
+    return signals
+
+def convert_workbook(job):
+    file_path, shard, label_value, recording_id = job
+    try:
+        signals = read_workbook(file_path)
+        if signals is None:
+            return recording_id, "skipped", "missing sensor columns"
+        write_shard(shard, signals, label_value, recording_id)
+        return recording_id, "converted", len(signals)
+    except Exception as e:
+        return recording_id, "error", str(e)
+
+def process_category(category_folder, label_value, workers=1, force=False):
     # Search path
     search_path = os.path.join(DATASET_ROOT, "sub*", category_folder, "*.xlsx")
-    files = glob.glob(search_path)
-    
+    files = sorted(glob.glob(search_path))
+
     print(f"Found {len(files)} files for {category_folder}...")
 
+    jobs = []
+    expected = set()
+    up_to_date = 0
     for file_path in files:
         # --- FIX: SKIP TEMPORARY FILES ---
         filename = os.path.basename(file_path)
@@ -36,54 +77,80 @@ def process_category(category_folder, label_value):
             continue # Skip this ghost file
         # ---------------------------------
 
-        try:
-            # Read Excel file
-            df = pd.read_excel(file_path, engine='openpyxl')
-            
-            # Check columns
-            available_cols = [c for c in COLUMN_MAPPING.keys() if c in df.columns]
-            
-            if len(available_cols) < 6:
-                # Silent skip for cleaner logs
-                continue
-
-            # Extract and Rename
-            df = df[available_cols]
-            df = df.rename(columns=COLUMN_MAPPING)
-            
-            # Unit Conversion (Rad/s -> Deg/s)
-            df['gyroX'] = df['gyroX'] * 57.2958
-            df['gyroY'] = df['gyroY'] * 57.2958
-            df['gyroZ'] = df['gyroZ'] * 57.2958
-            
-            # Add Label
-            df['label'] = label_value
-            
-            all_data.append(df)
-            
+        recording_id = os.path.splitext(os.path.relpath(file_path, DATASET_ROOT))[0]
+        shard = shard_path(SHARD_FOLDER, category_folder, recording_id)
+        expected.add(shard)
+
+        # Re-runs only convert new or modified workbooks
+        if not force and is_up_to_date(shard, file_path):
+            up_to_date += 1
+            continue
+
+        jobs.append((file_path, shard, label_value, recording_id))
+
+    # Drop shards whose workbook was deleted
+    for stale in set(list_shards(SHARD_FOLDER, category_folder)) - expected:
+        os.remove(stale)
+
+    print(f"{up_to_date} up to date, converting {len(jobs)} with {workers} worker(s)...")
+
+    counts = {"converted": 0, "skipped": 0, "error": 0}
+
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(convert_workbook, jobs, chunksize=4)
+    else:
+        executor = None
+        results = map(convert_workbook, jobs)
+
+    try:
+        for recording_id, status, detail in results:
+            counts[status] += 1
+            if status == "error":
+                print(f"Error reading {recording_id}: {detail}")
+
             # Print progress every 50 files so you know it's working
-            if len(all_data) % 50 == 0:
-                print(f"Processed {len(all_data)} files...")
-            
-        except Exception as e:
-            print(f"Error reading {filename}: {e}")
+            if status == "converted" and counts["converted"] % 50 == 0:
+                print(f"Processed {counts['converted']} files...")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    print(f"Converted {counts['converted']} | skipped {counts['skipped']} | errors {counts['error']}")
+    return up_to_date + counts["converted"]
 
-    if all_data:
-        return pd.concat(all_data, ignore_index=True)
-    return pd.DataFrame()
+def export_csv(category_folder, csv_name):
+    # Legacy single-CSV export, appended one recording at a time
+    csv_path = os.path.join(OUTPUT_FOLDER, csv_name)
+    rows = 0
+    with open(csv_path, "w", newline="") as f:
+        for i, (recording_id, signals, label) in enumerate(iter_shards(SHARD_FOLDER, category_folder)):
+            df = pd.DataFrame(signals, columns=CHANNELS)
+            df['label'] = label
+            df['recording'] = recording_id
+            df.to_csv(f, index=False, header=(i == 0))
+            rows += len(df)
+    print(f"SUCCESS: Saved {rows} rows to {csv_name}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert IMU-Dataset workbooks to per-recording shards")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--force", action="store_true", help="re-convert every workbook")
+    parser.add_argument("--csv", action="store_true",
+                        help="also write training_falls.csv / training_adls.csv")
+    args = parser.parse_args()
+
     if not os.path.exists(OUTPUT_FOLDER):
         os.makedirs(OUTPUT_FOLDER)
 
     print("--- PROCESSING FALLS (Label 1) ---")
-    df_falls = process_category("Falls", 1)
-    if not df_falls.empty:
-        df_falls.to_csv(os.path.join(OUTPUT_FOLDER, "training_falls.csv"), index=False)
-        print(f"SUCCESS: Saved {len(df_falls)} rows to training_falls.csv")
+    n_falls = process_category("Falls", 1, args.workers, args.force)
+    if n_falls and args.csv:
+        export_csv("Falls", "training_falls.csv")
 
     print("\n--- PROCESSING ADLs (Label 0) ---")
-    df_adls = process_category("ADLs", 0)
-    if not df_adls.empty:
-        df_adls.to_csv(os.path.join(OUTPUT_FOLDER, "training_adls.csv"), index=False)
-        print(f"SUCCESS: Saved {len(df_adls)} rows to training_adls.csv")
\ No newline at end of file
+    n_adls = process_category("ADLs", 0, args.workers, args.force)
+    if n_adls and args.csv:
+        export_csv("ADLs", "training_adls.csv")
+
+    print(f"\nShards ready in {SHARD_FOLDER}")
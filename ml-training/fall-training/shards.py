@@ -0,0 +1,47 @@
+import os
+import glob
+import zipfile
+import numpy as np
+
+# Channel order of every shard's signal array
+CHANNELS = ['accX', 'accY', 'accZ', 'gyroX', 'gyroY', 'gyroZ']
+
+def shard_path(shard_root, category, recording_id):
+    """Where the shard for one recording lives"""
+    return os.path.join(shard_root, category, recording_id.replace(os.sep, '__') + '.npz')
+
+def is_up_to_date(shard, source):
+    """True if the shard exists and is newer than its source workbook"""
+    return os.path.exists(shard) and os.path.getmtime(shard) >= os.path.getmtime(source)
+
+def write_shard(path, signals, label, recording_id):
+    """Atomically write one recording as a shard"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, signals=np.asarray(signals, dtype=np.float32),
+             label=np.int64(label), recording=np.array(recording_id))
+    os.replace(tmp_path, path)
+
+def list_shards(shard_root, category):
+    """Sorted shard paths of one category (Falls / ADLs)"""
+    return sorted(glob.glob(os.path.join(shard_root, category, '*.npz')))
+
+def read_shard(path):
+    """(recording_id, (length, 6) float32 signals, label)"""
+    with np.load(path, allow_pickle=False) as shard:
+        return str(shard['recording']), shard['signals'], int(shard['label'])
+
+def iter_shards(shard_root, category):
+    """Yield one recording at a time, so memory stays bounded by one shard"""
+    for path in list_shards(shard_root, category):
+        yield read_shard(path)
+
+def shard_length(path):
+    """Number of samples in a shard, read from the .npy header without loading the signals"""
+    with zipfile.ZipFile(path) as zf, zf.open('signals.npy') as f:
+        major, _ = np.lib.format.read_magic(f)
+        if major == 1:
+            shape, _, _ = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, _, _ = np.lib.format.read_array_header_2_0(f)
+    return shape[0]
@@ -4,62 +4,161 @@ import tensorflow as tf
 from tensorflow.keras import layers, models
 from sklearn.model_selection import train_test_split
 import os
+import sys
+from windowing import create_windows, window_view
+from shards import list_shards, iter_shards, read_shard
+from fall_dataset import index_shards, split_recordings, count_windows, make_window_dataset
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from c_header import write_c_header
+from tflite_budget import enforce_budget
+from tflite_bench import benchmark_model, save_report
+from calibration import calibration_set, balanced_indices, representative_dataset, quantization_report, \
+    print_quantization_report
 
 # ================= CONFIGURATION =================
 TIME_STEPS = 200    # 2 seconds @ 100Hz
 STEP_OVERLAP = 100  # 50% overlap
 EPOCHS = 25
 BATCH_SIZE = 64
+DATA_FOLDER = "processed_data"
+SHARD_FOLDER = os.path.join(DATA_FOLDER, "shards")
+FEATURE_COLUMNS = ['accX', 'accY', 'accZ', 'gyroX', 'gyroY', 'gyroZ']
+STREAMING = True        # Stream windows from shards with tf.data (uses every ADL recording)
+SHUFFLE_BUFFER = 10000  # Windows held in the tf.data shuffle buffer
+WINDOW_CACHE = None     # e.g. "processed_data/windows.cache" to reuse framed windows across epochs
+TARGET_CHIP = "esp32"
+ARENA_BUDGET = 30 * 1024  # TENSOR_ARENA_SIZE in esp32_firmware/src/main_fall.txt
+LATENCY_BUDGET_MS = 100   # The firmware runs the AI check every ~100 ms
+EXPORT_INT8 = True        # Also emit fall_model_int8.h (int8 I/O, builtin int8 ops only)
+CALIBRATION_SAMPLES = 300 # Class-balanced training windows for the int8 ranges
+HOLDOUT_SAMPLES = 1000    # Test windows for the float vs int8 comparison
 # =================================================
 
-def create_windows(data, time_steps, step):
-    xs, ys = [], []
-    for i in range(0, len(data) - time_steps, step):
-        v = data.iloc[i:(i + time_steps)].values
-        features = v[:, :6] 
-        # Label is the 7th column (index 6)
-        label = float(max(set(v[:, 6]), key=list(v[:, 6]).count))
-        xs.append(features)
-        ys.append(label)
-    return np.array(xs), np.array(ys).reshape(-1, 1)
-
-def save_c_header(tflite_model_content, variable_name="fall_model"):
-    # Convert the binary content to a hex string array
-    hex_array = [f"0x{b:02x}" for b in tflite_model_content]
-    
-    # Format as C code
-    c_str = f"// Auto-generated by train_local.py\n"
-    c_str += f"const unsigned char {variable_name}[] = {{\n  "
-    c_str += ", ".join(hex_array)
-    c_str += f"\n}};\n\nconst int {variable_name}_len = {len(tflite_model_content)};"
-    
-    # Save to file
-    with open(f"{variable_name}.h", "w") as f:
-        f.write(c_str)
-    print(f"\n[SUCCESS] Generated C-Header file: {variable_name}.h")
-
-# --- 1. LOAD DATA ---
-print("--- 1. LOADING DATA ---")
-df_falls = pd.read_csv("processed_data/training_falls.csv")
-df_adls = pd.read_csv("processed_data/training_adls.csv")
-
-# Balance data (Optional: Limit ADLs to 3x Falls to prevent bias)
-if len(df_adls) > len(df_falls) * 3:
-    print(f"Trimming ADLs to {len(df_falls)*3} rows for balance...")
-    df_adls = df_adls.sample(n=len(df_falls) * 3, random_state=42)
-
-print(f"Falls: {len(df_falls)} | ADLs: {len(df_adls)}")
-
-# --- 2. PREPARE WINDOWS ---
-print("--- 2. CREATING WINDOWS ---")
-X_falls, y_falls = create_windows(df_falls, TIME_STEPS, STEP_OVERLAP)
-X_adls, y_adls = create_windows(df_adls, TIME_STEPS, STEP_OVERLAP)
-
-X = np.concatenate([X_falls, X_adls])
-y = np.concatenate([y_falls, y_adls])
-
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-print(f"Training on {X_train.shape[0]} windows...")
+def load_recordings(category, csv_name):
+    # Per-recording (signals, labels) from process_dataset.py shards, else the legacy CSV
+    if list_shards(SHARD_FOLDER, category):
+        return [(signals, np.full(len(signals), label))
+                for _, signals, label in iter_shards(SHARD_FOLDER, category)]
+
+    df = pd.read_csv(os.path.join(DATA_FOLDER, csv_name))
+    if 'recording' not in df.columns:
+        return [(df[FEATURE_COLUMNS].values, df['label'].values)]
+    return [(g[FEATURE_COLUMNS].values, g['label'].values)
+            for _, g in df.groupby('recording', sort=False)]
+
+def trim_recordings(recordings, max_rows, seed=42):
+    # Keep whole recordings (random order) up to max_rows, so windows stay contiguous
+    if len(recordings) == 1:
+        signals, labels = recordings[0]
+        return [(signals[:max_rows], labels[:max_rows])]
+    order = np.random.default_rng(seed).permutation(len(recordings))
+    kept, total = [], 0
+    for i in order:
+        # Skip recordings that no longer fit instead of stopping at the first one
+        if total + len(recordings[i][0]) <= max_rows:
+            kept.append(recordings[i])
+            total += len(recordings[i][0])
+    if not kept:
+        # Every recording is longer than max_rows: cut the first, as with a single recording
+        signals, labels = recordings[order[0]]
+        kept = [(signals[:max_rows], labels[:max_rows])]
+    return kept
+
+def recording_windows(recordings, time_steps, step):
+    # Windows never span two recordings
+    windows = [create_windows(signals, labels, time_steps, step) for signals, labels in recordings]
+    X = np.concatenate([w[0] for w in windows])
+    y = np.concatenate([w[1] for w in windows])
+    return X, y
+
+def save_c_header(tflite_model_content, variable_name="fall_model", constants=None):
+    # One vectorized, buffered write; skipped when the model bytes are unchanged
+    path = f"{variable_name}.h"
+    if write_c_header(tflite_model_content, path, variable_name, source="train_fall.py", constants=constants):
+        print(f"\n[SUCCESS] Generated C-Header file: {path}")
+    else:
+        print(f"\n[SUCCESS] {path} is already up to date")
+
+def shard_calibration_windows(paths, labels, lengths, n, seed=42):
+    # Class-balanced windows picked by index over all the recordings; only the shards picked from are read
+    counts = count_windows(lengths, TIME_STEPS, STEP_OVERLAP)
+    picks = balanced_indices(np.repeat(labels, counts), n, seed)
+    recording = np.repeat(np.arange(len(paths)), counts)[picks]
+    first_window = (np.cumsum(counts) - counts)[recording]
+
+    X = np.empty((len(picks), TIME_STEPS, len(FEATURE_COLUMNS)), dtype=np.float32)
+    for r in np.unique(recording):
+        mine = recording == r
+        windows = window_view(read_shard(paths[r])[1], TIME_STEPS, STEP_OVERLAP)
+        X[mine] = windows[picks[mine] - first_window[mine]]
+    return X, np.asarray(labels)[recording]
+
+def streaming_datasets():
+    # Windows are framed on the fly from shards, so no ADL trimming is needed;
+    # the imbalance is handled with class weights instead
+    paths, labels, lengths = index_shards(SHARD_FOLDER)
+    (train_paths, train_labels, train_lengths), (test_paths, test_labels, test_lengths) = \
+        split_recordings(paths, labels, lengths, test_size=0.2, seed=42)
+
+    windows = count_windows(train_lengths, TIME_STEPS, STEP_OVERLAP)
+    n_fall = int(windows[train_labels == 1].sum())
+    n_adl = int(windows[train_labels == 0].sum())
+    print(f"Falls: {n_fall} windows | ADLs: {n_adl} windows "
+          f"({len(train_paths)} train / {len(test_paths)} test recordings)")
+
+    total = n_fall + n_adl
+    class_weight = {0: total / (2 * max(n_adl, 1)), 1: total / (2 * max(n_fall, 1))}
+
+    train_ds = make_window_dataset(train_paths, train_labels, TIME_STEPS, STEP_OVERLAP, BATCH_SIZE,
+                                   training=True, shuffle_buffer=SHUFFLE_BUFFER,
+                                   cache_file=WINDOW_CACHE)
+    test_ds = make_window_dataset(test_paths, test_labels, TIME_STEPS, STEP_OVERLAP, BATCH_SIZE,
+                                  training=False)
+    X_cal, _ = shard_calibration_windows(train_paths, train_labels, train_lengths, CALIBRATION_SAMPLES)
+    # Picked over every test recording: test_ds yields all Falls windows before any ADL
+    holdout = shard_calibration_windows(test_paths, test_labels, test_lengths, HOLDOUT_SAMPLES)
+    return train_ds, test_ds, class_weight, X_cal, holdout
+
+def in_memory_datasets():
+    # --- 1. LOAD DATA ---
+    print("--- 1. LOADING DATA ---")
+    rec_falls = load_recordings("Falls", "training_falls.csv")
+    rec_adls = load_recordings("ADLs", "training_adls.csv")
+    n_falls = sum(len(s) for s, _ in rec_falls)
+    n_adls = sum(len(s) for s, _ in rec_adls)
+
+    # Balance data (Optional: Limit ADLs to 3x Falls to prevent bias)
+    if n_adls > n_falls * 3:
+        print(f"Trimming ADLs to {n_falls*3} rows for balance...")
+        rec_adls = trim_recordings(rec_adls, n_falls * 3)
+        n_adls = sum(len(s) for s, _ in rec_adls)
+
+    print(f"Falls: {n_falls} | ADLs: {n_adls}")
+
+    # --- 2. PREPARE WINDOWS ---
+    print("--- 2. CREATING WINDOWS ---")
+    X_falls, y_falls = recording_windows(rec_falls, TIME_STEPS, STEP_OVERLAP)
+    X_adls, y_adls = recording_windows(rec_adls, TIME_STEPS, STEP_OVERLAP)
+
+    X = np.concatenate([X_falls, X_adls])
+    y = np.concatenate([y_falls, y_adls])
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    print(f"Training on {X_train.shape[0]} windows...")
+
+    train_ds = tf.data.Dataset.from_tensor_slices((X_train, y_train)) \
+        .shuffle(len(X_train), seed=42).batch(BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
+    test_ds = tf.data.Dataset.from_tensor_slices((X_test, y_test)).batch(BATCH_SIZE)
+    X_cal, _, _ = calibration_set(X_train, y_train, n=CALIBRATION_SAMPLES, seed=42)
+    picks = balanced_indices(y_test, HOLDOUT_SAMPLES, seed=42)
+    return train_ds, test_ds, None, X_cal, (X_test[picks], y_test[picks])
+
+if STREAMING and list_shards(SHARD_FOLDER, "Falls") and list_shards(SHARD_FOLDER, "ADLs"):
+    print("--- 1-2. STREAMING WINDOWS FROM SHARDS ---")
+    train_ds, test_ds, class_weight, X_cal, (X_hold, y_hold) = streaming_datasets()
+else:
+    train_ds, test_ds, class_weight, X_cal, (X_hold, y_hold) = in_memory_datasets()
 
 # --- 3. TRAIN MODEL (1D CNN) ---
 print("--- 3. TRAINING MODEL ---")
@@ -76,7 +175,7 @@ model = models.Sequential([
 ])
 
 model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
-model.fit(X_train, y_train, epochs=EPOCHS, batch_size=BATCH_SIZE, validation_data=(X_test, y_test))
+model.fit(train_ds, epochs=EPOCHS, validation_data=test_ds, class_weight=class_weight)
 
 # --- 4. CONVERT DIRECTLY TO C HEADER ---
 print("--- 4. CONVERTING TO C HEADER ---")
@@ -86,7 +185,50 @@ converter = tf.lite.TFLiteConverter.from_keras_model(model)
 converter.optimizations = [tf.lite.Optimize.DEFAULT]
 tflite_buffer = converter.convert() # This is now just a byte variable, not a file
 
+# Exits before the header is replaced by a model over the firmware's RAM / time budget
+float_estimate = enforce_budget(tflite_buffer, TARGET_CHIP, ARENA_BUDGET, LATENCY_BUDGET_MS)
+
 # Save directly to .h
 save_c_header(tflite_buffer, "fall_model")
 
-print("\nDONE! 'fall_model.h' is ready.") 
\ No newline at end of file
+if EXPORT_INT8:
+    # --- 5. FULL-INTEGER EXPORT ---
+    print("--- 5. FULL-INTEGER EXPORT ---")
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset(X_cal)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    int8_buffer = converter.convert()
+
+    int8_estimate = enforce_budget(int8_buffer, TARGET_CHIP, ARENA_BUDGET, LATENCY_BUDGET_MS)
+
+    # Firmware quantizes raw IMU samples with these: q = round(x / scale) + zero_point
+    interpreter = tf.lite.Interpreter(model_content=int8_buffer)
+    in_scale, in_zero = interpreter.get_input_details()[0]['quantization']
+    out_scale, out_zero = interpreter.get_output_details()[0]['quantization']
+    save_c_header(int8_buffer, "fall_model_int8", constants={
+        'input_scale': in_scale, 'input_zero_point': in_zero,
+        'output_scale': out_scale, 'output_zero_point': out_zero,
+    })
+
+    # Float (dynamic range) vs int8: accuracy, size and host latency on the same test windows
+    quant = quantization_report(model, int8_buffer, X_hold, y_hold)
+    print_quantization_report(quant)
+
+    results = {}
+    for name, path, buffer, estimate in [("fall_cnn_float", "fall_model.h", tflite_buffer, float_estimate),
+                                         ("fall_cnn_int8", "fall_model_int8.h", int8_buffer, int8_estimate)]:
+        results[name] = benchmark_model(buffer, X_hold[:256], threads=[1], runs=300)
+        results[name]['path'] = f"fall-training/{path}"
+        results[name]['estimate'] = {k: v for k, v in estimate.items() if k != 'tensors'}
+    report_path = save_report(results, os.path.join("..", "models", "fall"), "train_fall.py")
+
+    print(f"\n{'variant':<16} {'size KB':>8} {'host p50 ms':>12} {TARGET_CHIP + ' ms':>10} {'arena KB':>9}")
+    for name, r in results.items():
+        print(f"{name:<16} {r['size_bytes']/1024:>8.1f} {r['latency']['1']['p50_ms']:>12.3f} "
+              f"{r['estimate']['latency_ms']:>10.2f} {r['estimate']['arena']['total_bytes']/1024:>9.1f}")
+    print(f"Saved: {report_path}")
+
+print("\nDONE! 'fall_model.h' is ready." + (" So is 'fall_model_int8.h'." if EXPORT_INT8 else "")) 
\ No newline at end of file
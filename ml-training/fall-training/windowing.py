@@ -0,0 +1,79 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def window_starts(length, time_steps, step):
+    """Start index of every full window in a recording of `length` samples"""
+    if length < time_steps:
+        return np.empty(0, dtype=np.int64)
+    return np.arange(0, length - time_steps + 1, step)
+
+def window_view(signal, time_steps, step):
+    """
+    Zero-copy (n_windows, time_steps, channels) view of a (length, channels) signal
+    """
+    if len(signal) < time_steps:
+        return np.empty((0, time_steps) + signal.shape[1:], dtype=signal.dtype)
+    # sliding_window_view puts the window axis last: (n, channels, time_steps)
+    windows = sliding_window_view(signal, time_steps, axis=0)[::step]
+    return windows.transpose(0, 2, 1)
+
+def majority_labels(labels, time_steps, step):
+    """
+    Most frequent label in every window, ties going to the smallest label
+
+    Per-class counts come from cumulative sums, so the cost is
+    O(length * n_classes) instead of O(n_windows * time_steps).
+    """
+    starts = window_starts(len(labels), time_steps, step)
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.asarray(labels).dtype)
+
+    classes, codes = np.unique(labels, return_inverse=True)
+
+    one_hot = codes[:, None] == np.arange(len(classes))
+    counts = np.zeros((len(labels) + 1, len(classes)), dtype=np.int64)
+    np.cumsum(one_hot, axis=0, out=counts[1:])
+
+    window_counts = counts[starts + time_steps] - counts[starts]
+    return classes[np.argmax(window_counts, axis=1)]
+
+def recording_bounds(recording_ids):
+    """(start, end) row ranges of consecutive runs of the same recording ID"""
+    recording_ids = np.asarray(recording_ids)
+    if len(recording_ids) == 0:
+        return []
+    edges = np.flatnonzero(recording_ids[1:] != recording_ids[:-1]) + 1
+    starts = np.concatenate([[0], edges])
+    ends = np.concatenate([edges, [len(recording_ids)]])
+    return list(zip(starts, ends))
+
+def create_windows(features, labels, time_steps, step, recording_ids=None, dtype=np.float32):
+    """
+    Cut (length, channels) sensor rows into fixed-size windows
+
+    Windows never cross a change of recording ID; without IDs the rows are
+    treated as one recording.
+
+    Returns:
+        X: (n_windows, time_steps, channels), y: (n_windows, 1) majority labels
+    """
+    features = np.asarray(features)
+    labels = np.asarray(labels)
+
+    if recording_ids is None:
+        bounds = [(0, len(features))]
+    else:
+        bounds = recording_bounds(recording_ids)
+
+    xs, ys = [], []
+    for start, end in bounds:
+        xs.append(window_view(features[start:end], time_steps, step))
+        ys.append(majority_labels(labels[start:end], time_steps, step))
+
+    if not xs:
+        return (np.empty((0, time_steps, features.shape[1]), dtype=dtype),
+                np.empty((0, 1), dtype=np.float64))
+
+    X = np.concatenate(xs).astype(dtype, copy=False)
+    y = np.concatenate(ys).astype(np.float64).reshape(-1, 1)
+    return X, y